@@ -1,73 +1,171 @@
 from __future__ import annotations
 
+import copy
+from contextlib import contextmanager
+from typing import Any, Iterator
+
 from fastapi import APIRouter, HTTPException
 
 from backend.game.game_engine import GameEngine
 from backend.game.models import (
+    BatchActionRequest,
+    BatchActionResponse,
     DiscardRequest,
+    GameAction,
+    GamePhase,
     GameStateResponse,
     NewGameRequest,
     PlayCardRequest,
 )
-from backend.services.session_manager import session_manager
+from backend.services.action_log import action_log
+from backend.services.session_manager import SessionConflictError, session_manager
+from backend.services.stats_writer import record_results
 
 router = APIRouter(prefix="/api/v1/game", tags=["game"])
 
 
+def _get_engine(game_id: str) -> GameEngine:
+    engine = session_manager.get(game_id)
+    if not engine:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return engine
+
+
+@contextmanager
+def _locked_engine(game_id: str) -> Iterator[GameEngine]:
+    """Load a game while holding its per-game lock.
+
+    An unknown ID still 404s, and the lock taken for it is dropped so that
+    requests for made-up IDs don't pile up mutexes.
+    """
+    with session_manager.lock(game_id):
+        engine = session_manager.get(game_id)
+        if engine is None:
+            session_manager.forget_lock(game_id)
+            raise HTTPException(status_code=404, detail="Game not found")
+        yield engine
+
+
+def _apply(game_id: str, op: str, **args: Any) -> GameStateResponse:
+    """Load a game, run one engine action on it, save it back and log it.
+
+    Sync routes run in a threadpool, so the per-game lock keeps two quick
+    clicks from mutating the same engine at once.
+    """
+    with _locked_engine(game_id) as engine:
+        on_game_over, engine.on_game_over = engine.on_game_over, None  # _commit sends the result
+        try:
+            state = getattr(engine, op)(**args)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            engine.on_game_over = on_game_over
+        _commit(engine, [(op, args)])
+        state.stats_recorded = engine.stats_recorded
+        return state
+
+
+def _commit(engine: GameEngine, calls: list[tuple[str, dict[str, Any]]]) -> None:
+    """Save a mutated engine and append the actions that produced it to the log.
+
+    A game that just ended is saved as recorded, and its result is only
+    handed to `on_game_over` once that save succeeded, so a request that
+    loses a save conflict and is retried can't record the game twice.
+    """
+    results = None
+    if engine.phase == GamePhase.GAME_OVER and engine.on_game_over is not None and not engine.stats_recorded:
+        engine.stats_recorded = True
+        results = engine.game_results()
+    try:
+        session_manager.save(engine)
+    except SessionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    for i, (op, args) in enumerate(calls):
+        # Only the last append waits: the group commit makes all of them durable together.
+        action_log.log_action(engine.game_id, op, args, wait=i == len(calls) - 1)
+    if engine.phase == GamePhase.GAME_OVER:
+        action_log.log_end(engine.game_id)
+    if results is not None:
+        engine.on_game_over(results)
+
+
+def _engine_call(action: GameAction) -> tuple[str, dict[str, Any]]:
+    """Translate a batched action into the engine method and its arguments."""
+    if action.type == "discard":
+        if action.card_indices is None:
+            raise ValueError("discard requires card_indices")
+        return "discard", {"card_indices": action.card_indices}
+    if action.type == "play":
+        if action.card_index is None:
+            raise ValueError("play requires card_index")
+        return "play_card", {"card_index": action.card_index}
+    if action.type == "go":
+        return "say_go", {}
+    return "acknowledge", {}
+
+
 @router.post("/new", response_model=GameStateResponse)
 def new_game(req: NewGameRequest) -> GameStateResponse:
-    engine = GameEngine(player_name=req.player_name, ai_difficulty=req.ai_difficulty)
+    engine = GameEngine(
+        player_name=req.player_name,
+        ai_difficulty=req.ai_difficulty,
+        seed=req.seed,
+        auto_count=req.auto_count,
+    )
+    if req.seed is None:
+        # A chosen seed means a known deal, so replays don't count toward stats or ratings.
+        engine.on_game_over = record_results
     session_manager.create(engine)
+    action_log.log_new_game(engine)
     return engine.get_state()
 
 
 @router.get("/{game_id}", response_model=GameStateResponse)
 def get_game(game_id: str) -> GameStateResponse:
-    engine = session_manager.get(game_id)
-    if not engine:
-        raise HTTPException(status_code=404, detail="Game not found")
-    return engine.get_state()
+    return _get_engine(game_id).get_state()
 
 
 @router.post("/{game_id}/discard", response_model=GameStateResponse)
 def discard(game_id: str, req: DiscardRequest) -> GameStateResponse:
-    engine = session_manager.get(game_id)
-    if not engine:
-        raise HTTPException(status_code=404, detail="Game not found")
-    try:
-        return engine.discard(req.card_indices)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return _apply(game_id, "discard", card_indices=req.card_indices)
 
 
 @router.post("/{game_id}/play", response_model=GameStateResponse)
 def play_card(game_id: str, req: PlayCardRequest) -> GameStateResponse:
-    engine = session_manager.get(game_id)
-    if not engine:
-        raise HTTPException(status_code=404, detail="Game not found")
-    try:
-        return engine.play_card(req.card_index)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return _apply(game_id, "play_card", card_index=req.card_index)
 
 
 @router.post("/{game_id}/go", response_model=GameStateResponse)
 def say_go(game_id: str) -> GameStateResponse:
-    engine = session_manager.get(game_id)
-    if not engine:
-        raise HTTPException(status_code=404, detail="Game not found")
-    try:
-        return engine.say_go()
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return _apply(game_id, "say_go")
 
 
 @router.post("/{game_id}/acknowledge", response_model=GameStateResponse)
 def acknowledge(game_id: str) -> GameStateResponse:
-    engine = session_manager.get(game_id)
-    if not engine:
-        raise HTTPException(status_code=404, detail="Game not found")
-    try:
-        return engine.acknowledge()
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    return _apply(game_id, "acknowledge")
+
+
+@router.post("/{game_id}/actions", response_model=BatchActionResponse)
+def apply_actions(game_id: str, req: BatchActionRequest) -> BatchActionResponse:
+    """Apply several actions in one round trip, atomically.
+
+    The actions run against a copy of the engine; if any of them is rejected
+    the stored game is left untouched and the error names the failing step.
+    """
+    with _locked_engine(game_id) as engine:
+        working = copy.deepcopy(engine)
+        working.on_game_over = None  # _commit sends the result once the batch is saved
+        calls: list[tuple[str, dict[str, Any]]] = []
+        events = []
+        for i, action in enumerate(req.actions):
+            try:
+                op, args = _engine_call(action)
+                state = getattr(working, op)(**args)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Action {i} ({action.type}): {e}")
+            calls.append((op, args))
+            events.extend(state.action_log)
+        working.on_game_over = engine.on_game_over
+        _commit(working, calls)
+        state.stats_recorded = working.stats_recorded
+        return BatchActionResponse(state=state, events=events)
@@ -1,19 +1,69 @@
 from __future__ import annotations
 
-from fastapi import APIRouter
+from datetime import date, datetime, timedelta, timezone
+from typing import Literal, Optional
 
-from backend.game.models import PlayerStatsResponse, RecordGameRequest
-from backend.services.stats_db import stats_db
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from backend.game.models import LeaderboardResponse, PlayerStatsResponse, RecordGameRequest
+from backend.services.stats_db import StatsBusyError, stats_db
+from backend.services.stats_export import MEDIA_TYPES, WRITERS
+from backend.services.stats_writer import stats_writer
 
 router = APIRouter(prefix="/api/v1/stats", tags=["stats"])
 
 
 @router.post("/record")
-def record_game(req: RecordGameRequest) -> dict[str, str]:
-    stats_db.record_game(req)
+async def record_game(req: RecordGameRequest) -> dict[str, str]:
+    """Store a game the client reports; the server records its own games, so this one is unrated."""
+    await stats_writer.submit(req, rated=False)
     return {"status": "ok"}
 
 
+# Declared before /{player_name} so "export" is not taken as a name.
+@router.get("/export")
+def export_results(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    player: Optional[str] = None,
+) -> StreamingResponse:
+    """Stream raw game results, for everyone or one player."""
+    return StreamingResponse(
+        WRITERS[format](stats_db.iter_results(player)),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="game_results.{format}"'},
+    )
+
+
+# Declared before /{player_name} so "leaderboard" is not taken as a name.
+@router.get("/leaderboard", response_model=LeaderboardResponse)
+def leaderboard(
+    metric: Literal["win_rate", "total_points", "best_hand"] = "win_rate",
+    difficulty: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+) -> LeaderboardResponse:
+    try:
+        return stats_db.leaderboard(metric, difficulty, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StatsBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
 @router.get("/{player_name}", response_model=PlayerStatsResponse)
-def get_stats(player_name: str) -> PlayerStatsResponse:
-    return stats_db.get_stats(player_name)
+def get_stats(
+    player_name: str,
+    window: Optional[Literal["7d", "30d"]] = None,
+    since: Optional[date] = None,
+) -> PlayerStatsResponse:
+    """All-time stats, or only games from the last `window` days / on or after `since` (UTC)."""
+    if window is not None and since is not None:
+        raise HTTPException(status_code=400, detail="Pass either window or since, not both")
+    if window is not None:
+        # "7d" covers today and the six days before it.
+        since = datetime.now(timezone.utc).date() - timedelta(days=int(window[:-1]) - 1)
+    try:
+        return stats_db.get_stats(player_name, since)
+    except StatsBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
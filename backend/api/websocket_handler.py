@@ -1,24 +1,62 @@
-"""WebSocket handler for multiplayer games."""
+"""WebSocket handler for multiplayer games.
+
+Moves on a game run under that game's asyncio lock. Computer seats (see
+`MultiplayerGameEngine.seat_ai`) think on a small thread pool, so hard AI
+discards never block the event loop. The computer steps in when a quick
+match finds nobody within `matchmaking_ai_fallback_seconds`, or takes the
+seat of a player who left after `multiplayer_ai_takeover_seconds` (the
+game then counts as that player's forfeit). Finished games are freed `multiplayer_finished_game_ttl_seconds` after
+the last move.
+
+Every game's turn and game clock, and each of the timeouts above, is a
+timer on the shared `timing_wheel`; nothing sleeps in a task per game.
+"""
 
 from __future__ import annotations
 
 import asyncio
 import json
-from typing import Optional
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Optional
 
 from fastapi import WebSocket, WebSocketDisconnect
 
+from backend.config import settings
+from backend.game.models import AIDifficulty, GamePhase
 from backend.game.multiplayer_engine import MultiplayerGameEngine
 from backend.services.matchmaking import matchmaking
+from backend.services.stats_db import AI_RATINGS, RATING_INITIAL, StatsBusyError, stats_db
+from backend.services.stats_writer import record_results
+from backend.services.timing_wheel import Timer, timing_wheel
+
+logger = logging.getLogger(__name__)
+
+
+def ai_difficulty_for(rating: float) -> AIDifficulty:
+    """The computer difficulty whose rating is closest to `rating`."""
+    return AIDifficulty(min(AI_RATINGS, key=lambda d: abs(AI_RATINGS[d] - rating)))
 
 
 class ConnectionManager:
     def __init__(self) -> None:
         self._connections: dict[str, WebSocket] = {}  # conn_id -> ws
         self._names: dict[str, str] = {}  # conn_id -> display name
+        self._auto_count: dict[str, bool] = {}  # conn_id -> wants one-step counting
+        self._ratings: dict[str, float] = {}  # conn_id -> rating used for quick match
         self._games: dict[str, MultiplayerGameEngine] = {}  # game_id -> engine
         self._player_game: dict[str, str] = {}  # conn_id -> game_id
         self._player_role: dict[str, str] = {}  # conn_id -> "player1"/"player2"
+        self._game_players: dict[str, list[str]] = {}  # game_id -> connected conn_ids
+        self._game_locks: dict[str, asyncio.Lock] = {}  # game_id -> lock held for moves
+        self._fallback_timers: dict[str, Timer] = {}  # conn_id -> AI fallback
+        self._code_timers: dict[str, Timer] = {}  # conn_id -> expiry of their private game code
+        self._takeover_timers: dict[str, Timer] = {}  # game_id -> AI takeover
+        self._expiry_timers: dict[str, Timer] = {}  # game_id -> freeing a finished game
+        self._clock_timers: dict[str, Timer] = {}  # game_id -> next turn/game clock deadline
+        self._tasks: set[asyncio.Task[None]] = set()  # timer actions in flight
+        self._ai_executor: Optional[ThreadPoolExecutor] = None
         self._conn_counter = 0
 
     def _next_id(self) -> str:
@@ -31,19 +69,119 @@ class ConnectionManager:
         self._connections[conn_id] = ws
         return conn_id
 
+    async def close(self) -> None:
+        """Cancel pending timers and stop the AI threads."""
+        for timers in (
+            self._fallback_timers, self._code_timers, self._takeover_timers, self._expiry_timers,
+            self._clock_timers,
+        ):
+            for key in list(timers):
+                self._cancel(timers, key)
+        for task in list(self._tasks):
+            task.cancel()
+        if self._ai_executor is not None:
+            self._ai_executor.shutdown(wait=False, cancel_futures=True)
+            self._ai_executor = None
+
     async def disconnect(self, conn_id: str) -> None:
         self._connections.pop(conn_id, None)
         self._names.pop(conn_id, None)
+        self._auto_count.pop(conn_id, None)
+        rating = self._ratings.pop(conn_id, RATING_INITIAL)
+        self._cancel(self._fallback_timers, conn_id)
+        self._cancel(self._code_timers, conn_id)
         matchmaking.remove_from_queue(conn_id)
         matchmaking.cancel_private_game(conn_id)
 
         # Notify the other player in the game
+        game_id = self._player_game.get(conn_id)
+        role = self._player_role.get(conn_id)
+        remaining = self._leave_game(conn_id)
+        for cid in remaining:
+            await self.send(cid, {"type": "opponent_disconnected", "message": "Your opponent has disconnected."})
+        engine = self._games.get(game_id) if remaining else None
+        if engine is not None and engine.phase != GamePhase.GAME_OVER and settings.multiplayer_ai_takeover_seconds > 0:
+            self._schedule(
+                self._takeover_timers, game_id, settings.multiplayer_ai_takeover_seconds,
+                lambda: self._ai_takeover(game_id, role, ai_difficulty_for(rating)),
+            )
+
+    def _leave_game(self, conn_id: str) -> list[str]:
+        """Take a connection out of its game; returns the players still in it."""
         game_id = self._player_game.pop(conn_id, None)
         self._player_role.pop(conn_id, None)
-        if game_id:
-            for cid, gid in list(self._player_game.items()):
-                if gid == game_id and cid != conn_id:
-                    await self.send(cid, {"type": "opponent_disconnected", "message": "Your opponent has disconnected."})
+        if game_id is None:
+            return []
+        players = self._game_players[game_id]
+        players.remove(conn_id)
+        if not players:
+            # Nobody is left to play it.
+            self._drop_game(game_id)
+        return players
+
+    def _drop_game(self, game_id: str) -> None:
+        """Free a game and everything tied to it."""
+        for conn_id in self._game_players.pop(game_id, ()):
+            self._player_game.pop(conn_id, None)
+            self._player_role.pop(conn_id, None)
+        self._games.pop(game_id, None)
+        self._game_locks.pop(game_id, None)
+        self._cancel(self._takeover_timers, game_id)
+        self._cancel(self._expiry_timers, game_id)
+        self._cancel(self._clock_timers, game_id)
+
+    def _lock(self, game_id: str) -> asyncio.Lock:
+        return self._game_locks.setdefault(game_id, asyncio.Lock())
+
+    def _schedule(
+        self, timers: dict[str, Timer], key: str, delay: float,
+        action: Callable[[], Awaitable[None]],
+    ) -> None:
+        """Run `action` after `delay` seconds unless `key` is cancelled first."""
+        self._cancel(timers, key)
+        timers[key] = timing_wheel.schedule(delay, self._fire, timers, key, action)
+
+    def _fire(self, timers: dict[str, Timer], key: str, action: Callable[[], Awaitable[None]]) -> None:
+        del timers[key]  # from here on the action can't be cancelled half-done
+
+        async def run() -> None:
+            try:
+                await action()
+            except Exception:
+                logger.exception("Multiplayer timer action failed")
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _cancel(timers: dict[str, Timer], key: str) -> None:
+        timer = timers.pop(key, None)
+        if timer is not None:
+            timing_wheel.cancel(timer)
+
+    def _arm_clock(self, game_id: str, engine: MultiplayerGameEngine) -> None:
+        """Point the game's wheel timer at its next clock deadline."""
+        deadline = engine.next_deadline()
+        if deadline is None or self._games.get(game_id) is not engine:
+            self._cancel(self._clock_timers, game_id)
+            return
+        self._schedule(
+            self._clock_timers, game_id, deadline - time.monotonic(), lambda: self._check_clock(game_id)
+        )
+
+    async def _check_clock(self, game_id: str) -> None:
+        """A clock deadline passed: make the overdue moves or forfeit."""
+        engine = self._games.get(game_id)
+        if engine is None:
+            return
+        async with self._lock(game_id):
+            changed = engine.check_clocks(time.monotonic())
+        if changed:
+            await self._broadcast_state(game_id)
+            await self._drive_ai(game_id)
+            self._expire_if_finished(game_id, engine)
+        self._arm_clock(game_id, engine)
 
     async def send(self, conn_id: str, data: dict) -> None:
         ws = self._connections.get(conn_id)
@@ -53,20 +191,152 @@ class ConnectionManager:
             except Exception:
                 pass
 
-    async def _start_game(self, conn1: str, name1: str, conn2: str, name2: str) -> None:
-        engine = MultiplayerGameEngine(name1, name2)
+    async def _start_game(
+        self, conn1: str, name1: str, conn2: Optional[str], name2: str, auto_count: bool = False,
+        ai_difficulty: Optional[AIDifficulty] = None,
+    ) -> None:
+        """Start a game; with `conn2` None the computer plays the second seat."""
+        engine = MultiplayerGameEngine(
+            name1, name2, auto_count=auto_count,
+            turn_seconds=settings.multiplayer_turn_seconds or None,
+            game_seconds=settings.multiplayer_game_seconds or None,
+            forfeit_after=settings.multiplayer_forfeit_after_timeouts,
+        )
+        engine.on_game_over = record_results
+        if conn2 is None:
+            engine.seat_ai("player2", ai_difficulty or AIDifficulty.MEDIUM)
         game_id = engine.game_id
+        players = [conn1] if conn2 is None else [conn1, conn2]
+        for conn_id in players:
+            self._cancel(self._fallback_timers, conn_id)
+            self._cancel(self._code_timers, conn_id)
+            matchmaking.cancel_private_game(conn_id)
+            self._leave_game(conn_id)
         self._games[game_id] = engine
-        self._player_game[conn1] = game_id
-        self._player_game[conn2] = game_id
-        self._player_role[conn1] = "player1"
-        self._player_role[conn2] = "player2"
+        self._game_players[game_id] = players
+        for conn_id, role in zip(players, ("player1", "player2")):
+            self._player_game[conn_id] = game_id
+            self._player_role[conn_id] = role
+        engine.start_clocks(time.monotonic())
+        self._arm_clock(game_id, engine)
+
+        for conn_id, role in zip(players, ("player1", "player2")):
+            await self.send(conn_id, {"type": "game_start", "state": engine.get_state(role).model_dump()})
+        await self._drive_ai(game_id)
+
+    async def start_match(self, conn1: str, conn2: str) -> None:
+        """Start a quick-match game between two players taken off the queue."""
+        if conn1 not in self._connections or conn2 not in self._connections:
+            # One left after being paired; the other goes back in the queue.
+            for conn_id in (conn1, conn2):
+                if conn_id in self._connections:
+                    matchmaking.enqueue(conn_id, self._ratings.get(conn_id, RATING_INITIAL))
+            return
+        # Strangers only get one-step counting if both asked for it.
+        auto_count = self._auto_count.get(conn1, False) and self._auto_count.get(conn2, False)
+        await self._start_game(
+            conn1, self._names.get(conn1, "Player"), conn2, self._names.get(conn2, "Player"), auto_count
+        )
+
+    async def _start_ai_game(self, conn_id: str) -> None:
+        """Quick match found nobody in time: play the computer instead."""
+        if conn_id not in matchmaking:
+            return  # matched or gone meanwhile
+        matchmaking.remove_from_queue(conn_id)
+        rating = self._ratings.get(conn_id, RATING_INITIAL)
+        await self._start_game(
+            conn_id, self._names.get(conn_id, "Player"), None, "Computer",
+            self._auto_count.get(conn_id, False), ai_difficulty_for(rating),
+        )
+
+    async def _expire_codes(self, conn_id: str) -> None:
+        """`conn_id`'s join code is due: close expired private games and tell their creators.
+
+        A code's timer is cancelled when it is joined or replaced, so if the
+        code is gone by now it expired in an earlier sweep.
+        """
+        expired = matchmaking.expire_private_games()
+        if matchmaking.has_private_game(conn_id):
+            # The wheel fired a little before the monotonic clock got there; look again next tick.
+            self._schedule(self._code_timers, conn_id, timing_wheel.tick, lambda: self._expire_codes(conn_id))
+        elif conn_id not in expired:
+            expired.append(conn_id)
+        for creator in expired:
+            self._cancel(self._code_timers, creator)
+            await self.send(creator, {"type": "private_game_expired", "message": "Your join code has expired."})
+
+    async def _ai_takeover(self, game_id: str, role: str, difficulty: AIDifficulty) -> None:
+        """Hand a departed player's seat to the computer."""
+        engine = self._games.get(game_id)
+        if engine is None or engine.phase == GamePhase.GAME_OVER:
+            return
+        async with self._lock(game_id):
+            engine.take_over(role, difficulty)
+        for cid in self._game_players.get(game_id, ()):
+            await self.send(cid, {"type": "opponent_replaced", "message": "The computer has taken your opponent's seat."})
+        await self._drive_ai(game_id)
+
+    async def _drive_ai(self, game_id: str) -> None:
+        """Let computer seats move until a human is due to act."""
+        engine = self._games.get(game_id)
+        if engine is None or not engine.ai_seats:
+            return
+        loop = asyncio.get_running_loop()
+        if self._ai_executor is None:
+            self._ai_executor = ThreadPoolExecutor(
+                max_workers=settings.multiplayer_ai_workers, thread_name_prefix="multiplayer-ai"
+            )
+        while self._games.get(game_id) is engine:
+            async with self._lock(game_id):
+                if self._games.get(game_id) is not engine:
+                    return  # freed while waiting for the lock
+                try:
+                    moved = await loop.run_in_executor(self._ai_executor, engine.ai_move)
+                except Exception:
+                    # Leave the human's connection alone; the game just stalls.
+                    logger.exception("Computer move failed in game %s", game_id)
+                    return
+                if moved:
+                    engine.restart_turn_clock(time.monotonic())
+            if not moved:
+                break
+            await self._broadcast_state(game_id)
+        self._expire_if_finished(game_id, engine)
+        self._arm_clock(game_id, engine)
+
+    def _expire_if_finished(self, game_id: str, engine: MultiplayerGameEngine) -> None:
+        """Free a finished game once its players have had time to see the result."""
+        if engine.phase != GamePhase.GAME_OVER or game_id in self._expiry_timers:
+            return
+        if self._games.get(game_id) is not engine:
+            return  # already freed
+        self._cancel(self._takeover_timers, game_id)
 
-        state1 = engine.get_state("player1").model_dump()
-        state2 = engine.get_state("player2").model_dump()
+        async def drop() -> None:
+            self._drop_game(game_id)
 
-        await self.send(conn1, {"type": "game_start", "state": state1})
-        await self.send(conn2, {"type": "game_start", "state": state2})
+        self._schedule(self._expiry_timers, game_id, settings.multiplayer_finished_game_ttl_seconds, drop)
+
+    async def _move(self, conn_id: str, move: Callable[[MultiplayerGameEngine, str], Any]) -> None:
+        """Apply a player's move, share the new state, then let the computer reply."""
+        game_id = self._player_game.get(conn_id)
+        role = self._player_role.get(conn_id)
+        if not game_id or not role:
+            return
+        engine = self._games.get(game_id)
+        if not engine:
+            return
+        try:
+            async with self._lock(game_id):
+                move(engine, role)
+                engine.moved(role, time.monotonic())
+        except ValueError as e:
+            await self.send(conn_id, {"type": "error", "message": str(e)})
+            return
+        await self._broadcast_state(game_id)
+        await self._drive_ai(game_id)
+        self._expire_if_finished(game_id, engine)
+        self._arm_clock(game_id, engine)
 
     async def handle_message(self, conn_id: str, data: dict) -> None:
         msg_type = data.get("type")
@@ -74,91 +344,77 @@ class ConnectionManager:
         if msg_type == "quick_match":
             name = data.get("name", "Player")
             self._names[conn_id] = name
-            match = matchmaking.add_to_queue(conn_id)
+            self._auto_count[conn_id] = bool(data.get("auto_count", False))
+            try:
+                rating = await asyncio.to_thread(stats_db.get_rating, name)
+            except StatsBusyError:
+                rating = RATING_INITIAL  # match on the default rather than keep the player waiting
+            if conn_id not in self._connections:
+                return  # disconnected while the rating was looked up
+            self._ratings[conn_id] = rating
+            if matchmaking.running:
+                # The matchmaker pairs the whole pool on its next tick.
+                matchmaking.enqueue(conn_id, rating)
+                match = None
+            else:
+                match = matchmaking.add_to_queue(conn_id, rating)
             if match:
-                await self._start_game(match, self._names.get(match, "Player"), conn_id, name)
+                await self.start_match(match, conn_id)
             else:
                 await self.send(conn_id, {"type": "waiting", "message": "Waiting for opponent..."})
+                if settings.matchmaking_ai_fallback_seconds > 0 and conn_id in matchmaking:
+                    self._schedule(
+                        self._fallback_timers, conn_id, settings.matchmaking_ai_fallback_seconds,
+                        lambda: self._start_ai_game(conn_id),
+                    )
 
         elif msg_type == "create_private":
             name = data.get("name", "Player")
             self._names[conn_id] = name
+            self._auto_count[conn_id] = bool(data.get("auto_count", False))
             code = matchmaking.create_private_game(conn_id)
             await self.send(conn_id, {"type": "private_created", "code": code})
+            self._schedule(
+                self._code_timers, conn_id, matchmaking.code_ttl, lambda: self._expire_codes(conn_id)
+            )
 
         elif msg_type == "join_private":
             code = data.get("code", "")
             name = data.get("name", "Player")
             self._names[conn_id] = name
-            creator = matchmaking.join_private_game(code)
+            try:
+                creator = matchmaking.join_private_game(code, joiner=conn_id)
+            except ValueError as e:
+                await self.send(conn_id, {"type": "error", "message": str(e)})
+                return
             if creator:
-                await self._start_game(creator, self._names.get(creator, "Player"), conn_id, name)
+                # Private games use the creator's counting preference.
+                await self._start_game(
+                    creator, self._names.get(creator, "Player"), conn_id, name,
+                    self._auto_count.get(creator, False),
+                )
             else:
                 await self.send(conn_id, {"type": "error", "message": "Game not found"})
 
         elif msg_type == "discard":
-            game_id = self._player_game.get(conn_id)
-            role = self._player_role.get(conn_id)
-            if not game_id or not role:
-                return
-            engine = self._games.get(game_id)
-            if not engine:
-                return
-            try:
-                engine.discard(role, data["card_indices"])
-                await self._broadcast_state(game_id)
-            except ValueError as e:
-                await self.send(conn_id, {"type": "error", "message": str(e)})
+            await self._move(conn_id, lambda engine, role: engine.discard(role, data["card_indices"]))
 
         elif msg_type == "play_card":
-            game_id = self._player_game.get(conn_id)
-            role = self._player_role.get(conn_id)
-            if not game_id or not role:
-                return
-            engine = self._games.get(game_id)
-            if not engine:
-                return
-            try:
-                engine.play_card(role, data["card_index"])
-                await self._broadcast_state(game_id)
-            except ValueError as e:
-                await self.send(conn_id, {"type": "error", "message": str(e)})
+            await self._move(conn_id, lambda engine, role: engine.play_card(role, data["card_index"]))
 
         elif msg_type == "say_go":
-            game_id = self._player_game.get(conn_id)
-            role = self._player_role.get(conn_id)
-            if not game_id or not role:
-                return
-            engine = self._games.get(game_id)
-            if not engine:
-                return
-            try:
-                engine.say_go(role)
-                await self._broadcast_state(game_id)
-            except ValueError as e:
-                await self.send(conn_id, {"type": "error", "message": str(e)})
+            await self._move(conn_id, lambda engine, role: engine.say_go(role))
 
         elif msg_type == "acknowledge":
-            game_id = self._player_game.get(conn_id)
-            role = self._player_role.get(conn_id)
-            if not game_id or not role:
-                return
-            engine = self._games.get(game_id)
-            if not engine:
-                return
-            try:
-                engine.acknowledge(role)
-                await self._broadcast_state(game_id)
-            except ValueError as e:
-                await self.send(conn_id, {"type": "error", "message": str(e)})
+            await self._move(conn_id, lambda engine, role: engine.acknowledge(role))
 
         elif msg_type == "chat":
             game_id = self._player_game.get(conn_id)
             if not game_id:
                 return
             # Broadcast chat to both
-            for cid, gid in self._player_game.items():
-                if gid == game_id and cid != conn_id:
+            for cid in self._game_players.get(game_id, ()):
+                if cid != conn_id:
                     await self.send(cid, {
                         "type": "chat",
                         "message": data.get("message", ""),
@@ -168,12 +424,15 @@ class ConnectionManager:
         engine = self._games.get(game_id)
         if not engine:
             return
-        for conn_id, gid in self._player_game.items():
-            if gid == game_id:
-                role = self._player_role.get(conn_id)
-                if role:
-                    state = engine.get_state(role).model_dump()
-                    await self.send(conn_id, {"type": "game_state", "state": state})
+        # Views are built under the lock so a computer move can't be half applied.
+        async with self._lock(game_id):
+            states = [
+                (conn_id, engine.get_state(self._player_role[conn_id]).model_dump())
+                for conn_id in self._game_players.get(game_id, ())
+                if conn_id in self._player_role
+            ]
+        for conn_id, state in states:
+            await self.send(conn_id, {"type": "game_state", "state": state})
 
 
 manager = ConnectionManager()
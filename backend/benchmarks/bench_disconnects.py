@@ -0,0 +1,75 @@
+"""Time a storm of connects and disconnects through the WebSocket manager.
+
+Every connection either waits in the quick-match queue, holds an open
+private game code, or plays a private game with another connection.
+Then all of them disconnect in random order:
+
+    python -m backend.benchmarks.bench_disconnects --connections 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any
+
+from backend.api.websocket_handler import ConnectionManager
+from backend.services.matchmaking import matchmaking
+
+
+class NullWebSocket:
+    async def accept(self) -> None:
+        pass
+
+    async def send_json(self, data: Any) -> None:
+        pass
+
+
+async def storm(connections: int, seed: int) -> None:
+    rng = random.Random(seed)
+    manager = ConnectionManager()
+    # Zero-width windows keep quick-match players waiting, so the queue
+    # grows with the storm instead of pairing everyone off.
+    matchmaking.window = matchmaking.growth = 0.0
+
+    start = time.perf_counter()
+    conn_ids = [await manager.connect(NullWebSocket()) for _ in range(connections)]
+    open_code = None
+    for conn_id in conn_ids:
+        kind = rng.random()
+        if kind < 1 / 3:
+            matchmaking.add_to_queue(conn_id, rng.gauss(1500, 300))
+        elif open_code is None or kind < 2 / 3:
+            await manager.handle_message(conn_id, {"type": "create_private"})
+            open_code = matchmaking._private_codes[conn_id]
+        else:
+            await manager.handle_message(conn_id, {"type": "join_private", "code": open_code})
+            open_code = None
+    connected = time.perf_counter() - start
+    waiting, codes, games = len(matchmaking), len(matchmaking._private_games), len(manager._games)
+
+    rng.shuffle(conn_ids)
+    start = time.perf_counter()
+    for conn_id in conn_ids:
+        await manager.disconnect(conn_id)
+    disconnected = time.perf_counter() - start
+
+    print(f"connect: {connections:,} in {connected:.2f}s "
+          f"({waiting:,} queued, {codes:,} open codes, {games:,} games)")
+    print(f"disconnect: {connections:,} in {disconnected:.2f}s = "
+          f"{disconnected / connections * 1e6:.1f} us each")
+    assert not len(matchmaking) and not matchmaking._private_games and not manager._games
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(storm(args.connections, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Measure bulk import and streaming export throughput for game results.
+
+Writes a synthetic NDJSON (or CSV) file, imports it into a fresh stats
+database, then exports it back, reporting rows per second and the peak
+memory growth of the process for each step:
+
+    python -m backend.benchmarks.bench_export_import --rows 1000000 --format csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator
+
+from backend.services.stats_db import StatsDB
+from backend.services.stats_export import READERS, WRITERS
+
+
+def synthetic_rows(rows: int, players: int, seed: int = 0) -> Iterator[dict[str, Any]]:
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    for i in range(rows):
+        won = rng.random() < 0.5
+        yield {
+            "player_name": f"player-{rng.randrange(players)}",
+            "opponent_name": "Computer",
+            "player_score": 121 if won else rng.randrange(60, 121),
+            "opponent_score": rng.randrange(60, 121) if won else 121,
+            "won": won,
+            "ai_difficulty": rng.choice(("easy", "medium", "hard")),
+            "game_mode": "single",
+            "hand_scores": [rng.randrange(0, 20) for _ in range(8)],
+            "crib_scores": [rng.randrange(0, 12) for _ in range(4)],
+            "highest_hand_score": 19,
+            "total_points_scored": 121,
+            "created_at": (start + timedelta(seconds=i * 7)).isoformat(),
+        }
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--players", type=int, default=50_000)
+    parser.add_argument("--format", choices=sorted(WRITERS), default="ndjson")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, f"results.{args.format}")
+    with open(source, "w", encoding="utf-8", newline="") as f:
+        for chunk in WRITERS[args.format](synthetic_rows(args.rows, args.players)):
+            f.write(chunk)
+
+    db = StatsDB(db_path=os.path.join(workdir, "stats.db"))
+    rss = peak_rss_mb()
+    start = time.perf_counter()
+    with open(source, encoding="utf-8", newline="") as f:
+        count = db.import_results(READERS[args.format](f))
+    elapsed = time.perf_counter() - start
+    print(f"import: {count:,} rows in {elapsed:.1f}s = {count / elapsed * 60:,.0f} rows/min "
+          f"(peak RSS +{peak_rss_mb() - rss:.0f} MB)")
+
+    rss = peak_rss_mb()
+    start = time.perf_counter()
+    exported = 0
+    with open(os.devnull, "w") as out:
+        for chunk in WRITERS[args.format](db.iter_results()):
+            exported += chunk.count("\n")
+            out.write(chunk)
+    elapsed = time.perf_counter() - start
+    print(f"export: {exported:,} lines in {elapsed:.1f}s = {exported / elapsed * 60:,.0f} lines/min "
+          f"(peak RSS +{peak_rss_mb() - rss:.0f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Time leaderboard pages over a large synthetic player population.
+
+Loads `player_stats` / `player_difficulty_stats` rows directly (the
+aggregates are what the leaderboard reads), checks every metric's query
+plan is an index scan without a sort, then times first pages and pages
+reached through a cursor:
+
+    python -m backend.benchmarks.bench_leaderboard --players 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from backend.services.stats_db import StatsDB, _LEADERBOARD_METRICS, _leaderboard_query
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+
+def populate(db_path: str, players: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    StatsDB(db_path=db_path).close()
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany("INSERT INTO players (id, name) VALUES (?, ?)", ((p, f"player-{p}") for p in range(players)))
+    chunk = 100_000
+    for offset in range(0, players, chunk):
+        totals, per_difficulty = [], []
+        for p in range(offset, min(offset + chunk, players)):
+            games = rng.randint(1, 400)
+            wins = rng.randint(0, games)
+            best = rng.randint(0, 29)
+            points = games * rng.randint(60, 121)
+            totals.append((p, games, wins, points, best))
+            per_difficulty.append((p, rng.choice(DIFFICULTIES), games, wins, points, best))
+        with conn:
+            conn.executemany(
+                """INSERT INTO player_stats (player_id, games, wins, total_points, best_hand)
+                   VALUES (?, ?, ?, ?, ?)""",
+                totals,
+            )
+            conn.executemany(
+                """INSERT INTO player_difficulty_stats
+                   (player_id, difficulty, games, wins, total_points, best_hand)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                per_difficulty,
+            )
+        print(f"  loaded {min(offset + chunk, players):,} players", end="\r", flush=True)
+    print()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=1_000_000)
+    parser.add_argument("--pages", type=int, default=200, help="pages timed per metric")
+    parser.add_argument("--db", help="database file to build or reuse (default: temporary)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "bench_leaderboard.db")
+    if not os.path.exists(db_path):
+        print(f"Populating {db_path} with {args.players:,} players...")
+        populate(db_path, args.players)
+    db = StatsDB(db_path=db_path)
+
+    conn = sqlite3.connect(db_path)
+    failed = False
+    for metric in _LEADERBOARD_METRICS:
+        for difficulty in (None, "hard"):
+            sql, params, _ = _leaderboard_query(metric, difficulty, 21, None)
+            plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+            if "USING INDEX idx_" not in plan or "TEMP B-TREE" in plan:
+                print(f"FAIL: {metric}/{difficulty or 'all'} plan is not an index scan: {plan}")
+                failed = True
+
+            # Walk forward through pages, so later samples exercise the cursor path.
+            timings, cursor = [], None
+            for _ in range(args.pages):
+                t0 = time.perf_counter()
+                page = db.leaderboard(metric, difficulty, limit=20, cursor=cursor)
+                timings.append((time.perf_counter() - t0) * 1000)
+                cursor = page.next_cursor
+            timings.sort()
+            p99 = timings[int(len(timings) * 0.99) - 1]
+            print(f"{metric:>12} {difficulty or 'all':>5}: "
+                  f"median={statistics.median(timings):.3f}ms p99={p99:.3f}ms")
+            failed |= p99 > 5.0
+
+    if failed:
+        print("FAIL: expected index scans and p99 under 5ms")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
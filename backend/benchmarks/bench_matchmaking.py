@@ -0,0 +1,158 @@
+"""Simulate quick-match traffic and report match quality and wait times.
+
+Players with normally distributed ratings arrive at a steady rate on a
+simulated clock; some give up and leave the queue before they are
+matched. Pairing each arrival on the spot and pairing the whole pool
+every `--tick` seconds are compared with the old first-come, first-served
+pairing, then queue operations are timed against a queue
+already holding `--queued` players. Finally `--codes` private join codes
+are issued, half of them joined and the rest left to expire:
+
+    python -m backend.benchmarks.bench_matchmaking --players 10000 --rate 20 --codes 2000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import random
+import statistics
+import time
+
+from backend.services.matchmaking import MatchmakingQueue
+
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def simulate(
+    queue: MatchmakingQueue | None, players: int, rate: float, patience: float, seed: int, tick: float = 0.0
+) -> None:
+    """Feed arrivals to `queue` (None: FIFO pairing) and print the outcome.
+
+    With `tick` set, arrivals are only queued and the pool is paired every
+    `tick` seconds.
+    """
+    rng = random.Random(seed)
+    ratings: dict[str, float] = {}
+    arrived: dict[str, float] = {}
+    fifo: list[str] = []
+    gaps: list[float] = []
+    waits: list[float] = []
+    departures: list[tuple[float, str]] = []  # (give-up time, connection ID)
+    abandoned = peak = 0
+    now = next_tick = 0.0
+    for i in range(players):
+        now += rng.expovariate(rate)
+        while tick and next_tick <= now:
+            for a, b in queue.pair_waiting(now=next_tick):
+                gaps.append(abs(ratings[a] - ratings[b]))
+                waits.append(next_tick - min(arrived.pop(a), arrived.pop(b)))
+            next_tick += tick
+        while departures and departures[0][0] <= now:
+            _, gone = heapq.heappop(departures)
+            if gone in arrived:
+                del arrived[gone]
+                abandoned += 1
+                if queue is not None:
+                    queue.remove_from_queue(gone)
+                else:
+                    fifo.remove(gone)
+        conn_id = f"conn-{i}"
+        ratings[conn_id] = rng.gauss(1500, 300)
+        if tick:
+            queue.enqueue(conn_id, ratings[conn_id], now=now)
+            match, waiting = None, len(queue)
+        elif queue is not None:
+            match = queue.add_to_queue(conn_id, ratings[conn_id], now=now)
+            waiting = len(queue)
+        else:
+            match = fifo.pop(0) if fifo else None
+            if match is None:
+                fifo.append(conn_id)
+            waiting = len(fifo)
+        peak = max(peak, waiting)
+        if match is None:
+            arrived[conn_id] = now
+            heapq.heappush(departures, (now + rng.expovariate(1 / patience), conn_id))
+        else:
+            gaps.append(abs(ratings[match] - ratings[conn_id]))
+            waits.append(now - arrived.pop(match))
+    label = "tick" if tick else "banded" if queue is not None else "fifo"
+    print(
+        f"{label:>6}: {len(gaps):,} matches, {abandoned:,} gave up, peak queue {peak:,} | "
+        f"rating gap mean {statistics.fmean(gaps):.0f} p95 {percentile(gaps, 0.95):.0f} | "
+        f"wait p50 {percentile(waits, 0.5):.1f}s p99 {percentile(waits, 0.99):.1f}s"
+    )
+
+
+def time_operations(queued: int, ops: int, seed: int) -> None:
+    """Time add/remove pairs against a queue that already holds `queued` players."""
+    rng = random.Random(seed)
+    # Zero-width windows never match, so the queue fills up to the requested
+    # size and every search walks all bands out to the maximum window.
+    queue = MatchmakingQueue(window=0.0, growth_per_second=0.0)
+    for i in range(queued):
+        queue.add_to_queue(f"conn-{i}", rng.gauss(1500, 300), now=0.0)
+    start = time.perf_counter()
+    for i in range(ops):
+        conn_id = f"new-{i}"
+        queue.add_to_queue(conn_id, rng.gauss(1500, 300), now=0.0)
+        queue.remove_from_queue(conn_id)
+    elapsed = time.perf_counter() - start
+    print(f"ops: {elapsed / ops * 1e6:.1f} us per add+remove with {len(queue):,} queued")
+
+    pool = MatchmakingQueue()
+    for i in range(queued):
+        pool.enqueue(f"conn-{i}", rng.gauss(1500, 300), now=rng.uniform(0.0, 30.0))
+    start = time.perf_counter()
+    pairs = pool.pair_waiting(now=30.0)
+    elapsed = time.perf_counter() - start
+    print(f"tick: paired {len(pairs) * 2:,} of {queued:,} queued in {elapsed * 1000:.1f} ms, "
+          f"rating gap mean {pool.metrics()['mean_rating_gap']:.1f}")
+
+
+def time_codes(codes: int, seed: int) -> None:
+    """Issue private codes at 1000/s on a simulated clock; join every other one."""
+    rng = random.Random(seed)
+    queue = MatchmakingQueue()
+    peak = 0
+    start = time.perf_counter()
+    for i in range(codes):
+        now = i / 1000
+        code = queue.create_private_game(f"conn-{i}", now=now)
+        if rng.random() < 0.5:
+            queue.join_private_game(code, now=now)
+        peak = max(peak, len(queue._private_games))
+    elapsed = time.perf_counter() - start
+    metrics = queue.metrics()
+    print(f"codes: {codes:,} issued in {elapsed:.2f}s = {elapsed / codes * 1e6:.1f} us each, "
+          f"peak {peak:,} open, {metrics['codes_expired']:,} expired, "
+          f"{metrics['code_collisions']:,} collisions")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=10_000)
+    parser.add_argument("--rate", type=float, default=20.0, help="arrivals per simulated second")
+    parser.add_argument("--patience", type=float, default=120.0, help="mean seconds before giving up")
+    parser.add_argument("--tick", type=float, default=0.25, help="seconds between batch pairings")
+    parser.add_argument("--queued", type=int, default=10_000)
+    parser.add_argument("--ops", type=int, default=100_000)
+    parser.add_argument("--codes", type=int, default=2_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    simulate(MatchmakingQueue(), args.players, args.rate, args.patience, args.seed)
+    simulate(MatchmakingQueue(), args.players, args.rate, args.patience, args.seed, tick=args.tick)
+    simulate(None, args.players, args.rate, args.patience, args.seed)
+    time_operations(args.queued, args.ops, args.seed)
+    time_codes(args.codes, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Check that per-player history queries use the game_results index at scale.
+
+Builds (or reuses) a synthetic stats database, asserts that the query plan
+for PLAYER_HISTORY_SQL is an index scan with no temp B-tree sort, then
+times the query for random players:
+
+    python -m backend.benchmarks.bench_stats_index --rows 10000000 --db /tmp/bench_stats.db
+
+Generating 10M rows takes a few minutes; pass --db to keep the file for
+later runs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from backend.services.stats_db import PLAYER_HISTORY_SQL, StatsDB, pack_scores
+
+INDEX_NAME = "idx_game_results_player_created"
+
+
+def populate(db_path: str, rows: int, players: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    StatsDB(db_path=db_path).close()  # run migrations so the index exists before loading
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    chunk = 100_000
+    names = [f"player-{p}" for p in range(players)] + ["Computer"]
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO players (name) VALUES (?)", [(n,) for n in names])
+    ids = dict(conn.execute("SELECT name, id FROM players"))
+    computer = ids["Computer"]
+    hand = pack_scores([8, 12, 4, 6, 10])
+    crib = pack_scores([4, 2])
+    for offset in range(0, rows, chunk):
+        batch = []
+        for i in range(offset, min(offset + chunk, rows)):
+            won = rng.random() < 0.5
+            batch.append((
+                ids[f"player-{rng.randrange(players)}"], computer,
+                121 if won else rng.randrange(60, 121), rng.randrange(60, 121) if won else 121,
+                int(won), rng.choice(("easy", "medium", "hard")), "single", hand, crib,
+                12, 121, (start + timedelta(seconds=i * 3)).isoformat(),
+            ))
+        with conn:
+            conn.executemany(
+                """INSERT INTO game_results
+                   (player_id, opponent_id, player_score, opponent_score, won,
+                    ai_difficulty, game_mode, hand_scores, crib_scores,
+                    highest_hand_score, total_points_scored, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                batch,
+            )
+        print(f"  loaded {min(offset + chunk, rows):,} rows", end="\r", flush=True)
+    print()
+    conn.close()
+
+
+def query_plan(conn: sqlite3.Connection) -> list[str]:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {PLAYER_HISTORY_SQL}", ("player-0",))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--db", help="database file to build or reuse (default: temporary)")
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), "bench_stats.db")
+    conn = sqlite3.connect(db_path)
+    existing = 0
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'game_results'").fetchone():
+        existing = conn.execute("SELECT COUNT(*) FROM game_results").fetchone()[0]
+    conn.close()
+    if existing < args.rows:
+        print(f"Populating {db_path} with {args.rows - existing:,} rows...")
+        populate(db_path, args.rows - existing, args.players)
+    StatsDB(db_path=db_path).close()  # apply any newer migrations to a reused file
+
+    conn = sqlite3.connect(db_path)
+    plan = query_plan(conn)
+    print("Query plan:")
+    for step in plan:
+        print(f"  {step}")
+    uses_index = any(INDEX_NAME in step for step in plan)
+    sorts = any("TEMP B-TREE" in step for step in plan)
+
+    rng = random.Random(1)
+    timings = []
+    for _ in range(args.queries):
+        name = f"player-{rng.randrange(args.players)}"
+        t0 = time.perf_counter()
+        conn.execute(PLAYER_HISTORY_SQL, (name,)).fetchall()
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"history query over {args.queries} players: "
+          f"median={statistics.median(timings):.2f}ms p99={p99:.2f}ms")
+
+    if not uses_index or sorts:
+        print(f"FAIL: expected an index scan on {INDEX_NAME} without a temp B-tree sort")
+        sys.exit(1)
+    print("OK: query is served by the index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Measure the timing wheel against one asyncio task per game clock.
+
+Schedules a turn-clock timer for each of `--games` games and replays a
+minute of simulated play. Every tick, some games make a move (their timer
+is cancelled and rescheduled), and games whose clock ran out are
+re-armed. This reports the per-tick cost, the cost of an empty tick at
+different numbers of pending timers, and the memory and setup cost of
+the one-sleeping-task-per-game alternative:
+
+    python -m backend.benchmarks.bench_timing_wheel --games 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import resource
+import statistics
+import time
+
+from backend.services.timing_wheel import TimingWheel
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def replay(games: int, turn_seconds: float, move_every: float, seconds: float, seed: int) -> None:
+    rng = random.Random(seed)
+    wheel = TimingWheel(tick_ms=100, slots=512)
+    timers = {}
+    timeouts = 0
+
+    def timed_out(game: int) -> None:
+        nonlocal timeouts
+        timeouts += 1
+        timers[game] = wheel.schedule(turn_seconds, timed_out, game)
+
+    start = time.perf_counter()
+    for game in range(games):
+        timers[game] = wheel.schedule(rng.uniform(0, turn_seconds), timed_out, game)
+    setup = time.perf_counter() - start
+
+    moves_per_tick = int(games * wheel.tick / move_every)
+    tick_ms = []
+    for _ in range(int(seconds / wheel.tick)):
+        start = time.perf_counter()
+        for game in rng.sample(range(games), moves_per_tick):
+            wheel.cancel(timers[game])
+            timers[game] = wheel.schedule(turn_seconds, timed_out, game)
+        wheel.advance()
+        tick_ms.append((time.perf_counter() - start) * 1000)
+    print(f"wheel: {games:,} timers scheduled in {setup * 1000:.0f} ms; {len(tick_ms)} ticks with "
+          f"{moves_per_tick:,} moves each: mean {statistics.fmean(tick_ms):.2f} ms, "
+          f"p99 {percentile(tick_ms, 0.99):.2f} ms, {timeouts:,} timeouts")
+
+
+def empty_ticks(pending: int, ticks: int) -> None:
+    wheel = TimingWheel(tick_ms=100, slots=512)
+    for _ in range(pending):
+        wheel.schedule(10 * ticks * wheel.tick, lambda: None)  # never due during the run
+    start = time.perf_counter()
+    wheel.advance(ticks)
+    elapsed = time.perf_counter() - start
+    print(f"empty tick with {pending:>7,} pending: {elapsed / ticks * 1e6:.2f} us")
+
+
+async def sleeping_tasks(games: int, turn_seconds: float) -> None:
+    rss = peak_rss_mb()
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(asyncio.sleep(turn_seconds)) for _ in range(games)]
+    await asyncio.sleep(0)  # let every task reach its sleep
+    created = time.perf_counter() - start
+    grown = peak_rss_mb() - rss
+    start = time.perf_counter()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    print(f"tasks: {games:,} sleeping tasks created in {created * 1000:.0f} ms (peak RSS +{grown:.0f} MB), "
+          f"cancelled in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--turn-seconds", type=float, default=90.0)
+    parser.add_argument("--move-every", type=float, default=10.0, help="mean seconds between moves per game")
+    parser.add_argument("--seconds", type=float, default=60.0, help="simulated play")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rss = peak_rss_mb()
+    replay(args.games, args.turn_seconds, args.move_every, args.seconds, args.seed)
+    print(f"wheel: peak RSS +{peak_rss_mb() - rss:.0f} MB")
+    for pending in (1_000, args.games):
+        empty_ticks(pending, 10_000)
+    asyncio.run(sleeping_tasks(args.games, args.turn_seconds))
+
+
+if __name__ == "__main__":
+    main()
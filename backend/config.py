@@ -10,6 +10,40 @@ class Settings(BaseSettings):
     cors_origins: List[str] = ["http://localhost:5173"]
     session_timeout_seconds: int = 7200  # 2 hours
     stats_db_path: str = "data/cribbage_stats.db"
+    stats_db_read_pool_size: int = 4  # pooled reader connections per worker
+    stats_db_read_timeout_seconds: float = 5.0  # wait for a free reader before answering 503
+    stats_db_synchronous: str = "NORMAL"  # WAL + NORMAL: no fsync per commit, still crash-safe
+    stats_db_cache_kib: int = 20_000  # page cache per connection
+    stats_db_mmap_bytes: int = 268_435_456  # 256 MiB memory-mapped reads
+    stats_cache_size: int = 10_000  # cached get_stats responses (0 disables)
+    stats_cache_ttl_seconds: float = 60.0
+    stats_player_id_cache_size: int = 100_000  # cached player name -> id lookups
+    stats_write_batch_size: int = 200  # max games committed per transaction
+    stats_write_max_delay_ms: float = 5.0  # how long a batch waits to fill up
+    stats_write_durable: bool = True  # False: /stats/record returns before the commit
+    stats_write_retry_attempts: int = 5  # tries per batch before committing it game by game
+    stats_write_retry_backoff_ms: float = 100.0  # first retry delay, doubled after each failure
+    stats_retention_days: int = 365  # raw games older than this are compacted (0 keeps all)
+    stats_retention_batch_size: int = 5000  # games deleted per transaction
+    stats_maintenance_interval_seconds: float = 3600.0  # 0 disables the background job
+    matchmaking_rating_window: float = 100.0  # quick-match rating gap accepted at once
+    matchmaking_window_growth_per_second: float = 10.0  # widening while a player waits
+    matchmaking_max_rating_window: float = 600.0
+    matchmaking_tick_ms: float = 250.0  # batch pairing interval; 0 pairs each arrival at once
+    matchmaking_private_code_ttl_seconds: float = 900.0  # unclaimed join codes expire
+    matchmaking_ai_fallback_seconds: float = 30.0  # quick match vs. the computer after this (0: never)
+    multiplayer_ai_takeover_seconds: float = 20.0  # computer takes a dropped player's seat (0: never)
+    multiplayer_finished_game_ttl_seconds: float = 120.0  # finished games are freed after this
+    multiplayer_ai_workers: int = 4  # threads that compute computer moves
+    multiplayer_turn_seconds: float = 90.0  # then the move is made for the player (0: no limit)
+    multiplayer_game_seconds: float = 3600.0  # then the trailing player forfeits (0: no limit)
+    multiplayer_forfeit_after_timeouts: int = 3  # turn timeouts in a row before a forfeit
+    timing_wheel_tick_ms: float = 100.0
+    timing_wheel_slots: int = 512
+    session_backend: str = "memory"  # "memory" or "sqlite" (shared across workers)
+    session_db_path: str = "data/cribbage_sessions.db"
+    action_log_path: str = "data/game_actions.log"  # memory backend only; empty disables recovery
+    action_log_compact_after: int = 500  # finished games before the log is rewritten
 
 
 settings = Settings()
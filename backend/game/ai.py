@@ -9,6 +9,10 @@ from .scoring import calculate_play_score, calculate_score
 
 
 class BaseAI:
+    def __init__(self, rng: random.Random | None = None):
+        # Owning engines pass their seeded RNG so AI choices replay exactly.
+        self.rng = rng or random.Random()
+
     def choose_discards(self, hand: list[Card], is_dealer: bool) -> list[int]:
         raise NotImplementedError
 
@@ -29,10 +33,10 @@ class EasyAI(BaseAI):
     """Random discards, random play."""
 
     def choose_discards(self, hand: list[Card], is_dealer: bool) -> list[int]:
-        return sorted(random.sample(range(len(hand)), 2))
+        return sorted(self.rng.sample(range(len(hand)), 2))
 
     def _pick_play(self, hand: list[Card], playable: list[int], play_pile: list[Card], running_total: int) -> int:
-        return random.choice(playable)
+        return self.rng.choice(playable)
 
 
 class MediumAI(BaseAI):
@@ -46,7 +50,7 @@ class MediumAI(BaseAI):
         all_cards = create_deck()
         hand_set = set(hand)
         remaining_deck = [c for c in all_cards if c not in hand_set]
-        sample = random.sample(remaining_deck, min(self._SAMPLE_SIZE, len(remaining_deck)))
+        sample = self.rng.sample(remaining_deck, min(self._SAMPLE_SIZE, len(remaining_deck)))
 
         best_avg = -1.0
         best_indices: list[int] = [0, 1]
@@ -80,8 +84,8 @@ class MediumAI(BaseAI):
         # Avoid leaving total at 5 or 21 (easy 15/31 for opponent)
         safe = [i for i in playable if running_total + hand[i].value not in (5, 21)]
         if safe:
-            return random.choice(safe)
-        return random.choice(playable)
+            return self.rng.choice(safe)
+        return self.rng.choice(playable)
 
 
 class HardAI(BaseAI):
@@ -182,14 +186,14 @@ class HardAI(BaseAI):
             scored.append((i, pts, penalty))
 
         # Pick: highest (pts - penalty), break ties randomly
-        scored.sort(key=lambda x: (x[1] - x[2], random.random()), reverse=True)
+        scored.sort(key=lambda x: (x[1] - x[2], self.rng.random()), reverse=True)
         return scored[0][0]
 
 
-def create_ai(difficulty: AIDifficulty) -> BaseAI:
+def create_ai(difficulty: AIDifficulty, rng: random.Random | None = None) -> BaseAI:
     if difficulty == AIDifficulty.EASY:
-        return EasyAI()
+        return EasyAI(rng)
     elif difficulty == AIDifficulty.MEDIUM:
-        return MediumAI()
+        return MediumAI(rng)
     else:
-        return HardAI()
+        return HardAI(rng)
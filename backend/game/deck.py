@@ -21,9 +21,10 @@ def create_deck() -> list[Card]:
     return [create_card(suit, rank) for suit in SUITS for rank in RANKS]
 
 
-def shuffle_deck(deck: list[Card]) -> list[Card]:
+def shuffle_deck(deck: list[Card], rng: random.Random | None = None) -> list[Card]:
+    """Return a shuffled copy. Pass a seeded `rng` for a reproducible deal."""
     shuffled = deck.copy()
-    random.shuffle(shuffled)
+    (rng or random).shuffle(shuffled)
     return shuffled
 
 
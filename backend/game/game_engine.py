@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
+import random
 import uuid
+from typing import Callable
 
 from .ai import BaseAI, create_ai
 from .constants import WINNING_SCORE
@@ -17,6 +19,7 @@ from .models import (
     OpponentView,
     PlayerState,
     PlayerView,
+    RecordGameRequest,
     ScoreBreakdown,
     ScoreEvent,
 )
@@ -25,8 +28,15 @@ from .scoring import calculate_score
 
 
 class GameEngine:
-    def __init__(self, player_name: str, ai_difficulty: AIDifficulty):
+    def __init__(
+        self,
+        player_name: str,
+        ai_difficulty: AIDifficulty,
+        seed: int | None = None,
+        auto_count: bool = False,
+    ):
         self.game_id = str(uuid.uuid4())
+        self.version = 0  # bumped by the session store on every save
         self.phase = GamePhase.DISCARD
         self.round_number = 1
 
@@ -34,7 +44,12 @@ class GameEngine:
         self.computer = PlayerState(name="Computer", is_dealer=True)
         # Human starts as non-dealer (computer deals first)
 
-        self.ai: BaseAI = create_ai(ai_difficulty)
+        # Every shuffle and AI choice draws from this RNG, so the seed plus the
+        # sequence of human actions reproduces the whole game.
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+
+        self.ai: BaseAI = create_ai(ai_difficulty, self.rng)
         self.ai_difficulty = ai_difficulty
 
         self.deck: list[Card] = []
@@ -48,10 +63,13 @@ class GameEngine:
         self.computer_play_hand: list[Card] = []
         self.current_turn: str = ""  # "human" or "computer"
         self.last_go_by: str | None = None  # who said Go last
+        self.last_played_by: str | None = None  # who played the last card in the pile
 
         self.last_action: LastAction | None = None
         self.action_log: list[LastAction] = []
         self.score_breakdown: ScoreBreakdown | None = None
+        self.score_breakdowns: list[ScoreBreakdown] = []  # every count from the last acknowledge
+        self.auto_count = auto_count  # score all three counting phases in one acknowledge
         self.winner: str | None = None
 
         # Stats tracking for human player
@@ -59,6 +77,10 @@ class GameEngine:
         self.crib_scores: list[int] = []
         self.highest_hand_score: int = 0
 
+        # Called once with the result rows when the game ends (see emit_game_over).
+        self.on_game_over: Callable[[list[RecordGameRequest]], None] | None = None
+        self.stats_recorded = False
+
         self._deal_round()
 
     @property
@@ -76,7 +98,7 @@ class GameEngine:
 
     def _deal_round(self) -> None:
         """Shuffle, deal 6 to each, reset play state."""
-        self.deck = shuffle_deck(create_deck())
+        self.deck = shuffle_deck(create_deck(), self.rng)
         human_cards, self.deck = deal(self.deck, 6)
         computer_cards, self.deck = deal(self.deck, 6)
         self.human.hand = human_cards
@@ -100,21 +122,48 @@ class GameEngine:
 
     def _check_winner(self) -> bool:
         if self.human.score >= WINNING_SCORE:
-            self.winner = self.human.name
-            self.phase = GamePhase.GAME_OVER
+            self._end_game(self.human)
             return True
         if self.computer.score >= WINNING_SCORE:
-            self.winner = self.computer.name
-            self.phase = GamePhase.GAME_OVER
+            self._end_game(self.computer)
             return True
         return False
 
+    def _end_game(self, winner: PlayerState) -> None:
+        self.winner = winner.name
+        self.phase = GamePhase.GAME_OVER
+        self.emit_game_over()
+
+    def emit_game_over(self) -> None:
+        """Pass the finished game's results to `on_game_over`, at most once."""
+        if self.on_game_over is None or self.stats_recorded or self.phase != GamePhase.GAME_OVER:
+            return
+        self.stats_recorded = True
+        self.on_game_over(self.game_results())
+
+    def game_results(self) -> list[RecordGameRequest]:
+        """The stats row for the human player of a finished game."""
+        return [RecordGameRequest(
+            player_name=self.human.name,
+            opponent_name=self.computer.name,
+            player_score=self.human.score,
+            opponent_score=self.computer.score,
+            won=self.human.score >= WINNING_SCORE,
+            ai_difficulty=self.ai_difficulty.value,
+            game_mode="single",
+            hand_scores=self.hand_scores,
+            crib_scores=self.crib_scores,
+            highest_hand_score=self.highest_hand_score,
+            total_points_scored=self.human.score,
+        )]
+
     def _add_score(self, player: PlayerState, points: int) -> None:
         player.score += points
 
     def discard(self, card_indices: list[int]) -> GameStateResponse:
         """Human discards 2 cards to crib."""
         self.action_log = []
+        self.score_breakdowns = []
         if self.phase != GamePhase.DISCARD:
             raise ValueError(f"Cannot discard in phase {self.phase}")
         if len(card_indices) != 2:
@@ -178,6 +227,7 @@ class GameEngine:
         # Play the card
         self.human_play_hand.pop(card_index)
         self.play_pile.append(card)
+        self.last_played_by = "human"
         self.running_total += card.value
 
         # Score
@@ -243,9 +293,12 @@ class GameEngine:
 
     def _handle_go(self, who_said_go: str) -> None:
         """Process a Go."""
-        if self.last_go_by is not None and self.last_go_by != who_said_go:
-            # Both said go — last card point, reset
-            other = self.human if who_said_go == "computer" else self.computer
+        # An opponent with no cards left can't answer the Go, so the count ends
+        # here too (otherwise the turn bounces back to a player who can't play).
+        other_hand = self.computer_play_hand if who_said_go == "human" else self.human_play_hand
+        if (self.last_go_by is not None and self.last_go_by != who_said_go) or not other_hand:
+            # Both said go — last card point to whoever played last, reset
+            other = self.human if self.last_played_by == "human" else self.computer
             self._add_score(other, 1)
             self._log_action(LastAction(
                 actor=other.name,
@@ -300,6 +353,7 @@ class GameEngine:
 
             card = self.computer_play_hand.pop(idx)
             self.play_pile.append(card)
+            self.last_played_by = "computer"
             self.running_total += card.value
 
             from .scoring import calculate_play_score
@@ -363,8 +417,19 @@ class GameEngine:
         self.phase = GamePhase.COUNT_NON_DEALER
 
     def acknowledge(self) -> GameStateResponse:
-        """Advance through counting phases."""
+        """Advance through counting phases.
+
+        With `auto_count`, a single call scores non-dealer, dealer and crib.
+        """
         self.action_log = []
+        self.score_breakdowns = []
+        self._count_step()
+        while self.auto_count and self.phase in (GamePhase.COUNT_DEALER, GamePhase.COUNT_CRIB):
+            self._count_step()
+        return self.get_state()
+
+    def _count_step(self) -> None:
+        """Score the hand (or crib) for the current counting phase."""
         if self.phase == GamePhase.COUNT_NON_DEALER:
             score, events = calculate_score(self.non_dealer.hand, self.starter)
             for e in events:
@@ -376,6 +441,7 @@ class GameEngine:
                 items=events,
                 total=score,
             )
+            self.score_breakdowns.append(self.score_breakdown)
             self._log_action(LastAction(
                 actor=self.non_dealer.name,
                 action="score",
@@ -387,7 +453,7 @@ class GameEngine:
                 self.hand_scores.append(score)
                 self.highest_hand_score = max(self.highest_hand_score, score)
             if self._check_winner():
-                return self.get_state()
+                return
             self.phase = GamePhase.COUNT_DEALER
 
         elif self.phase == GamePhase.COUNT_DEALER:
@@ -401,6 +467,7 @@ class GameEngine:
                 items=events,
                 total=score,
             )
+            self.score_breakdowns.append(self.score_breakdown)
             self._log_action(LastAction(
                 actor=self.dealer.name,
                 action="score",
@@ -412,7 +479,7 @@ class GameEngine:
                 self.hand_scores.append(score)
                 self.highest_hand_score = max(self.highest_hand_score, score)
             if self._check_winner():
-                return self.get_state()
+                return
             self.phase = GamePhase.COUNT_CRIB
 
         elif self.phase == GamePhase.COUNT_CRIB:
@@ -426,6 +493,7 @@ class GameEngine:
                 items=events,
                 total=score,
             )
+            self.score_breakdowns.append(self.score_breakdown)
             self._log_action(LastAction(
                 actor=self.dealer.name,
                 action="score",
@@ -436,7 +504,7 @@ class GameEngine:
             if self.dealer is self.human:
                 self.crib_scores.append(score)
             if self._check_winner():
-                return self.get_state()
+                return
 
             # Start new round — swap dealer
             self.human.is_dealer = not self.human.is_dealer
@@ -446,8 +514,6 @@ class GameEngine:
         else:
             raise ValueError(f"Cannot acknowledge in phase {self.phase}")
 
-        return self.get_state()
-
     def get_state(self) -> GameStateResponse:
         """Build the client-visible game state."""
         # During play phase, show the play hand; otherwise the scoring hand
@@ -489,7 +555,11 @@ class GameEngine:
             last_action=self.last_action,
             action_log=self.action_log,
             score_breakdown=self.score_breakdown,
+            score_breakdowns=self.score_breakdowns,
             winner=self.winner,
             round_number=self.round_number,
             game_stats=game_stats,
+            stats_recorded=self.stats_recorded,
+            # The seed predicts every deal, so the player only sees it once the game is over.
+            seed=self.seed if self.phase == GamePhase.GAME_OVER else None,
         )
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from enum import Enum
-from typing import Optional
+from typing import Annotated, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -113,15 +113,20 @@ class GameStateResponse(BaseModel):
     last_action: Optional[LastAction] = None
     action_log: list[LastAction] = Field(default_factory=list)
     score_breakdown: Optional[ScoreBreakdown] = None
+    score_breakdowns: list[ScoreBreakdown] = Field(default_factory=list)  # all counts when auto_count is on
     winner: Optional[str] = None
     round_number: int = 1
     your_turn: bool = True
     game_stats: Optional[GameStatsData] = None
+    stats_recorded: bool = False  # the server already saved this game's stats
+    seed: Optional[int] = None  # replays the exact game when passed to NewGameRequest
 
 
 class NewGameRequest(BaseModel):
     player_name: str = "Player"
     ai_difficulty: AIDifficulty = AIDifficulty.EASY
+    seed: Optional[int] = None  # fixed RNG seed for reproducible games
+    auto_count: bool = False  # one acknowledge scores non-dealer, dealer and crib
 
 
 class DiscardRequest(BaseModel):
@@ -132,6 +137,31 @@ class PlayCardRequest(BaseModel):
     card_index: int
 
 
+class GameAction(BaseModel):
+    """One step of a batched request; fields mirror the single-action requests."""
+    type: Literal["discard", "play", "go", "acknowledge"]
+    card_indices: Optional[list[int]] = None  # for "discard"
+    card_index: Optional[int] = None  # for "play"
+
+
+# A whole round is about a dozen actions; the cap bounds the work one request can queue.
+MAX_BATCH_ACTIONS = 64
+
+
+class BatchActionRequest(BaseModel):
+    # Applied in order, all or nothing.
+    actions: list[GameAction] = Field(min_length=1, max_length=MAX_BATCH_ACTIONS)
+
+
+class BatchActionResponse(BaseModel):
+    state: GameStateResponse
+    events: list[LastAction] = Field(default_factory=list)  # every action's log, in order
+
+
+# The best possible cribbage hand scores 29; stats store one byte per hand.
+HandScore = Annotated[int, Field(ge=0, le=29)]
+
+
 class RecordGameRequest(BaseModel):
     player_name: str
     opponent_name: str
@@ -140,8 +170,8 @@ class RecordGameRequest(BaseModel):
     won: bool
     ai_difficulty: Optional[str] = None
     game_mode: str = "single"  # "single" or "multiplayer"
-    hand_scores: list[int] = Field(default_factory=list)
-    crib_scores: list[int] = Field(default_factory=list)
+    hand_scores: list[HandScore] = Field(default_factory=list)
+    crib_scores: list[HandScore] = Field(default_factory=list)
     highest_hand_score: int = 0
     total_points_scored: int = 0
 
@@ -167,3 +197,20 @@ class PlayerStatsResponse(BaseModel):
     current_streak: int  # positive = win streak, negative = loss streak
     best_win_streak: int
     per_difficulty: list[DifficultyStats] = Field(default_factory=list)
+    rating: Optional[float] = None  # Elo; None until the first recorded game
+    rank: Optional[int] = None  # position by rating, 1 = best
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    player_name: str
+    value: float  # win rate in percent, or the points / hand score
+    games: int
+    wins: int
+
+
+class LeaderboardResponse(BaseModel):
+    metric: str
+    difficulty: Optional[str] = None
+    entries: list[LeaderboardEntry] = Field(default_factory=list)
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
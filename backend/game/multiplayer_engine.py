@@ -1,13 +1,28 @@
-"""Multiplayer game engine — two humans, turn validation, per-player views."""
+"""Multiplayer game engine — two humans, turn validation, per-player views.
+
+A seat can be handed to the computer (`seat_ai`), for a quick match that
+found nobody or a player who left; `ai_move` then plays its turns.
+
+Games can carry a turn clock and a game clock. The engine only keeps
+deadlines; the caller passes the time in and decides when to check
+(`check_clocks`). When a turn runs out, the move is made for whoever is
+holding the game up: their last two cards go to the crib, they play their
+first playable card or say Go, or the count is acknowledged.
+`forfeit_after` timeouts in a row forfeit the game. When the game clock
+runs out, the trailing player forfeits; on a tie the dealer does.
+"""
 
 from __future__ import annotations
 
+import random
 import uuid
-from typing import Optional
+from typing import Callable, Optional
 
+from .ai import BaseAI, create_ai
 from .constants import WINNING_SCORE
 from .deck import create_deck, deal, shuffle_deck
 from .models import (
+    AIDifficulty,
     Card,
     GamePhase,
     GameStateResponse,
@@ -16,6 +31,7 @@ from .models import (
     OpponentView,
     PlayerState,
     PlayerView,
+    RecordGameRequest,
     ScoreBreakdown,
     ScoreEvent,
 )
@@ -24,8 +40,19 @@ from .scoring import calculate_play_score, calculate_score
 
 
 class MultiplayerGameEngine:
-    def __init__(self, player1_name: str, player2_name: str):
+    def __init__(
+        self,
+        player1_name: str,
+        player2_name: str,
+        seed: Optional[int] = None,
+        auto_count: bool = False,
+        turn_seconds: Optional[float] = None,
+        game_seconds: Optional[float] = None,
+        forfeit_after: int = 3,
+    ):
         self.game_id = str(uuid.uuid4())
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
         self.phase = GamePhase.DISCARD
         self.round_number = 1
 
@@ -42,6 +69,7 @@ class MultiplayerGameEngine:
         self.player2_play_hand: list[Card] = []
         self.current_turn: str = ""  # "player1" or "player2"
         self.last_go_by: Optional[str] = None
+        self.last_played_by: Optional[str] = None  # player_id of the last card in the pile
 
         # Track who has discarded
         self.player1_discarded: bool = False
@@ -49,7 +77,21 @@ class MultiplayerGameEngine:
 
         self.last_action: Optional[LastAction] = None
         self.score_breakdown: Optional[ScoreBreakdown] = None
+        self.score_breakdowns: list[ScoreBreakdown] = []  # every count from the last acknowledge
+        self.auto_count = auto_count  # score all three counting phases in one acknowledge
         self.winner: Optional[str] = None
+        self.winner_id: Optional[str] = None  # "player1"/"player2"
+        self.ai_seats: dict[str, BaseAI] = {}  # player_id -> computer playing that seat
+        self.ai_difficulty: Optional[AIDifficulty] = None
+        self.abandoned_by: Optional[str] = None  # player_id of a human who left mid-game
+
+        # Clocks, in the caller's time base (None: no limit)
+        self.turn_seconds = turn_seconds
+        self.game_seconds = game_seconds
+        self.forfeit_after = forfeit_after
+        self.turn_deadline: Optional[float] = None
+        self.game_deadline: Optional[float] = None
+        self.timeouts = {"player1": 0, "player2": 0}  # turn timeouts in a row
 
         # Per-player stats tracking
         self.player1_hand_scores: list[int] = []
@@ -59,6 +101,10 @@ class MultiplayerGameEngine:
         self.player1_highest_hand: int = 0
         self.player2_highest_hand: int = 0
 
+        # Called once with both players' result rows when the game ends.
+        self.on_game_over: Optional[Callable[[list[RecordGameRequest]], None]] = None
+        self.stats_recorded = False
+
         self._deal_round()
 
     @property
@@ -83,7 +129,7 @@ class MultiplayerGameEngine:
         return self.player1_play_hand if player_id == "player1" else self.player2_play_hand
 
     def _deal_round(self) -> None:
-        self.deck = shuffle_deck(create_deck())
+        self.deck = shuffle_deck(create_deck(), self.rng)
         p1_cards, self.deck = deal(self.deck, 6)
         p2_cards, self.deck = deal(self.deck, 6)
         self.player1.hand = p1_cards
@@ -100,15 +146,182 @@ class MultiplayerGameEngine:
 
     def _check_winner(self) -> bool:
         if self.player1.score >= WINNING_SCORE:
-            self.winner = self.player1.name
-            self.phase = GamePhase.GAME_OVER
+            self._end_game(self.player1)
             return True
         if self.player2.score >= WINNING_SCORE:
-            self.winner = self.player2.name
-            self.phase = GamePhase.GAME_OVER
+            self._end_game(self.player2)
             return True
         return False
 
+    def _end_game(self, winner: PlayerState) -> None:
+        self.winner = winner.name
+        self.winner_id = "player1" if winner is self.player1 else "player2"
+        self.turn_deadline = self.game_deadline = None
+        self.phase = GamePhase.GAME_OVER
+        self.emit_game_over()
+
+    def emit_game_over(self) -> None:
+        """Pass both players' results to `on_game_over`, at most once."""
+        if self.on_game_over is None or self.stats_recorded or self.phase != GamePhase.GAME_OVER:
+            return
+        self.stats_recorded = True
+        self.on_game_over(self.game_results())
+
+    def game_results(self) -> list[RecordGameRequest]:
+        """One stats row per human player of a finished game.
+
+        Computer seats get no row. Against the computer, the human's row
+        names its difficulty, so the rating is computed against that strength.
+        A human who left and had their seat taken over still gets a row: the
+        game counts as their forfeit, whoever the computer went on to win it
+        for, and the opponent is rated against them rather than the computer.
+        """
+        winner_id, difficulty = self.winner_id, self.ai_difficulty
+        if self.abandoned_by is not None:
+            winner_id = "player2" if self.abandoned_by == "player1" else "player1"
+            difficulty = None
+        seats = (
+            ("player1", self.player1, self.player2, self.player1_hand_scores,
+             self.player1_crib_scores, self.player1_highest_hand),
+            ("player2", self.player2, self.player1, self.player2_hand_scores,
+             self.player2_crib_scores, self.player2_highest_hand),
+        )
+        return [
+            RecordGameRequest(
+                player_name=player.name,
+                opponent_name=opp.name,
+                player_score=player.score,
+                opponent_score=opp.score,
+                won=player_id == winner_id,
+                ai_difficulty=difficulty.value if difficulty else None,
+                game_mode="multiplayer",
+                hand_scores=hand_scores,
+                crib_scores=crib_scores,
+                highest_hand_score=highest,
+                total_points_scored=player.score,
+            )
+            for player_id, player, opp, hand_scores, crib_scores, highest in seats
+            if player_id not in self.ai_seats or player_id == self.abandoned_by
+        ]
+
+    def seat_ai(self, player_id: str, difficulty: AIDifficulty) -> None:
+        """Let the computer play `player_id`'s seat for the rest of the game.
+
+        The AI draws its own RNG from the game's, so seeded games replay.
+        """
+        self.ai_seats[player_id] = create_ai(difficulty, random.Random(self.rng.getrandbits(32)))
+        self.ai_difficulty = difficulty
+
+    def take_over(self, player_id: str, difficulty: AIDifficulty) -> None:
+        """Seat the computer for a human who left; the game is recorded as their forfeit."""
+        self.seat_ai(player_id, difficulty)
+        self.abandoned_by = player_id
+
+    def ai_move(self) -> bool:
+        """Make one move for a computer seat that is due to act; False if none is.
+
+        Counting is left to the human, who acknowledges each count.
+        """
+        for player_id, ai in self.ai_seats.items():
+            player = self._player_by_id(player_id)
+            if self.phase == GamePhase.DISCARD:
+                if not (self.player1_discarded if player_id == "player1" else self.player2_discarded):
+                    self.discard(player_id, ai.choose_discards(player.hand, player.is_dealer))
+                    return True
+            elif self.phase == GamePhase.PLAY and self.current_turn == player_id:
+                index = ai.choose_play(self._play_hand(player_id), self.play_pile, self.running_total)
+                if index is None:
+                    self.say_go(player_id)
+                else:
+                    self.play_card(player_id, index)
+                return True
+        return False
+
+    def start_clocks(self, now: float) -> None:
+        if self.game_seconds:
+            self.game_deadline = now + self.game_seconds
+        self.restart_turn_clock(now)
+
+    def restart_turn_clock(self, now: float) -> None:
+        """Give whoever is due to act a fresh turn, from `now`."""
+        if self.turn_seconds and self.phase != GamePhase.GAME_OVER:
+            self.turn_deadline = now + self.turn_seconds
+
+    def moved(self, player_id: str, now: float) -> None:
+        """Note a move by the player themselves: no timeouts in a row, new turn."""
+        self.timeouts[player_id] = 0
+        self.restart_turn_clock(now)
+
+    def next_deadline(self) -> Optional[float]:
+        deadlines = [d for d in (self.turn_deadline, self.game_deadline) if d is not None]
+        return min(deadlines) if deadlines else None
+
+    def due_players(self) -> list[str]:
+        """Human seats the game is waiting on."""
+        if self.phase == GamePhase.DISCARD:
+            due = [p for p, done in (("player1", self.player1_discarded), ("player2", self.player2_discarded)) if not done]
+        elif self.phase == GamePhase.PLAY:
+            due = [self.current_turn]
+        elif self.phase == GamePhase.GAME_OVER:
+            due = []
+        else:
+            due = ["player1", "player2"]  # either may acknowledge the count
+        return [p for p in due if p not in self.ai_seats]
+
+    def check_clocks(self, now: float) -> bool:
+        """Apply whatever timed out by `now`; True if the game changed."""
+        if self.phase == GamePhase.GAME_OVER:
+            return False
+        if self.game_deadline is not None and now >= self.game_deadline:
+            if self.player1.score != self.player2.score:
+                trailing = "player1" if self.player1.score < self.player2.score else "player2"
+            else:
+                trailing = "player1" if self.player1.is_dealer else "player2"
+            self.forfeit(trailing)
+            return True
+        if self.turn_deadline is None or now < self.turn_deadline:
+            return False
+        # Every human the game was waiting on is charged; in a count phase
+        # that is both, since either could have acknowledged.
+        due = self.due_players()
+        for player_id in due:
+            self.timeouts[player_id] += 1
+        out = [p for p in due if self.timeouts[p] >= self.forfeit_after]
+        if out:
+            self.forfeit(max(out, key=self.timeouts.__getitem__))
+            return True
+        if self.phase in (GamePhase.COUNT_NON_DEALER, GamePhase.COUNT_DEALER, GamePhase.COUNT_CRIB):
+            due = due[:1]  # one acknowledge moves the count on
+        for player_id in due:
+            if self.phase == GamePhase.GAME_OVER:
+                break
+            self._timeout_move(player_id)
+        self.restart_turn_clock(now)
+        return True
+
+    def _timeout_move(self, player_id: str) -> None:
+        if self.phase == GamePhase.DISCARD:
+            hand = self._player_by_id(player_id).hand
+            self.discard(player_id, [len(hand) - 2, len(hand) - 1])
+        elif self.phase == GamePhase.PLAY:
+            hand = self._play_hand(player_id)
+            playable = [i for i, c in enumerate(hand) if c.value + self.running_total <= 31]
+            if playable:
+                self.play_card(player_id, playable[0])
+            else:
+                self.say_go(player_id)
+        else:
+            self.acknowledge(player_id)
+
+    def forfeit(self, player_id: str) -> None:
+        """End the game with `player_id` losing."""
+        player = self._player_by_id(player_id)
+        self.last_action = LastAction(
+            actor=player.name, action="forfeit", card=None,
+            score_events=[], message=f"{player.name} forfeits",
+        )
+        self._end_game(self._opponent_by_id(player_id))
+
     def discard(self, player_id: str, card_indices: list[int]) -> GameStateResponse:
         if self.phase != GamePhase.DISCARD:
             raise ValueError("Cannot discard now")
@@ -119,6 +332,7 @@ class MultiplayerGameEngine:
         already = self.player1_discarded if player_id == "player1" else self.player2_discarded
         if already:
             raise ValueError("Already discarded")
+        self.score_breakdowns = []
 
         discarded = [player.hand[i] for i in sorted(card_indices, reverse=True)]
         for i in sorted(card_indices, reverse=True):
@@ -163,6 +377,7 @@ class MultiplayerGameEngine:
 
         hand.pop(card_index)
         self.play_pile.append(card)
+        self.last_played_by = player_id
         self.running_total += card.value
 
         events = calculate_play_score(self.play_pile, self.running_total)
@@ -231,10 +446,8 @@ class MultiplayerGameEngine:
         return self.get_state(player_id)
 
     def _handle_go_both(self) -> None:
-        if self.play_pile and self.last_action:
-            target_name = self.last_action.actor
-            target = self.player1 if target_name == self.player1.name else self.player2
-            target.score += 1
+        if self.play_pile and self.last_played_by:
+            self._player_by_id(self.last_played_by).score += 1
             self._check_winner()
         self.play_pile = []
         self.running_total = 0
@@ -242,6 +455,9 @@ class MultiplayerGameEngine:
 
         if not self.player1_play_hand and not self.player2_play_hand:
             self._end_play_phase()
+        elif not self._play_hand(self.current_turn):
+            # The player on turn is out of cards, so the other one leads the next count.
+            self.current_turn = "player2" if self.current_turn == "player1" else "player1"
 
     def _end_play_phase(self) -> None:
         if self.running_total > 0 and self.last_action:
@@ -268,6 +484,14 @@ class MultiplayerGameEngine:
             self.player2_crib_scores.append(score)
 
     def acknowledge(self, player_id: str) -> GameStateResponse:
+        """Advance through counting phases (all three at once with `auto_count`)."""
+        self.score_breakdowns = []
+        self._count_step()
+        while self.auto_count and self.phase in (GamePhase.COUNT_DEALER, GamePhase.COUNT_CRIB):
+            self._count_step()
+        return self.get_state(player_id)
+
+    def _count_step(self) -> None:
         if self.phase == GamePhase.COUNT_NON_DEALER:
             score, events = calculate_score(self.non_dealer.hand, self.starter)
             for e in events:
@@ -276,9 +500,10 @@ class MultiplayerGameEngine:
             self.score_breakdown = ScoreBreakdown(
                 hand=self.non_dealer.hand, starter=self.starter, items=events, total=score
             )
+            self.score_breakdowns.append(self.score_breakdown)
             self._track_hand_score(self.non_dealer, score)
             if self._check_winner():
-                return self.get_state(player_id)
+                return
             self.phase = GamePhase.COUNT_DEALER
 
         elif self.phase == GamePhase.COUNT_DEALER:
@@ -289,9 +514,10 @@ class MultiplayerGameEngine:
             self.score_breakdown = ScoreBreakdown(
                 hand=self.dealer.hand, starter=self.starter, items=events, total=score
             )
+            self.score_breakdowns.append(self.score_breakdown)
             self._track_hand_score(self.dealer, score)
             if self._check_winner():
-                return self.get_state(player_id)
+                return
             self.phase = GamePhase.COUNT_CRIB
 
         elif self.phase == GamePhase.COUNT_CRIB:
@@ -302,17 +528,16 @@ class MultiplayerGameEngine:
             self.score_breakdown = ScoreBreakdown(
                 hand=self.crib, starter=self.starter, items=events, total=score
             )
+            self.score_breakdowns.append(self.score_breakdown)
             self._track_crib_score(self.dealer, score)
             if self._check_winner():
-                return self.get_state(player_id)
+                return
             # Swap dealer, new round
             self.player1.is_dealer = not self.player1.is_dealer
             self.player2.is_dealer = not self.player2.is_dealer
             self.round_number += 1
             self._deal_round()
 
-        return self.get_state(player_id)
-
     def get_state(self, player_id: str) -> GameStateResponse:
         player = self._player_by_id(player_id)
         opp = self._opponent_by_id(player_id)
@@ -359,8 +584,12 @@ class MultiplayerGameEngine:
             running_total=self.running_total,
             last_action=self.last_action,
             score_breakdown=self.score_breakdown,
+            score_breakdowns=self.score_breakdowns,
             winner=self.winner,
             round_number=self.round_number,
             your_turn=your_turn,
             game_stats=game_stats,
+            stats_recorded=self.stats_recorded,
+            # The seed predicts every deal, so players only see it once the game is over.
+            seed=self.seed if self.phase == GamePhase.GAME_OVER else None,
         )
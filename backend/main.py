@@ -1,14 +1,42 @@
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from backend.api.routes_game import router as game_router
 from backend.api.routes_lobby import router as lobby_router
 from backend.api.routes_stats import router as stats_router
+from backend.api.websocket_handler import manager
 from backend.config import settings
+from backend.services.action_log import action_log
+from backend.services.matchmaking import matchmaking
+from backend.services.session_manager import session_manager
+from backend.services.stats_db import stats_db
+from backend.services.stats_maintenance import stats_maintenance
+from backend.services.stats_writer import stats_writer
+from backend.services.timing_wheel import timing_wheel
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    action_log.recover(session_manager)  # a no-op unless sessions live in memory
+    await stats_writer.start()
+    await stats_maintenance.start()
+    await timing_wheel.start()
+    await matchmaking.start(manager.start_match)
+    yield
+    await matchmaking.close()
+    await manager.close()
+    await timing_wheel.close()
+    await stats_maintenance.close()
+    await stats_writer.close()
+    action_log.close()
 
-app = FastAPI(title=settings.app_name)
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,3 +54,14 @@ app.include_router(stats_router)
 @app.get("/health")
 def health() -> dict[str, str]:
     return {"status": "ok"}
+
+
+@app.get("/metrics")
+def metrics() -> dict[str, Any]:
+    return {
+        "stats_writer": stats_writer.metrics(),
+        "stats_cache": stats_db.cache_metrics(),
+        "stats_maintenance": stats_maintenance.metrics(),
+        "matchmaking": matchmaking.metrics(),
+        "timing_wheel": timing_wheel.metrics(),
+    }
@@ -0,0 +1,208 @@
+"""Append-only action log for crash recovery of single-player games.
+
+Every game is fully determined by its seed and the ordered list of human
+actions, so the log stores one JSON line per event:
+
+    {"game_id": ..., "op": "new", "player_name": ..., "ai_difficulty": ..., "seed": ...}
+    {"game_id": ..., "op": "discard", "args": {"card_indices": [0, 1]}}
+    {"game_id": ..., "op": "end"}
+
+Appends are group-committed: a writer thread drains everything queued
+while the previous fsync was running and makes it durable with a single
+write + fsync. On startup `recover` replays live games through the engine
+and compacts the log down to those games.
+
+Only the in-memory session store needs this; SQLite sessions survive a
+restart on their own, so the log is off with that backend. The log is
+owned by one process, as the in-memory store is: compaction swaps in a
+rewritten file, which another process appending to the old one would miss.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Iterator, Optional
+
+from backend.config import settings
+from backend.game.game_engine import GameEngine
+from backend.game.models import AIDifficulty
+from backend.services.stats_writer import record_results
+
+logger = logging.getLogger(__name__)
+
+REPLAYABLE_OPS = ("discard", "play_card", "say_go", "acknowledge")
+
+
+class ActionLog:
+    def __init__(self, path: str | None = None):
+        if path is None:
+            path = settings.action_log_path if settings.session_backend == "memory" else ""
+        self.path = path
+        self.enabled = bool(self.path)
+        self._cond = threading.Condition()
+        self._pending: list[str] = []
+        self._next_seq = 1  # sequence number of the next appended record
+        self._durable_seq = 0  # highest sequence number known to be on disk
+        self._ended: set[str] = set()  # finished games not yet compacted away
+        self._closed = False
+        self._file = None
+        self._writer: Optional[threading.Thread] = None
+
+    # --- Appending ---
+
+    def log_new_game(self, engine: GameEngine) -> None:
+        self.append({
+            "game_id": engine.game_id,
+            "op": "new",
+            "player_name": engine.human.name,
+            "ai_difficulty": engine.ai_difficulty.value,
+            "seed": engine.seed,
+            "auto_count": engine.auto_count,
+            "ranked": engine.on_game_over is not None,
+        })
+
+    def log_action(self, game_id: str, op: str, args: dict[str, Any], wait: bool = True) -> None:
+        self.append({"game_id": game_id, "op": op, "args": args}, wait=wait)
+
+    def log_end(self, game_id: str) -> None:
+        self.append({"game_id": game_id, "op": "end"})
+
+    def append(self, record: dict[str, Any], wait: bool = True) -> None:
+        """Queue a record; with `wait`, block until it has been fsynced."""
+        if not self.enabled:
+            return
+        record["ts"] = time.time()
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Action log is closed")
+            self._ensure_writer()
+            self._pending.append(line)
+            seq = self._next_seq
+            self._next_seq += 1
+            if record["op"] == "end":
+                self._ended.add(record["game_id"])
+            self._cond.notify_all()
+            if wait:
+                while self._durable_seq < seq:
+                    self._cond.wait()
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._writer = threading.Thread(target=self._run_writer, name="action-log", daemon=True)
+            self._writer.start()
+
+    def _run_writer(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                batch, self._pending = self._pending, []
+                last_seq = self._next_seq - 1
+                compact = len(self._ended) >= settings.action_log_compact_after
+            # One write + fsync covers every request that queued meanwhile.
+            self._file.write("".join(batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            if compact:
+                self._compact_ended()
+            with self._cond:
+                self._durable_seq = last_seq
+                self._cond.notify_all()
+
+    def close(self) -> None:
+        """Flush pending records and stop the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+            self._file.close()
+
+    # --- Reading, recovery and compaction ---
+
+    def read(self) -> Iterator[dict[str, Any]]:
+        if not self.enabled or not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash mid-write; nothing after it was acknowledged.
+                    return
+
+    def _live_games(self) -> dict[str, list[dict[str, Any]]]:
+        """Group records by game, dropping finished and expired games."""
+        games: dict[str, list[dict[str, Any]]] = {}
+        for record in self.read():
+            gid = record["game_id"]
+            if record["op"] == "end":
+                games.pop(gid, None)
+            elif record["op"] == "new" or gid in games:
+                games.setdefault(gid, []).append(record)
+        cutoff = time.time() - settings.session_timeout_seconds
+        return {gid: recs for gid, recs in games.items() if recs[-1]["ts"] >= cutoff}
+
+    @staticmethod
+    def replay(records: list[dict[str, Any]]) -> GameEngine:
+        """Rebuild an engine by re-running its logged actions."""
+        new = records[0]
+        engine = GameEngine(
+            player_name=new["player_name"],
+            ai_difficulty=AIDifficulty(new["ai_difficulty"]),
+            seed=new["seed"],
+            auto_count=new.get("auto_count", False),
+        )
+        engine.game_id = new["game_id"]
+        for record in records[1:]:
+            if record["op"] in REPLAYABLE_OPS:
+                getattr(engine, record["op"])(**record.get("args", {}))
+        return engine
+
+    def recover(self, store: Any) -> int:
+        """Replay live games into `store` and compact the log. Returns games restored."""
+        if not self.enabled:
+            return 0
+        live = self._live_games()
+        restored = 0
+        for gid, records in live.items():
+            try:
+                engine = self.replay(records)
+            except ValueError:
+                logger.warning("Could not replay game %s from action log", gid)
+                continue
+            if records[0].get("ranked", True):
+                engine.on_game_over = record_results
+            store.create(engine)
+            restored += 1
+        self._rewrite([r for records in live.values() for r in records])
+        return restored
+
+    def _rewrite(self, records: list[dict[str, Any]]) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _compact_ended(self) -> None:
+        """Drop finished games from the log (runs on the writer thread)."""
+        with self._cond:
+            ended, self._ended = self._ended, set()
+        self._file.close()
+        self._rewrite([r for r in self.read() if r["game_id"] not in ended])
+        self._file = open(self.path, "a", encoding="utf-8")
+
+
+action_log = ActionLog()
@@ -1,11 +1,44 @@
-"""Queue-based matchmaking and private game code generation."""
+"""Rating-aware matchmaking and private game code generation.
+
+Quick-match players wait in rating bands of `_BAND_WIDTH` points, each an
+insertion-ordered dict, so queueing and leaving are O(1). An arriving
+player is paired with the closest-rated waiting player whose search
+window covers the gap. A window starts at `matchmaking_rating_window`
+points and widens by `matchmaking_window_growth_per_second` while its
+owner waits, up to `matchmaking_max_rating_window`. Only the
+longest-waiting player of each band is a candidate, so a search visits
+at most a fixed number of bands no matter how many players are queued.
+
+With `matchmaking_tick_ms` set and the matchmaker started, arrivals are
+only queued, and a background task pairs the whole pool every tick (see
+`pair_waiting`). Otherwise each arrival is paired on the spot.
+
+Private join codes are drawn until one is not held by an open game, and
+expire `matchmaking_private_code_ttl_seconds` after they are issued. A
+min-heap of expiry times is swept whenever codes are created or joined,
+and by the WebSocket manager when a code's timer on the timing wheel fires.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import heapq
+import logging
+import math
 import random
 import string
-from collections import deque
-from typing import Optional
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from backend.config import settings
+from backend.services.stats_db import RATING_INITIAL
+
+logger = logging.getLogger(__name__)
+
+_BAND_WIDTH = 50.0  # rating points per queue band
+
+MatchHandler = Callable[[str, str], Awaitable[None]]
 
 
 def generate_join_code() -> str:
@@ -14,43 +47,287 @@ def generate_join_code() -> str:
 
 
 class MatchmakingQueue:
-    def __init__(self) -> None:
-        self._queue: deque[str] = deque()  # player connection IDs
-        self._private_games: dict[str, str] = {}  # join_code -> creator connection ID
+    def __init__(
+        self,
+        window: float | None = None,
+        growth_per_second: float | None = None,
+        max_window: float | None = None,
+        code_ttl: float | None = None,
+        tick_ms: float | None = None,
+    ) -> None:
+        self.window = settings.matchmaking_rating_window if window is None else window
+        self.growth = settings.matchmaking_window_growth_per_second if growth_per_second is None else growth_per_second
+        self.max_window = settings.matchmaking_max_rating_window if max_window is None else max_window
+        # band -> {connection ID: (rating, enqueue time)}, oldest first
+        self._bands: dict[int, OrderedDict[str, tuple[float, float]]] = {}
+        self._band_of: dict[str, int] = {}  # connection ID -> band
+        self.code_ttl = settings.matchmaking_private_code_ttl_seconds if code_ttl is None else code_ttl
+        self.tick = (settings.matchmaking_tick_ms if tick_ms is None else tick_ms) / 1000
+        # join_code -> (creator connection ID, expiry time)
+        self._private_games: dict[str, tuple[str, float]] = {}
+        self._private_codes: dict[str, str] = {}  # creator connection ID -> join_code
+        # (expiry time, join_code); entries of joined or cancelled games are
+        # skipped when they come up.
+        self._code_expiry: list[tuple[float, str]] = []
+        self._task: Optional[asyncio.Task[None]] = None
+        self._on_match: Optional[MatchHandler] = None
+        # Metrics
+        self._ticks = 0
+        self._tick_errors = 0
+        self._last_tick_pairs = 0
+        self._last_tick_seconds = 0.0
+        self._codes_issued = 0
+        self._codes_joined = 0
+        self._codes_expired = 0
+        self._code_collisions = 0
+        self._matches = 0
+        self._gap_total = 0.0
+        self._wait_total = 0.0
+
+    def __len__(self) -> int:
+        return len(self._band_of)
+
+    def __contains__(self, connection_id: str) -> bool:
+        return connection_id in self._band_of
 
-    def add_to_queue(self, connection_id: str) -> Optional[str]:
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self, on_match: MatchHandler) -> None:
+        """Pair the pool every tick, awaiting `on_match(a, b)` for each pair."""
+        if self._task is None and self.tick > 0:
+            self._on_match = on_match
+            self._task = asyncio.create_task(self._run(), name="matchmaker")
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                start = time.perf_counter()
+                pairs = self.pair_waiting()
+                # Games start concurrently; one failing doesn't hold up the rest.
+                results = await asyncio.gather(
+                    *(self._on_match(a, b) for a, b in pairs), return_exceptions=True
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        self._tick_errors += 1
+                        logger.error("Starting a matched game failed", exc_info=result)
+                self._ticks += 1
+                self._last_tick_pairs = len(pairs)
+                self._last_tick_seconds = time.perf_counter() - start
+            except Exception:
+                self._tick_errors += 1
+                logger.exception("Matchmaking tick failed")
+
+    def add_to_queue(
+        self, connection_id: str, rating: float = RATING_INITIAL, now: float | None = None
+    ) -> Optional[str]:
         """
         Add player to quick-match queue.
         Returns the other player's connection_id if a match is found, None otherwise.
+        Queueing again while already waiting changes nothing.
         """
-        if self._queue:
-            other = self._queue.popleft()
-            if other != connection_id:
-                return other
-        self._queue.append(connection_id)
+        if connection_id in self._band_of:
+            return None
+        now = time.monotonic() if now is None else now
+        match = self._find_opponent(rating, now)
+        if match is not None:
+            other_rating, enqueued_at = self._pop(match)
+            self._record_match(abs(other_rating - rating), now - enqueued_at)
+            return match
+        self.enqueue(connection_id, rating, now)
         return None
 
+    def enqueue(self, connection_id: str, rating: float = RATING_INITIAL, now: float | None = None) -> None:
+        """Queue a player without looking for an opponent (no-op if already queued)."""
+        if connection_id in self._band_of:
+            return
+        band = self._band(rating)
+        self._bands.setdefault(band, OrderedDict())[connection_id] = (
+            rating, time.monotonic() if now is None else now
+        )
+        self._band_of[connection_id] = band
+
+    def pair_waiting(self, now: float | None = None) -> list[tuple[str, str]]:
+        """Pair up the whole waiting pool at once and return the pairs.
+
+        Players are sorted by rating and only neighbours are paired, which
+        is where the closest pairs are. A dynamic program over the sorted
+        pool picks the pairing with the least total cost. A pair costs its
+        rating gap and must fit the longer window of the two. A player left
+        waiting costs their current window, so anyone who has waited long
+        is paired first. This is O(n log n) per tick.
+        """
+        now = time.monotonic() if now is None else now
+        pool = sorted(
+            (rating, enqueued_at, connection_id)
+            for members in self._bands.values()
+            for connection_id, (rating, enqueued_at) in members.items()
+        )
+        windows = [self.search_window(now - enqueued_at) for _, enqueued_at, _ in pool]
+        cost = [0.0] * (len(pool) + 1)  # cost[i]: best cost of the first i players
+        paired = [False] * (len(pool) + 1)  # the best of the first i pairs the last two
+        for i in range(1, len(pool) + 1):
+            cost[i] = cost[i - 1] + windows[i - 1]
+            if i >= 2:
+                gap = pool[i - 1][0] - pool[i - 2][0]
+                if gap <= max(windows[i - 1], windows[i - 2]) and cost[i - 2] + gap < cost[i]:
+                    cost[i] = cost[i - 2] + gap
+                    paired[i] = True
+        pairs = []
+        i = len(pool)
+        while i >= 2:
+            if not paired[i]:
+                i -= 1
+                continue
+            (rating_a, since_a, a), (rating_b, since_b, b) = pool[i - 2], pool[i - 1]
+            self._pop(a)
+            self._pop(b)
+            self._record_match(rating_b - rating_a, now - min(since_a, since_b))
+            pairs.append((a, b))
+            i -= 2
+        return pairs
+
+    def _record_match(self, gap: float, wait: float) -> None:
+        """Count a match; `wait` is that of the longer-waiting player."""
+        self._matches += 1
+        self._gap_total += gap
+        self._wait_total += wait
+
     def remove_from_queue(self, connection_id: str) -> None:
-        try:
-            self._queue.remove(connection_id)
-        except ValueError:
-            pass
+        if connection_id in self._band_of:
+            self._pop(connection_id)
+
+    def search_window(self, waited: float) -> float:
+        """Largest rating gap a player who has waited `waited` seconds accepts."""
+        return min(self.window + self.growth * waited, self.max_window)
+
+    def _find_opponent(self, rating: float, now: float) -> Optional[str]:
+        """The closest-rated band head whose window covers `rating` (older wins ties)."""
+        home = self._band(rating)
+        best: Optional[tuple[float, float, str]] = None  # (gap, enqueue time, connection ID)
+        for distance in range(math.ceil(self.max_window / _BAND_WIDTH) + 1):
+            for band in (home - distance, home + distance) if distance else (home,):
+                members = self._bands.get(band)
+                if not members:
+                    continue
+                connection_id, (other, enqueued_at) = next(iter(members.items()))
+                gap = abs(other - rating)
+                if gap <= self.search_window(now - enqueued_at):
+                    candidate = (gap, enqueued_at, connection_id)
+                    if best is None or candidate < best:
+                        best = candidate
+            # Bands further out are all at least this far away.
+            if best is not None and best[0] <= distance * _BAND_WIDTH:
+                break
+        return best[2] if best is not None else None
+
+    def _pop(self, connection_id: str) -> tuple[float, float]:
+        band = self._band_of.pop(connection_id)
+        members = self._bands[band]
+        entry = members.pop(connection_id)
+        if not members:
+            del self._bands[band]
+        return entry
 
-    def create_private_game(self, connection_id: str) -> str:
-        """Create a private game and return the join code."""
+    @staticmethod
+    def _band(rating: float) -> int:
+        return math.floor(rating / _BAND_WIDTH)
+
+    def create_private_game(self, connection_id: str, now: float | None = None) -> str:
+        """Create a private game and return the join code.
+
+        A connection has at most one open private game; creating another
+        cancels the previous code.
+        """
+        now = time.monotonic() if now is None else now
+        self.expire_private_games(now)
+        self.cancel_private_game(connection_id)
         code = generate_join_code()
-        self._private_games[code] = connection_id
+        while code in self._private_games:
+            self._code_collisions += 1
+            code = generate_join_code()
+        expires_at = now + self.code_ttl
+        self._private_games[code] = (connection_id, expires_at)
+        self._private_codes[connection_id] = code
+        heapq.heappush(self._code_expiry, (expires_at, code))
+        self._codes_issued += 1
         return code
 
-    def join_private_game(self, code: str) -> Optional[str]:
-        """Join a private game. Returns creator's connection_id or None."""
-        return self._private_games.pop(code.upper(), None)
+    def join_private_game(
+        self, code: str, now: float | None = None, joiner: Optional[str] = None
+    ) -> Optional[str]:
+        """Join a private game. Returns creator's connection_id or None.
+
+        Raises ValueError if `joiner` is the creator; the code stays open.
+        """
+        self.expire_private_games(time.monotonic() if now is None else now)
+        code = code.upper()
+        entry = self._private_games.get(code)
+        if entry is None:
+            return None
+        creator = entry[0]
+        if creator == joiner:
+            raise ValueError("You can't join your own game")
+        del self._private_games[code]
+        del self._private_codes[creator]
+        self._codes_joined += 1
+        return creator
+
+    def has_private_game(self, connection_id: str) -> bool:
+        return connection_id in self._private_codes
 
     def cancel_private_game(self, connection_id: str) -> None:
         """Cancel a private game by the creator."""
-        to_remove = [k for k, v in self._private_games.items() if v == connection_id]
-        for k in to_remove:
-            del self._private_games[k]
+        code = self._private_codes.pop(connection_id, None)
+        if code is not None:
+            del self._private_games[code]
+
+    def expire_private_games(self, now: float | None = None) -> list[str]:
+        """Close private games whose code has expired; returns their creators."""
+        now = time.monotonic() if now is None else now
+        expired = []
+        heap = self._code_expiry
+        while heap and heap[0][0] <= now:
+            expires_at, code = heapq.heappop(heap)
+            entry = self._private_games.get(code)
+            # The code may since have been joined, cancelled or reissued.
+            if entry is not None and entry[1] == expires_at:
+                del self._private_games[code]
+                del self._private_codes[entry[0]]
+                expired.append(entry[0])
+        self._codes_expired += len(expired)
+        return expired
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "queued": len(self),
+            "matches": self._matches,
+            "mean_rating_gap": round(self._gap_total / self._matches, 1) if self._matches else 0.0,
+            "mean_wait_seconds": round(self._wait_total / self._matches, 3) if self._matches else 0.0,
+            "running": self.running,
+            "ticks": self._ticks,
+            "tick_errors": self._tick_errors,
+            "last_tick_pairs": self._last_tick_pairs,
+            "last_tick_ms": round(self._last_tick_seconds * 1000, 3),
+            "private_games": len(self._private_games),
+            "codes_issued": self._codes_issued,
+            "codes_joined": self._codes_joined,
+            "codes_expired": self._codes_expired,
+            "code_collisions": self._code_collisions,
+        }
 
 
 matchmaking = MatchmakingQueue()
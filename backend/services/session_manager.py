@@ -1,18 +1,71 @@
-"""In-memory game session storage with TTL expiry."""
+"""Game session storage with TTL expiry.
+
+Two backends share the same interface:
+
+- `SessionManager` keeps engines in process memory (default, single worker).
+- `SQLiteSessionManager` pickles engines into a WAL-mode SQLite file so
+  several uvicorn workers can serve the same game.
+
+Every engine carries a `version` that the store bumps on each save. A save
+whose version no longer matches the stored one raises `SessionConflictError`
+(optimistic concurrency) instead of silently overwriting another worker.
+
+Within a process, `lock(game_id)` serializes actions on one game while
+unrelated games proceed in parallel.
+"""
 
 from __future__ import annotations
 
+import os
+import pickle
+import sqlite3
+import threading
 import time
-from typing import Optional
+from typing import Optional, Union
 
 from backend.config import settings
 from backend.game.game_engine import GameEngine
 
 
+class SessionConflictError(Exception):
+    """The session was modified by another request since it was loaded."""
+
+
+class GameLocks:
+    """Per-game mutexes, created on demand and dropped with the session."""
+
+    def __init__(self) -> None:
+        self._locks: dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def get(self, game_id: str) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(game_id)
+            if lock is None:
+                lock = self._locks[game_id] = threading.Lock()
+            return lock
+
+    def discard(self, game_id: str) -> None:
+        with self._guard:
+            self._locks.pop(game_id, None)
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
 class SessionManager:
     def __init__(self) -> None:
         self._sessions: dict[str, GameEngine] = {}
         self._last_accessed: dict[str, float] = {}
+        self._locks = GameLocks()
+
+    def lock(self, game_id: str) -> threading.Lock:
+        """Mutex that serializes load/mutate/save for one game."""
+        return self._locks.get(game_id)
+
+    def forget_lock(self, game_id: str) -> None:
+        """Drop the mutex of a game that turned out not to exist."""
+        self._locks.discard(game_id)
 
     def create(self, engine: GameEngine) -> str:
         self._sessions[engine.game_id] = engine
@@ -30,9 +83,19 @@ class SessionManager:
         self._last_accessed[game_id] = time.monotonic()
         return engine
 
+    def save(self, engine: GameEngine) -> None:
+        """Persist an engine after a mutation."""
+        stored = self._sessions.get(engine.game_id)
+        if stored is not None and stored is not engine and stored.version != engine.version:
+            raise SessionConflictError(f"Game {engine.game_id} was modified concurrently")
+        engine.version += 1
+        self._sessions[engine.game_id] = engine
+        self._last_accessed[engine.game_id] = time.monotonic()
+
     def delete(self, game_id: str) -> None:
         self._sessions.pop(game_id, None)
         self._last_accessed.pop(game_id, None)
+        self._locks.discard(game_id)
 
     def cleanup_expired(self) -> int:
         """Remove all expired sessions. Returns count of removed sessions."""
@@ -51,4 +114,114 @@ class SessionManager:
         return len(self._sessions)
 
 
-session_manager = SessionManager()
+class SQLiteSessionManager:
+    """Multi-process session store backed by a local SQLite file in WAL mode."""
+
+    def __init__(self, db_path: str | None = None):
+        self.db_path = db_path or settings.session_db_path
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._locks = GameLocks()
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    game_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    state BLOB NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+            """)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread: sync routes run in FastAPI's threadpool.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def lock(self, game_id: str) -> threading.Lock:
+        """Mutex that serializes load/mutate/save for one game in this worker.
+
+        Other workers are caught by the optimistic version check in `save`.
+        """
+        return self._locks.get(game_id)
+
+    def forget_lock(self, game_id: str) -> None:
+        """Drop the mutex of a game that turned out not to exist."""
+        self._locks.discard(game_id)
+
+    def create(self, engine: GameEngine) -> str:
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO sessions (game_id, version, state, last_accessed) VALUES (?, ?, ?, ?)",
+                (engine.game_id, engine.version, pickle.dumps(engine), time.time()),
+            )
+        return engine.game_id
+
+    def get(self, game_id: str) -> Optional[GameEngine]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT state, last_accessed FROM sessions WHERE game_id = ?", (game_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > settings.session_timeout_seconds:
+            self.delete(game_id)
+            return None
+        with conn:
+            conn.execute(
+                "UPDATE sessions SET last_accessed = ? WHERE game_id = ?", (now, game_id)
+            )
+        return pickle.loads(row[0])
+
+    def save(self, engine: GameEngine) -> None:
+        """Write back an engine, failing if another worker saved it first."""
+        expected = engine.version
+        engine.version += 1
+        with self._conn() as conn:
+            cur = conn.execute(
+                """UPDATE sessions SET state = ?, version = ?, last_accessed = ?
+                   WHERE game_id = ? AND version = ?""",
+                (pickle.dumps(engine), engine.version, time.time(), engine.game_id, expected),
+            )
+        if cur.rowcount == 0:
+            engine.version = expected
+            raise SessionConflictError(f"Game {engine.game_id} was modified concurrently")
+
+    def delete(self, game_id: str) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM sessions WHERE game_id = ?", (game_id,))
+        self._locks.discard(game_id)
+
+    def cleanup_expired(self) -> int:
+        """Remove all expired sessions. Returns count of removed sessions."""
+        cutoff = time.time() - settings.session_timeout_seconds
+        with self._conn() as conn:
+            expired = [
+                row[0] for row in conn.execute(
+                    "SELECT game_id FROM sessions WHERE last_accessed < ?", (cutoff,)
+                )
+            ]
+            conn.executemany(
+                "DELETE FROM sessions WHERE game_id = ?", [(gid,) for gid in expired]
+            )
+        for gid in expired:
+            self._locks.discard(gid)
+        return len(expired)
+
+    @property
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_manager() -> Union[SessionManager, SQLiteSessionManager]:
+    if settings.session_backend == "sqlite":
+        return SQLiteSessionManager()
+    return SessionManager()
+
+
+session_manager = create_session_manager()
@@ -0,0 +1,86 @@
+"""Maintenance commands for the stats database.
+
+    python -m backend.services.stats_cli backfill [--db PATH] [--player NAME]
+    python -m backend.services.stats_cli export [--format ndjson|csv] [--player NAME] [-o FILE]
+    python -m backend.services.stats_cli import FILE [--format ndjson|csv]
+    python -m backend.services.stats_cli maintain [--retention-days N] [--full-vacuum]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+from backend.config import settings
+from backend.services.stats_db import StatsDB
+from backend.services.stats_export import READERS, WRITERS
+
+
+def _backfill(db: StatsDB, args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    games = db.rebuild_aggregates(args.player)
+    print(f"Rebuilt aggregates from {games} games in {time.perf_counter() - start:.2f}s")
+
+
+def _export(db: StatsDB, args: argparse.Namespace) -> None:
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        for chunk in WRITERS[args.format](db.iter_results(args.player)):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+def _import(db: StatsDB, args: argparse.Namespace) -> None:
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    start = time.perf_counter()
+    with open(args.path, encoding="utf-8", newline="") as f:
+        count = db.import_results(READERS[fmt](f), chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print(f"Imported {count} games in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)")
+
+
+def _maintain(db: StatsDB, args: argparse.Namespace) -> None:
+    report = db.maintain(args.retention_days, args.batch_size, full_vacuum=args.full_vacuum)
+    print(f"Deleted {report['deleted_rows']} games, reclaimed {report['reclaimed_bytes']:,} bytes "
+          f"in {report['seconds']:.2f}s (database now {report['db_bytes']:,} bytes)")
+    if not report["incremental_vacuum"]:
+        print("Free pages stay in the file until it is converted once with --full-vacuum")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="stats_cli", description="Stats database maintenance")
+    parser.add_argument("--db", default=settings.stats_db_path, help="path to the SQLite file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser("backfill", help="recompute per-player aggregates from game_results")
+    backfill.add_argument("--player", help="only rebuild this player's aggregates")
+    backfill.set_defaults(func=_backfill)
+
+    export = commands.add_parser("export", help="stream game_results as NDJSON or CSV")
+    export.add_argument("--format", choices=sorted(WRITERS), default="ndjson")
+    export.add_argument("--player", help="only this player's games")
+    export.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    export.set_defaults(func=_export)
+
+    load = commands.add_parser("import", help="bulk-load an exported NDJSON or CSV file")
+    load.add_argument("path")
+    load.add_argument("--format", choices=sorted(READERS), help="default: from the file extension")
+    load.add_argument("--chunk-size", type=int, default=50_000, help="rows per executemany batch")
+    load.set_defaults(func=_import)
+
+    maintain = commands.add_parser("maintain", help="apply retention, vacuum and optimize")
+    maintain.add_argument("--retention-days", type=int, help="default: stats_retention_days (0 keeps all)")
+    maintain.add_argument("--batch-size", type=int, help="games deleted per transaction")
+    maintain.add_argument("--full-vacuum", action="store_true",
+                          help="rewrite the file once to enable incremental vacuum (blocks writers)")
+    maintain.set_defaults(func=_maintain)
+
+    args = parser.parse_args(argv)
+    args.func(StatsDB(db_path=args.db), args)
+
+
+if __name__ == "__main__":
+    main()
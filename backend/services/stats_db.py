@@ -1,155 +1,1631 @@
-"""SQLite persistence layer for game statistics."""
+"""SQLite persistence layer for game statistics.
+
+Raw games go into `game_results`. `record_game` also folds each game into
+per-player aggregate rows (`player_stats`, `player_difficulty_stats`) in
+the same transaction, so `get_stats` reads a handful of rows no matter
+how long a player's history is.
+
+Hand and crib scores are stored as packed `array('B')` blobs, one byte
+per hand, so aggregation reads their length and sum straight off the
+bytes instead of parsing JSON.
+
+Players are stored once in `players`; results and aggregates refer to
+them by integer id, and a name -> id LRU spares most lookups.
+
+Each recorded game also moves the player's Elo rating in `player_ratings`.
+`rating_histogram` counts players per rating band, so a player's rank
+sums a few hundred band counts plus one band's index range.
+
+Schema changes go through `_MIGRATIONS`, an append-only list of steps
+tracked with `PRAGMA user_version`.
+
+The database runs in WAL mode with one long-lived writer connection
+(serialized by a lock) and a small pool of reader connections, so stats
+reads never wait behind a write.
+
+`record_game` also maintains per-UTC-day rollups (`player_daily_stats`,
+`player_daily_difficulty_stats`), so `get_stats(since=...)` reads one
+row per active day instead of scanning the player's games.
+
+Retention (`maintain`) deletes raw games from before a cutoff day. The
+aggregates and daily rollups already count them, so no stats change;
+the deleted games are also folded into per-player `compacted_*` totals,
+which `rebuild_aggregates` starts from in place of the missing history.
+
+Games reported by clients rather than played on the server are stored
+unrated (`game_results.rated = 0`): they are kept and exported, but count
+toward no aggregate, rating or leaderboard, and rebuilds skip them.
+
+All-time `get_stats` responses are kept in a bounded LRU cache with a TTL. Writes
+through this StatsDB evict the players they touch. Commits from other
+processes show up as a change in `PRAGMA data_version` on the writer
+connection, which clears the whole cache.
+"""
 
 from __future__ import annotations
 
+import base64
+import itertools
 import json
+import math
 import os
+import queue
 import sqlite3
-from datetime import datetime, timezone
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Iterable, Iterator, Mapping, Sequence
 
 from backend.config import settings
-from backend.game.models import DifficultyStats, PlayerStatsResponse, RecordGameRequest
+from backend.game.models import (
+    DifficultyStats,
+    LeaderboardEntry,
+    LeaderboardResponse,
+    PlayerStatsResponse,
+    RecordGameRequest,
+)
+
+# Players need this many games before they appear on the win-rate board. It is
+# baked into the partial leaderboard indexes, so changing it needs a migration.
+LEADERBOARD_MIN_GAMES = 10
+
+# Ranking expression per leaderboard metric; each has a matching index on
+# player_stats and on (difficulty, ...) in player_difficulty_stats.
+_LEADERBOARD_METRICS = {
+    "win_rate": "wins * 1.0 / games",
+    "total_points": "total_points",
+    "best_hand": "best_hand",
+}
+
+
+# Elo ratings. AI opponents have a fixed rating per difficulty and are never updated.
+RATING_INITIAL = 1500.0
+AI_RATINGS = {"easy": 1200.0, "medium": 1500.0, "hard": 1800.0}
+_RATING_K_PROVISIONAL = 40.0  # for a player's first _RATING_PROVISIONAL_GAMES games
+_RATING_K = 20.0
+_RATING_PROVISIONAL_GAMES = 30
+_RATING_BAND = 25  # rating points per rating_histogram row
+
+
+class StatsBusyError(Exception):
+    """No pooled reader connection came free within `stats_db_read_timeout_seconds`."""
+
+
+class _StatsCache:
+    """Thread-safe LRU + TTL cache of PlayerStatsResponse by player name.
+
+    Every invalidation bumps `epoch`. A reader takes the epoch before
+    querying and `put` drops the value if it changed meanwhile, so a read
+    that raced a write cannot re-cache the old numbers.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries: OrderedDict[str, tuple[float, PlayerStatsResponse]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> PlayerStatsResponse | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: PlayerStatsResponse, epoch: int) -> None:
+        with self._lock:
+            if epoch != self.epoch or self.max_size <= 0:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[str] | None = None) -> None:
+        """Evict `keys`, or everything when None."""
+        with self._lock:
+            self.epoch += 1
+            self.invalidations += 1
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+
+    def metrics(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+class _PlayerIdCache:
+    """Thread-safe LRU of player name -> `players.id`.
+
+    Ids never change once assigned, so entries never go stale. Names a
+    writer has just inserted are only added after its transaction commits.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> int | None:
+        with self._lock:
+            player_id = self._entries.get(name)
+            if player_id is not None:
+                self._entries.move_to_end(name)
+            return player_id
+
+    def put_many(self, ids: Mapping[str, int]) -> None:
+        with self._lock:
+            self._entries.update(ids)
+            for name in ids:
+                self._entries.move_to_end(name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
 
 
 class StatsDB:
     def __init__(self, db_path: str | None = None):
         self.db_path = db_path or settings.stats_db_path
         os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self._writer = self._connect(writer=True)
+        self._write_lock = threading.Lock()
+        self._readers: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._cache = _StatsCache(settings.stats_cache_size, settings.stats_cache_ttl_seconds)
+        self._player_ids = _PlayerIdCache(settings.stats_player_id_cache_size)
         self._init_db()
+        self._data_version = self._writer.execute("PRAGMA data_version").fetchone()[0]
 
     def _init_db(self) -> None:
-        with self._conn() as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS game_results (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    player_name TEXT NOT NULL,
-                    opponent_name TEXT NOT NULL,
-                    player_score INTEGER NOT NULL,
-                    opponent_score INTEGER NOT NULL,
-                    won INTEGER NOT NULL,
-                    ai_difficulty TEXT,
-                    game_mode TEXT NOT NULL DEFAULT 'single',
-                    hand_scores TEXT NOT NULL DEFAULT '[]',
-                    crib_scores TEXT NOT NULL DEFAULT '[]',
-                    highest_hand_score INTEGER NOT NULL DEFAULT 0,
-                    total_points_scored INTEGER NOT NULL DEFAULT 0,
-                    created_at TEXT NOT NULL
-                )
-            """)
-
-    def _conn(self) -> sqlite3.Connection:
-        return sqlite3.connect(self.db_path)
+        """Bring the schema up to date by running pending migrations.
+
+        `PRAGMA user_version` records how many migrations have been applied.
+        All pending steps run in one IMMEDIATE transaction that first reads
+        the version, so several workers starting at once apply them exactly
+        once. A step returns True when the aggregate tables must be rebuilt
+        from game_results; that happens once, after the last step, so the
+        rebuild always runs against the final schema.
+        """
+        with self._write_lock:
+            conn = self._writer
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                rebuild = False
+                for migrate in _MIGRATIONS[version:]:
+                    rebuild |= bool(migrate(conn))
+                if rebuild:
+                    _rebuild_aggregates(conn)
+                conn.execute(f"PRAGMA user_version = {max(version, len(_MIGRATIONS))}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def _connect(self, writer: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10.0, check_same_thread=False)
+        if writer:
+            # Only takes effect on a new file, so it goes before WAL writes the
+            # header; older files are converted by `maintain(full_vacuum=True)`.
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+        # WAL is persistent in the file; the rest are per-connection settings.
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {settings.stats_db_synchronous}")
+        conn.execute(f"PRAGMA cache_size = -{settings.stats_db_cache_kib}")
+        conn.execute(f"PRAGMA mmap_size = {settings.stats_db_mmap_bytes}")
+        return conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """The shared writer connection, inside a transaction that commits on exit.
+
+        The transaction starts with BEGIN IMMEDIATE, so it holds the database
+        write lock before its first read: what it reads (ratings, totals, rows
+        to compact) cannot be changed by another worker before it writes back.
+        """
+        with self._write_lock, self._writer:
+            self._writer.execute("BEGIN IMMEDIATE")
+            yield self._writer
+
+    @contextmanager
+    def _read(self) -> Iterator[sqlite3.Connection]:
+        """A pooled reader connection holding one consistent WAL snapshot."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._reader_lock:
+                grow = self._reader_count < settings.stats_db_read_pool_size
+                if grow:
+                    self._reader_count += 1
+            if grow:
+                conn = self._connect()
+                conn.isolation_level = None  # transactions are explicit below
+                conn.row_factory = sqlite3.Row
+            else:
+                try:
+                    conn = self._readers.get(timeout=settings.stats_db_read_timeout_seconds)
+                except queue.Empty:
+                    raise StatsBusyError("Stats database is busy, try again shortly") from None
+        try:
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.execute("COMMIT")
+        finally:
+            self._readers.put(conn)
+
+    def close(self) -> None:
+        with self._write_lock:
+            self._writer.close()
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _lookup_ids(self, conn: sqlite3.Connection, names: Iterable[str], create: bool = False) -> dict[str, int]:
+        """Player ids for `names`, from the cache or else the players table.
+
+        Unknown names are left out, or with `create` added to `players`.
+        Created ids only exist once the caller's transaction commits, so
+        the caller caches the result (`_player_ids.put_many`) after that.
+        """
+        ids: dict[str, int] = {}
+        missing = []
+        for name in set(names):
+            player_id = self._player_ids.get(name)
+            if player_id is None:
+                missing.append(name)
+            else:
+                ids[name] = player_id
+        if not missing:
+            return ids
+        if create:
+            conn.executemany("INSERT OR IGNORE INTO players (name) VALUES (?)", [(name,) for name in missing])
+        found: dict[str, int] = {}
+        for start in range(0, len(missing), _LOOKUP_BATCH):
+            chunk = missing[start:start + _LOOKUP_BATCH]
+            rows = conn.execute(
+                f"SELECT name, id FROM players WHERE name IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            found.update((name, player_id) for name, player_id in rows)
+        if not create:
+            self._player_ids.put_many(found)
+        ids.update(found)
+        return ids
 
     def record_game(self, req: RecordGameRequest) -> None:
-        with self._conn() as conn:
-            conn.execute(
-                """INSERT INTO game_results
-                   (player_name, opponent_name, player_score, opponent_score, won,
-                    ai_difficulty, game_mode, hand_scores, crib_scores,
-                    highest_hand_score, total_points_scored, created_at)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    req.player_name,
-                    req.opponent_name,
-                    req.player_score,
-                    req.opponent_score,
-                    1 if req.won else 0,
-                    req.ai_difficulty,
-                    req.game_mode,
-                    json.dumps(req.hand_scores),
-                    json.dumps(req.crib_scores),
-                    req.highest_hand_score,
-                    req.total_points_scored,
-                    datetime.now(timezone.utc).isoformat(),
-                ),
+        self.record_games([req])
+
+    def record_games(self, reqs: list[RecordGameRequest], rated: bool = True) -> None:
+        """Record several games, in order, in a single transaction.
+
+        Unrated games are only stored; aggregates and ratings are left alone.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        with self._write() as conn:
+            ids = self._lookup_ids(
+                conn, [name for req in reqs for name in (req.player_name, req.opponent_name)], create=True
+            )
+            conn.executemany(
+                _INSERT_RESULT_SQL,
+                [
+                    (
+                        ids[req.player_name],
+                        ids[req.opponent_name],
+                        req.player_score,
+                        req.opponent_score,
+                        1 if req.won else 0,
+                        req.ai_difficulty,
+                        req.game_mode,
+                        pack_scores(req.hand_scores),
+                        pack_scores(req.crib_scores),
+                        req.highest_hand_score,
+                        req.total_points_scored,
+                        now,
+                        1 if rated else 0,
+                    )
+                    for req in reqs
+                ],
             )
+            if rated:
+                _apply_aggregates(conn, [
+                    _aggregate_params(
+                        ids[req.player_name], req.won, req.ai_difficulty, req.hand_scores,
+                        req.crib_scores, req.highest_hand_score, req.total_points_scored, now,
+                    )
+                    for req in reqs
+                ])
+                _apply_ratings(conn, [
+                    (ids[req.player_name], ids[req.opponent_name], req.won, req.ai_difficulty) for req in reqs
+                ])
+        self._player_ids.put_many(ids)
+        self._cache.invalidate({req.player_name for req in reqs})
 
-    def get_stats(self, player_name: str) -> PlayerStatsResponse:
-        with self._conn() as conn:
-            conn.row_factory = sqlite3.Row
-            rows = conn.execute(
-                """SELECT * FROM game_results
-                   WHERE player_name = ?
-                   ORDER BY created_at ASC""",
+    def iter_results(self, player_name: str | None = None) -> Iterator[dict[str, Any]]:
+        """Stream raw game results, one dict per game, in constant memory.
+
+        Everyone's games come in insertion order, one player's in play order.
+        Exports can be slow downloads, so they use their own connection
+        rather than a pooled reader, and read in keyset batches of
+        `_STREAM_BATCH` rows that are each a short transaction, which lets
+        the WAL be checkpointed meanwhile. Games added after the export
+        started are left out; games compacted away meanwhile may be too.
+        """
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM game_results").fetchone()[0]
+            if player_name is None:
+                sql, args, after = _EXPORT_ALL_SQL, (last_id,), (0,)
+            else:
+                found = conn.execute("SELECT id FROM players WHERE name = ?", (player_name,)).fetchone()
+                if found is None:
+                    return
+                sql, args, after = _EXPORT_PLAYER_SQL, (found[0], last_id), ("", 0)
+            while batch := conn.execute(sql, (*args, *after, _STREAM_BATCH)).fetchall():
+                last = batch[-1]
+                after = (last["id"],) if player_name is None else (last["created_at"], last["id"])
+                for r in batch:
+                    row = dict(r)
+                    del row["id"]
+                    row["won"] = bool(row["won"])
+                    row["hand_scores"] = unpack_scores(row["hand_scores"])
+                    row["crib_scores"] = unpack_scores(row["crib_scores"])
+                    row["rated"] = bool(row["rated"])
+                    yield row
+        finally:
+            conn.close()
+
+    def import_results(self, rows: Iterable[Mapping[str, Any]], chunk_size: int = 50_000) -> int:
+        """Bulk-insert exported game results; returns the number of rows loaded.
+
+        `rows` is consumed lazily and written `chunk_size` rows at a time with
+        executemany, all inside one transaction: a row that fails validation
+        (see RecordGameRequest) raises ValueError naming its position and
+        nothing from the import is kept. The aggregates of every player in
+        the import are then rebuilt in one streaming pass, so rows may arrive
+        in any order. Ratings depend on the order games were played and are
+        updated in file order instead. Rows without a `rated` field are rated.
+        """
+        with self._read() as conn:
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM game_results").fetchone()[0]
+        count = 0
+        numbered = enumerate(rows, 1)
+        all_ids: dict[str, int] = {}
+        with self._write() as conn:
+            while chunk := [_result_params(n, r) for n, r in itertools.islice(numbered, chunk_size)]:
+                ids = self._lookup_ids(conn, itertools.chain.from_iterable(p[:2] for p in chunk), create=True)
+                conn.executemany(_INSERT_RESULT_SQL, [(ids[p[0]], ids[p[1]], *p[2:]) for p in chunk])
+                _apply_ratings(conn, [(ids[p[0]], ids[p[1]], p[4], p[5]) for p in chunk if p[12]])
+                all_ids.update(ids)
+                count += len(chunk)
+            if count:
+                _rebuild_aggregates(conn, after_id=last_id)
+        if count:
+            self._player_ids.put_many(all_ids)
+            self._cache.invalidate()
+        return count
+
+    def rebuild_aggregates(self, player_name: str | None = None) -> int:
+        """Recompute aggregates from game_results, for one player or everyone.
+
+        Returns the number of games folded in.
+        """
+        with self._write() as conn:
+            if player_name is None:
+                games = _rebuild_aggregates(conn)
+            else:
+                player_id = self._lookup_ids(conn, [player_name]).get(player_name)
+                games = 0 if player_id is None else _rebuild_aggregates(conn, player_id)
+        self._cache.invalidate(None if player_name is None else [player_name])
+        return games
+
+    def compact(self, before: date, batch_size: int = 5000) -> int:
+        """Delete raw games played before the UTC day `before`; returns the number removed.
+
+        Games are taken in (player, play order) keyset batches of about
+        `batch_size`, each folded into the compacted totals and deleted in
+        its own short transaction, so recording games never waits long.
+        A batch never splits one player's day, so `compacted_before` can
+        always advance to the day after the last game compacted.
+        """
+        cutoff = before.isoformat()
+        key: tuple[int, str, int] = (0, "", 0)
+        deleted = 0
+        while True:
+            with self._write() as conn:
+                limit = batch_size
+                while True:
+                    rows = conn.execute(_COMPACT_BATCH_SQL, (*key, cutoff, limit + 1)).fetchall()
+                    if len(rows) <= limit:
+                        break
+                    following = _player_day(rows.pop())
+                    while rows and _player_day(rows[-1]) == following:
+                        rows.pop()
+                    if rows:
+                        break
+                    limit *= 2  # one player's day holds more than a batch
+                if not rows:
+                    break
+                _fold_compacted(conn, rows)
+                conn.executemany("DELETE FROM game_results WHERE id = ?", [(row[0],) for row in rows])
+            deleted += len(rows)
+            key = (rows[-1][1], rows[-1][2], rows[-1][0])
+        return deleted
+
+    def maintain(
+        self,
+        retention_days: int | None = None,
+        batch_size: int | None = None,
+        full_vacuum: bool = False,
+    ) -> dict[str, Any]:
+        """Apply retention, give free pages back to the OS and refresh planner stats.
+
+        `retention_days` of 0 keeps every game. Free pages are released
+        with `incremental_vacuum` a step at a time; a file created before
+        auto_vacuum was enabled needs one `full_vacuum` (which blocks
+        writers while it runs) to switch over. Returns a report of what
+        was done.
+        """
+        start = time.perf_counter()
+        retention_days = settings.stats_retention_days if retention_days is None else retention_days
+        deleted = 0
+        if retention_days > 0:
+            before = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+            deleted = self.compact(before, batch_size or settings.stats_retention_batch_size)
+
+        with self._write_lock:
+            conn = self._writer
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+            if full_vacuum:
+                conn.execute("VACUUM")
+            incremental = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        while incremental:
+            with self._write_lock:
+                if not self._writer.execute("PRAGMA freelist_count").fetchone()[0]:
+                    break
+                # executescript steps the pragma to completion; execute() frees one page.
+                self._writer.executescript(f"PRAGMA incremental_vacuum({_VACUUM_STEP_PAGES})")
+        with self._write_lock:
+            conn = self._writer
+            pages_after = conn.execute("PRAGMA page_count").fetchone()[0]
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return {
+            "deleted_rows": deleted,
+            "reclaimed_bytes": (pages_before - pages_after) * page_size,
+            "db_bytes": pages_after * page_size,
+            "free_bytes": free_pages * page_size,
+            "incremental_vacuum": incremental,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    def _cache_is_current(self) -> bool:
+        """Clear the cache if another process committed since the last check.
+
+        data_version only moves for commits made by *other* connections, so
+        the writer connection sees exactly the out-of-process writes. If a
+        local write holds the writer, returns False and the caller skips the
+        cache for this read rather than wait.
+        """
+        if not self._write_lock.acquire(blocking=False):
+            return False
+        try:
+            version = self._writer.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            self._write_lock.release()
+        if version != self._data_version:
+            self._data_version = version
+            self._cache.invalidate()
+        return True
+
+    def cache_metrics(self) -> dict[str, Any]:
+        return self._cache.metrics()
+
+    def get_stats(self, player_name: str, since: date | None = None) -> PlayerStatsResponse:
+        """A player's stats, all-time or for games on or after the UTC day `since`.
+
+        All-time responses are cached and may be shared with other callers;
+        don't mutate them. A cached `rank` can lag other players' games by
+        up to the cache TTL.
+        """
+        if since is not None:
+            return self._query_window_stats(player_name, since)
+        use_cache = self._cache_is_current()
+        if use_cache:
+            cached = self._cache.get(player_name)
+            if cached is not None:
+                return cached
+        epoch = self._cache.epoch
+        stats = self._query_stats(player_name)
+        if use_cache:
+            self._cache.put(player_name, stats, epoch)
+        return stats
+
+    def get_rating(self, player_name: str) -> float:
+        """A player's current rating; `RATING_INITIAL` if they have no rated games."""
+        with self._read() as conn:
+            row = conn.execute(
+                """SELECT rating FROM player_ratings
+                   WHERE player_id = (SELECT id FROM players WHERE name = ?)""",
                 (player_name,),
+            ).fetchone()
+        return row[0] if row is not None else RATING_INITIAL
+
+    def _query_stats(self, player_name: str) -> PlayerStatsResponse:
+        with self._read() as conn:
+            player_id = self._lookup_ids(conn, [player_name]).get(player_name)
+            if player_id is None:
+                return _stats_response(player_name, None, [])
+            row = conn.execute(
+                "SELECT * FROM player_stats WHERE player_id = ?", (player_id,)
+            ).fetchone()
+            diff_rows = conn.execute(
+                """SELECT difficulty, games, wins FROM player_difficulty_stats
+                   WHERE player_id = ? ORDER BY difficulty""",
+                (player_id,),
             ).fetchall()
+            rating = _rating_and_rank(conn, player_id)
+        return _stats_response(player_name, row, diff_rows, rating)
 
-        if not rows:
-            return PlayerStatsResponse(
-                player_name=player_name,
-                games=0, wins=0, losses=0, win_rate=0.0,
-                avg_hand_score=0.0, avg_crib_score=0.0,
-                best_hand=0, total_points=0,
-                current_streak=0, best_win_streak=0,
-            )
+    def _query_window_stats(self, player_name: str, since: date) -> PlayerStatsResponse:
+        """Fold the player's daily rollups from `since` on; one row per active day."""
+        with self._read() as conn:
+            player_id = self._lookup_ids(conn, [player_name]).get(player_name)
+            if player_id is None:
+                return _stats_response(player_name, None, [])
+            params = (player_id, since.isoformat())
+            days = conn.execute(
+                """SELECT * FROM player_daily_stats
+                   WHERE player_id = ? AND day >= ? ORDER BY day""",
+                params,
+            ).fetchall()
+            diff_rows = conn.execute(
+                """SELECT difficulty, SUM(games) AS games, SUM(wins) AS wins
+                   FROM player_daily_difficulty_stats
+                   WHERE player_id = ? AND day >= ?
+                   GROUP BY difficulty ORDER BY difficulty""",
+                params,
+            ).fetchall()
+            rating = _rating_and_rank(conn, player_id)
+        if not days:
+            return _stats_response(player_name, None, [], rating)
 
-        games = len(rows)
-        wins = sum(1 for r in rows if r["won"])
-        losses = games - wins
-
-        all_hand_scores: list[int] = []
-        all_crib_scores: list[int] = []
-        best_hand = 0
-        total_points = 0
-
-        for r in rows:
-            hs = json.loads(r["hand_scores"])
-            cs = json.loads(r["crib_scores"])
-            all_hand_scores.extend(hs)
-            all_crib_scores.extend(cs)
-            best_hand = max(best_hand, r["highest_hand_score"])
-            total_points += r["total_points_scored"]
-
-        avg_hand = sum(all_hand_scores) / len(all_hand_scores) if all_hand_scores else 0.0
-        avg_crib = sum(all_crib_scores) / len(all_crib_scores) if all_crib_scores else 0.0
-
-        # Calculate streaks
-        current_streak = 0
-        best_win_streak = 0
-        streak = 0
-        for r in rows:
-            if r["won"]:
-                streak = streak + 1 if streak > 0 else 1
-                best_win_streak = max(best_win_streak, streak)
+        totals = dict.fromkeys(
+            ("games", "wins", "hand_total", "hand_count", "crib_total", "crib_count", "total_points"), 0
+        )
+        best_hand = streak = best_streak = 0
+        for d in days:
+            for key in totals:
+                totals[key] += d[key]
+            best_hand = max(best_hand, d["best_hand"])
+            if d["wins"] == d["games"]:  # the whole day extends the running streak
+                streak = max(streak, 0) + d["games"]
+            elif d["wins"] == 0:
+                streak = min(streak, 0) - d["games"]
             else:
-                streak = streak - 1 if streak < 0 else -1
-            current_streak = streak
-
-        # Per-difficulty breakdown
-        diff_map: dict[str, dict[str, int]] = {}
-        for r in rows:
-            d = r["ai_difficulty"] or "multiplayer"
-            if d not in diff_map:
-                diff_map[d] = {"games": 0, "wins": 0}
-            diff_map[d]["games"] += 1
-            if r["won"]:
-                diff_map[d]["wins"] += 1
-
-        per_difficulty = [
-            DifficultyStats(
-                difficulty=d,
-                games=v["games"],
-                wins=v["wins"],
-                losses=v["games"] - v["wins"],
-                win_rate=round(v["wins"] / v["games"] * 100, 1) if v["games"] > 0 else 0.0,
+                best_streak = max(best_streak, max(streak, 0) + d["lead_wins"])
+                streak = d["current_streak"]
+            best_streak = max(best_streak, streak, d["best_win_streak"])
+        return _stats_response(player_name, {
+            **totals,
+            "best_hand": best_hand,
+            "current_streak": streak,
+            "best_win_streak": best_streak,
+        }, diff_rows, rating)
+
+    def leaderboard(
+        self,
+        metric: str = "win_rate",
+        difficulty: str | None = None,
+        limit: int = 20,
+        cursor: str | None = None,
+    ) -> LeaderboardResponse:
+        """One page of players ranked by `metric`, best first.
+
+        Pages are keyset-paginated: `cursor` is the opaque `next_cursor` of
+        the previous page, so every page is an index range scan.
+        Raises ValueError for an unknown metric or a malformed cursor.
+        """
+        sql, params, rank = _leaderboard_query(metric, difficulty, limit + 1, cursor)
+        with self._read() as conn:
+            rows = conn.execute(sql, params).fetchall()
+
+        page = rows[:limit]
+        entries = [
+            LeaderboardEntry(
+                rank=rank + i + 1,
+                player_name=r["player_name"],
+                value=round(r["value"] * 100, 1) if metric == "win_rate" else r["value"],
+                games=r["games"],
+                wins=r["wins"],
             )
-            for d, v in sorted(diff_map.items())
+            for i, r in enumerate(page)
         ]
+        next_cursor = None
+        if len(rows) > limit:
+            last = page[-1]
+            next_cursor = _encode_cursor(last["value"], last["player_id"], rank + len(page))
+        return LeaderboardResponse(
+            metric=metric, difficulty=difficulty, entries=entries, next_cursor=next_cursor,
+        )
+
 
+def _stats_response(
+    player_name: str,
+    row: Mapping[str, Any] | None,
+    diff_rows: list[Mapping[str, Any]],
+    rating: tuple[float, int] | None = None,
+) -> PlayerStatsResponse:
+    """Build the API response from a player_stats-shaped row, per-difficulty rows and (rating, rank)."""
+    rating_fields = {"rating": round(rating[0], 1), "rank": rating[1]} if rating else {}
+    if row is None:
         return PlayerStatsResponse(
             player_name=player_name,
-            games=games,
-            wins=wins,
-            losses=losses,
-            win_rate=round(wins / games * 100, 1) if games > 0 else 0.0,
-            avg_hand_score=round(avg_hand, 1),
-            avg_crib_score=round(avg_crib, 1),
-            best_hand=best_hand,
-            total_points=total_points,
-            current_streak=current_streak,
-            best_win_streak=best_win_streak,
-            per_difficulty=per_difficulty,
+            games=0, wins=0, losses=0, win_rate=0.0,
+            avg_hand_score=0.0, avg_crib_score=0.0,
+            best_hand=0, total_points=0,
+            current_streak=0, best_win_streak=0,
+            **rating_fields,
+        )
+
+    games = row["games"]
+    wins = row["wins"]
+    avg_hand = row["hand_total"] / row["hand_count"] if row["hand_count"] else 0.0
+    avg_crib = row["crib_total"] / row["crib_count"] if row["crib_count"] else 0.0
+
+    per_difficulty = [
+        DifficultyStats(
+            difficulty=d["difficulty"],
+            games=d["games"],
+            wins=d["wins"],
+            losses=d["games"] - d["wins"],
+            win_rate=round(d["wins"] / d["games"] * 100, 1) if d["games"] > 0 else 0.0,
+        )
+        for d in diff_rows
+    ]
+
+    return PlayerStatsResponse(
+        player_name=player_name,
+        games=games,
+        wins=wins,
+        losses=games - wins,
+        win_rate=round(wins / games * 100, 1) if games > 0 else 0.0,
+        avg_hand_score=round(avg_hand, 1),
+        avg_crib_score=round(avg_crib, 1),
+        best_hand=row["best_hand"],
+        total_points=row["total_points"],
+        current_streak=row["current_streak"],
+        best_win_streak=row["best_win_streak"],
+        per_difficulty=per_difficulty,
+        **rating_fields,
+    )
+
+
+def _rating_and_rank(conn: sqlite3.Connection, player_id: int) -> tuple[float, int] | None:
+    """A player's rating and 1-based rank (ties share a rank), or None if unrated."""
+    row = conn.execute("SELECT rating FROM player_ratings WHERE player_id = ?", (player_id,)).fetchone()
+    if row is None:
+        return None
+    rating = row[0]
+    band = math.floor(rating / _RATING_BAND)
+    above = conn.execute(
+        """SELECT (SELECT COALESCE(SUM(players), 0) FROM rating_histogram WHERE band > :band)
+                + (SELECT COUNT(*) FROM player_ratings WHERE rating > :rating AND rating < :band_end)""",
+        {"band": band, "rating": rating, "band_end": (band + 1) * _RATING_BAND},
+    ).fetchone()[0]
+    return rating, above + 1
+
+
+def _apply_ratings(conn: sqlite3.Connection, games: Sequence[tuple[int, int, Any, str | None]]) -> None:
+    """Update Elo ratings for (player_id, opponent_id, won, ai_difficulty) rows in play order.
+
+    Only the row's own player is rated; a human opponent moves with their
+    own row. When two neighbouring rows are one game seen from both sides
+    (players swapped), the second uses its opponent's rating from before
+    that game, so both sides see the same pre-game ratings.
+    """
+    ids = {player_id for player_id, _, _, _ in games}
+    ids.update(opponent_id for _, opponent_id, _, difficulty in games if not difficulty)
+    ids_list = list(ids)
+    ratings: dict[int, list[float]] = {}  # player_id -> [rating, games]
+    for start in range(0, len(ids_list), _LOOKUP_BATCH):
+        chunk = ids_list[start:start + _LOOKUP_BATCH]
+        rows = conn.execute(
+            f"SELECT player_id, rating, games FROM player_ratings WHERE player_id IN ({', '.join('?' * len(chunk))})",
+            chunk,
+        )
+        ratings.update((player_id, [rating, games]) for player_id, rating, games in rows)
+    original = {player_id: r[0] for player_id, r in ratings.items()}
+
+    updated: set[int] = set()
+    previous: tuple[int, int, float] | None = None  # (player, opponent, player's rating before)
+    for player_id, opponent_id, won, difficulty in games:
+        player = ratings.setdefault(player_id, [RATING_INITIAL, 0])
+        if difficulty:
+            opponent_rating = AI_RATINGS.get(difficulty, RATING_INITIAL)
+        elif previous is not None and previous[:2] == (opponent_id, player_id):
+            opponent_rating = previous[2]
+        else:
+            opponent_rating = ratings.get(opponent_id, [RATING_INITIAL])[0]
+        previous = (player_id, opponent_id, player[0])
+        expected = 1.0 / (1.0 + 10.0 ** ((opponent_rating - player[0]) / 400.0))
+        k = _RATING_K_PROVISIONAL if player[1] < _RATING_PROVISIONAL_GAMES else _RATING_K
+        player[0] += k * ((1.0 if won else 0.0) - expected)
+        player[1] += 1
+        updated.add(player_id)
+
+    changed = [(player_id, *ratings[player_id]) for player_id in updated]
+    conn.executemany(
+        """INSERT INTO player_ratings (player_id, rating, games) VALUES (?, ?, ?)
+           ON CONFLICT (player_id) DO UPDATE SET rating = excluded.rating, games = excluded.games""",
+        changed,
+    )
+    bands: dict[int, int] = {}
+    for player_id, rating, _ in changed:
+        if player_id in original:
+            old = math.floor(original[player_id] / _RATING_BAND)
+            bands[old] = bands.get(old, 0) - 1
+        new = math.floor(rating / _RATING_BAND)
+        bands[new] = bands.get(new, 0) + 1
+    conn.executemany(
+        """INSERT INTO rating_histogram (band, players) VALUES (?, ?)
+           ON CONFLICT (band) DO UPDATE SET players = players + excluded.players""",
+        [(band, delta) for band, delta in bands.items() if delta],
+    )
+
+
+def _leaderboard_query(
+    metric: str, difficulty: str | None, limit: int, cursor: str | None,
+) -> tuple[str, dict[str, Any], int]:
+    """SQL, parameters and starting rank for one leaderboard page."""
+    if metric not in _LEADERBOARD_METRICS:
+        raise ValueError(f"Unknown leaderboard metric: {metric}")
+    expr = _LEADERBOARD_METRICS[metric]
+    where: list[str] = []
+    params: dict[str, Any] = {"limit": limit}
+    if difficulty is not None:
+        table = "player_difficulty_stats"
+        where.append("difficulty = :difficulty")
+        params["difficulty"] = difficulty
+    else:
+        table = "player_stats"
+    if metric == "win_rate":
+        where.append(f"games >= {LEADERBOARD_MIN_GAMES}")  # literal, to match the partial index
+    rank = 0
+    if cursor is not None:
+        params["after_value"], params["after_id"], rank = _decode_cursor(cursor)
+        where.append(f"{expr} <= :after_value AND ({expr} < :after_value OR player_id > :after_id)")
+    # Ties go to the player registered first; names are looked up for the page rows only.
+    sql = f"""SELECT player_id, (SELECT name FROM players WHERE id = player_id) AS player_name,
+                     games, wins, {expr} AS value FROM {table}
+              {"WHERE " + " AND ".join(where) if where else ""}
+              ORDER BY {expr} DESC, player_id ASC LIMIT :limit"""
+    return sql, params, rank
+
+
+def _encode_cursor(value: float, player_id: int, rank: int) -> str:
+    raw = json.dumps([value, player_id, rank], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[float, int, int]:
+    try:
+        value, player_id, rank = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(value), int(player_id), int(rank)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid leaderboard cursor")
+
+
+def _create_game_results(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS game_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_name TEXT NOT NULL,
+            opponent_name TEXT NOT NULL,
+            player_score INTEGER NOT NULL,
+            opponent_score INTEGER NOT NULL,
+            won INTEGER NOT NULL,
+            ai_difficulty TEXT,
+            game_mode TEXT NOT NULL DEFAULT 'single',
+            hand_scores TEXT NOT NULL DEFAULT '[]',
+            crib_scores TEXT NOT NULL DEFAULT '[]',
+            highest_hand_score INTEGER NOT NULL DEFAULT 0,
+            total_points_scored INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+    """)
+
+
+def _create_aggregates(conn: sqlite3.Connection) -> bool:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS player_stats (
+            player_name TEXT PRIMARY KEY,
+            games INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            hand_total INTEGER NOT NULL DEFAULT 0,
+            hand_count INTEGER NOT NULL DEFAULT 0,
+            crib_total INTEGER NOT NULL DEFAULT 0,
+            crib_count INTEGER NOT NULL DEFAULT 0,
+            best_hand INTEGER NOT NULL DEFAULT 0,
+            total_points INTEGER NOT NULL DEFAULT 0,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            best_win_streak INTEGER NOT NULL DEFAULT 0
         )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS player_difficulty_stats (
+            player_name TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (player_name, difficulty)
+        )
+    """)
+    return True
+
+
+def _index_results_by_player(conn: sqlite3.Connection) -> None:
+    # Serves per-player history scans in play order (WHERE player_name = ? ORDER BY created_at).
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_game_results_player_created
+        ON game_results (player_name, created_at)
+    """)
+
+
+def _pack_score_columns(conn: sqlite3.Connection) -> None:
+    """Rebuild game_results with hand/crib scores as packed BLOBs instead of JSON text."""
+    conn.create_function("pack_json_scores", 1, _pack_json_scores, deterministic=True)
+    conn.execute("""
+        CREATE TABLE game_results_packed (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_name TEXT NOT NULL,
+            opponent_name TEXT NOT NULL,
+            player_score INTEGER NOT NULL,
+            opponent_score INTEGER NOT NULL,
+            won INTEGER NOT NULL,
+            ai_difficulty TEXT,
+            game_mode TEXT NOT NULL DEFAULT 'single',
+            hand_scores BLOB NOT NULL DEFAULT x'',
+            crib_scores BLOB NOT NULL DEFAULT x'',
+            highest_hand_score INTEGER NOT NULL DEFAULT 0,
+            total_points_scored INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        INSERT INTO game_results_packed
+        SELECT id, player_name, opponent_name, player_score, opponent_score, won,
+               ai_difficulty, game_mode, pack_json_scores(hand_scores),
+               pack_json_scores(crib_scores), highest_hand_score,
+               total_points_scored, created_at
+        FROM game_results
+    """)
+    conn.execute("DROP TABLE game_results")
+    conn.execute("ALTER TABLE game_results_packed RENAME TO game_results")
+    _index_results_by_player(conn)
+
+
+def _index_leaderboards(conn: sqlite3.Connection) -> bool:
+    """Per-difficulty points/best hand, plus one ranking index per leaderboard."""
+    conn.execute("ALTER TABLE player_difficulty_stats ADD COLUMN total_points INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE player_difficulty_stats ADD COLUMN best_hand INTEGER NOT NULL DEFAULT 0")
+    for metric, expr in _LEADERBOARD_METRICS.items():
+        partial = f"WHERE games >= {LEADERBOARD_MIN_GAMES}" if metric == "win_rate" else ""
+        conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_player_stats_{metric}
+            ON player_stats ({expr} DESC, player_name) {partial}
+        """)
+        conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_difficulty_stats_{metric}
+            ON player_difficulty_stats (difficulty, {expr} DESC, player_name) {partial}
+        """)
+    return True  # backfill the new columns
+
+
+def _create_daily_rollups(conn: sqlite3.Connection) -> bool:
+    """Per-player, per-UTC-day totals for windowed stats.
+
+    Streaks cross day boundaries, so each day also keeps its opening run of
+    wins (`lead_wins`) next to its closing streak and best win run; folding
+    days in order rebuilds the window's streaks from those three numbers.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS player_daily_stats (
+            player_name TEXT NOT NULL,
+            day TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            hand_total INTEGER NOT NULL DEFAULT 0,
+            hand_count INTEGER NOT NULL DEFAULT 0,
+            crib_total INTEGER NOT NULL DEFAULT 0,
+            crib_count INTEGER NOT NULL DEFAULT 0,
+            best_hand INTEGER NOT NULL DEFAULT 0,
+            total_points INTEGER NOT NULL DEFAULT 0,
+            lead_wins INTEGER NOT NULL DEFAULT 0,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            best_win_streak INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (player_name, day)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS player_daily_difficulty_stats (
+            player_name TEXT NOT NULL,
+            day TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (player_name, day, difficulty)
+        )
+    """)
+    return True
+
+
+def _create_compacted_stats(conn: sqlite3.Connection) -> None:
+    """Running totals of the games retention has deleted, per player and difficulty.
+
+    `compacted_before` is the first day whose games are still in
+    game_results; aggregate and daily rows before it can't be rebuilt.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compacted_player_stats (
+            player_name TEXT PRIMARY KEY,
+            games INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            hand_total INTEGER NOT NULL DEFAULT 0,
+            hand_count INTEGER NOT NULL DEFAULT 0,
+            crib_total INTEGER NOT NULL DEFAULT 0,
+            crib_count INTEGER NOT NULL DEFAULT 0,
+            best_hand INTEGER NOT NULL DEFAULT 0,
+            total_points INTEGER NOT NULL DEFAULT 0,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            best_win_streak INTEGER NOT NULL DEFAULT 0,
+            compacted_before TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compacted_difficulty_stats (
+            player_name TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            total_points INTEGER NOT NULL DEFAULT 0,
+            best_hand INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (player_name, difficulty)
+        )
+    """)
+
+
+def _intern_player_names(conn: sqlite3.Connection) -> None:
+    """Move player names into `players` and key results and aggregates by integer id.
+
+    Every table is rebuilt with `player_id` (and `opponent_id` in
+    game_results) in place of the name columns, copying rows through a
+    join on name. Composite-key aggregate tables become WITHOUT ROWID.
+    """
+    conn.execute("CREATE TABLE players (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    conn.execute("""
+        INSERT INTO players (name)
+        SELECT player_name FROM game_results UNION SELECT opponent_name FROM game_results
+        UNION SELECT player_name FROM player_stats UNION SELECT player_name FROM compacted_player_stats
+    """)
+    totals = """
+            games INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            hand_total INTEGER NOT NULL DEFAULT 0,
+            hand_count INTEGER NOT NULL DEFAULT 0,
+            crib_total INTEGER NOT NULL DEFAULT 0,
+            crib_count INTEGER NOT NULL DEFAULT 0,
+            best_hand INTEGER NOT NULL DEFAULT 0,
+            total_points INTEGER NOT NULL DEFAULT 0,"""
+    player = "player_id INTEGER NOT NULL REFERENCES players (id)"
+    _swap_in_player_ids(conn, "game_results", f"""
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            {player},
+            opponent_id INTEGER NOT NULL REFERENCES players (id),
+            player_score INTEGER NOT NULL,
+            opponent_score INTEGER NOT NULL,
+            won INTEGER NOT NULL,
+            ai_difficulty TEXT,
+            game_mode TEXT NOT NULL DEFAULT 'single',
+            hand_scores BLOB NOT NULL DEFAULT x'',
+            crib_scores BLOB NOT NULL DEFAULT x'',
+            highest_hand_score INTEGER NOT NULL DEFAULT 0,
+            total_points_scored INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )""")
+    _swap_in_player_ids(conn, "player_stats", f"""
+            player_id INTEGER PRIMARY KEY REFERENCES players (id),{totals}
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            best_win_streak INTEGER NOT NULL DEFAULT 0
+        )""")
+    _swap_in_player_ids(conn, "player_difficulty_stats", f"""
+            {player},
+            difficulty TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            total_points INTEGER NOT NULL DEFAULT 0,
+            best_hand INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (player_id, difficulty)
+        ) WITHOUT ROWID""")
+    _swap_in_player_ids(conn, "player_daily_stats", f"""
+            {player},
+            day TEXT NOT NULL,{totals}
+            lead_wins INTEGER NOT NULL DEFAULT 0,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            best_win_streak INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (player_id, day)
+        ) WITHOUT ROWID""")
+    _swap_in_player_ids(conn, "player_daily_difficulty_stats", f"""
+            {player},
+            day TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (player_id, day, difficulty)
+        ) WITHOUT ROWID""")
+    _swap_in_player_ids(conn, "compacted_player_stats", f"""
+            player_id INTEGER PRIMARY KEY REFERENCES players (id),{totals}
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            best_win_streak INTEGER NOT NULL DEFAULT 0,
+            compacted_before TEXT NOT NULL
+        )""")
+    _swap_in_player_ids(conn, "compacted_difficulty_stats", f"""
+            {player},
+            difficulty TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            total_points INTEGER NOT NULL DEFAULT 0,
+            best_hand INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (player_id, difficulty)
+        ) WITHOUT ROWID""")
+
+    conn.execute("CREATE INDEX idx_game_results_player_created ON game_results (player_id, created_at)")
+    for metric, expr in _LEADERBOARD_METRICS.items():
+        partial = f"WHERE games >= {LEADERBOARD_MIN_GAMES}" if metric == "win_rate" else ""
+        conn.execute(f"""
+            CREATE INDEX idx_player_stats_{metric}
+            ON player_stats ({expr} DESC, player_id) {partial}
+        """)
+        conn.execute(f"""
+            CREATE INDEX idx_difficulty_stats_{metric}
+            ON player_difficulty_stats (difficulty, {expr} DESC, player_id) {partial}
+        """)
+
+
+def _swap_in_player_ids(conn: sqlite3.Connection, table: str, columns: str) -> None:
+    """Recreate `table` from a `CREATE TABLE ... (` body, mapping name columns to player ids."""
+    old = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    conn.execute(f"CREATE TABLE {table}_ids ({columns}")
+    new = [row[1] for row in conn.execute(f"PRAGMA table_info({table}_ids)")]
+    mapped = {"player_id": "p.id", "opponent_id": "o.id"}
+    conn.execute(f"""
+        INSERT INTO {table}_ids ({", ".join(new)})
+        SELECT {", ".join(mapped.get(c, f"t.{c}") for c in new)}
+        FROM {table} t
+        JOIN players p ON p.name = t.player_name
+        {"JOIN players o ON o.name = t.opponent_name" if "opponent_name" in old else ""}
+    """)
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {table}_ids RENAME TO {table}")
+
+
+def _create_player_ratings(conn: sqlite3.Connection) -> None:
+    """Elo rating per player, and how many players sit in each rating band.
+
+    Ratings are seeded by replaying the games still in game_results in
+    play order; they are running state from then on, not an aggregate
+    that `rebuild_aggregates` recomputes.
+    """
+    conn.execute("""
+        CREATE TABLE player_ratings (
+            player_id INTEGER PRIMARY KEY REFERENCES players (id),
+            rating REAL NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE INDEX idx_player_ratings_rating ON player_ratings (rating)")
+    conn.execute("CREATE TABLE rating_histogram (band INTEGER PRIMARY KEY, players INTEGER NOT NULL)")
+    rows = conn.execute(
+        "SELECT player_id, opponent_id, won, ai_difficulty FROM game_results ORDER BY created_at, id"
+    )
+    while batch := rows.fetchmany(_STREAM_BATCH):
+        _apply_ratings(conn, batch)
+
+
+def _add_rated_flag(conn: sqlite3.Connection) -> None:
+    """`rated` is 0 for games a client reported; every game stored so far counts."""
+    conn.execute("ALTER TABLE game_results ADD COLUMN rated INTEGER NOT NULL DEFAULT 1")
+
+
+# Applied in order by StatsDB._init_db; append new steps, never reorder or edit old ones.
+# A step returns True if the aggregates need a rebuild once all steps have run.
+_MIGRATIONS = [
+    _create_game_results,
+    _create_aggregates,
+    _index_results_by_player,
+    _pack_score_columns,
+    _index_leaderboards,
+    _create_daily_rollups,
+    _create_compacted_stats,
+    _intern_player_names,
+    _create_player_ratings,
+    _add_rated_flag,
+]
+
+
+def pack_scores(scores: Sequence[int]) -> bytes:
+    """Pack per-hand scores (0-29 each) into one byte per hand."""
+    return array("B", scores).tobytes()
+
+
+def unpack_scores(blob: bytes) -> list[int]:
+    return list(blob)
+
+
+def _pack_json_scores(text: str) -> bytes:
+    # Legacy rows were never range-checked; clamp anything that can't fit in a byte.
+    return pack_scores([min(max(int(v), 0), 255) for v in json.loads(text or "[]")])
+
+
+_INSERT_RESULT_SQL = """INSERT INTO game_results
+    (player_id, opponent_id, player_score, opponent_score, won,
+     ai_difficulty, game_mode, hand_scores, crib_scores,
+     highest_hand_score, total_points_scored, created_at, rated)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+# Columns of an exported game, in file order.
+EXPORT_COLUMNS = (
+    "player_name", "opponent_name", "player_score", "opponent_score", "won",
+    "ai_difficulty", "game_mode", "hand_scores", "crib_scores",
+    "highest_hand_score", "total_points_scored", "created_at", "rated",
+)
+
+# Rowid order for everyone (no sort), play order via the player index for one
+# player; both resume after the last (created_at,) id of the previous batch.
+_EXPORT_SELECT = f"""SELECT g.id, p.name AS player_name, o.name AS opponent_name, {', '.join(EXPORT_COLUMNS[2:])}
+                     FROM game_results g
+                     JOIN players p ON p.id = g.player_id
+                     JOIN players o ON o.id = g.opponent_id"""
+_EXPORT_ALL_SQL = f"{_EXPORT_SELECT} WHERE g.id <= ? AND g.id > ? ORDER BY g.id LIMIT ?"
+_EXPORT_PLAYER_SQL = f"""{_EXPORT_SELECT}
+                         WHERE g.player_id = ? AND g.id <= ? AND (g.created_at, g.id) > (?, ?)
+                         ORDER BY g.created_at, g.id LIMIT ?"""
+
+_LOOKUP_BATCH = 500  # keys per `IN (...)` lookup, well under SQLite's variable limit
+
+_STREAM_BATCH = 1000
+
+
+def _result_params(number: int, row: Mapping[str, Any]) -> tuple[Any, ...]:
+    """Exported row `number` (see EXPORT_COLUMNS) as _INSERT_RESULT_SQL parameters, with names for ids.
+
+    The row is checked against RecordGameRequest, so scores stay in the
+    ranges pack_scores can store; a bad row raises ValueError.
+    """
+    try:
+        game = RecordGameRequest.model_validate(row)
+        created_at = str(row["created_at"])
+        datetime.fromisoformat(created_at)
+        rated = row.get("rated", True)
+        if not isinstance(rated, (bool, int)):
+            raise TypeError(f"rated must be a boolean, not {rated!r}")
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Row {number}: {e}") from None
+    return (
+        game.player_name,
+        game.opponent_name,
+        game.player_score,
+        game.opponent_score,
+        1 if game.won else 0,
+        game.ai_difficulty or None,
+        game.game_mode or "single",
+        pack_scores(game.hand_scores),
+        pack_scores(game.crib_scores),
+        game.highest_hand_score,
+        game.total_points_scored,
+        created_at,
+        1 if rated else 0,
+    )
+
+
+_HISTORY_COLUMNS = """player_id, won, ai_difficulty, hand_scores, crib_scores,
+                      highest_hand_score, total_points_scored, created_at"""
+
+# One player's games (by name) in play order; answered from idx_game_results_player_created.
+PLAYER_HISTORY_SQL = f"""SELECT {_HISTORY_COLUMNS} FROM game_results
+                         WHERE player_id = (SELECT id FROM players WHERE name = ?)
+                         ORDER BY created_at ASC, id ASC"""
+
+# First day a player's raw games are kept from ('' if never compacted).
+_COMPACTED_BEFORE = """COALESCE((SELECT compacted_before FROM compacted_player_stats c
+                                 WHERE c.player_id = {table}.player_id), '')"""
+
+_TOTALS_COLUMNS = """player_id, games, wins, hand_total, hand_count, crib_total, crib_count,
+                     best_hand, total_points, current_streak, best_win_streak"""
+_DIFFICULTY_TOTALS_COLUMNS = "player_id, difficulty, games, wins, total_points, best_hand"
+
+
+def _rebuild_aggregates(
+    conn: sqlite3.Connection, player_id: int | None = None, after_id: int | None = None,
+) -> int:
+    """Recompute aggregate rows from game_results.
+
+    Scope is everyone, one player, or (with `after_id`) every player who
+    has a game newer than that id. Games stream in (player, play order)
+    straight off idx_game_results_player_created, so memory holds one
+    player's running totals at a time. Players whose old games were
+    compacted start from their compacted totals, and their daily rows
+    from before `compacted_before` are kept. Returns the number of games
+    folded in.
+    """
+    if player_id is not None:
+        scope, params = "player_id = :player_id", {"player_id": player_id}
+    elif after_id is not None:
+        scope = "player_id IN (SELECT player_id FROM game_results WHERE id > :after_id)"
+        params = {"after_id": after_id}
+    else:
+        scope, params = "1", {}
+    for table in _AGGREGATE_TABLES:
+        kept = f"day < {_COMPACTED_BEFORE.format(table=table)}" if table.startswith("player_daily") else "0"
+        conn.execute(f"DELETE FROM {table} WHERE {scope} AND NOT ({kept})", params)
+    rows = conn.execute(
+        f"""SELECT player_id, won, COALESCE(NULLIF(ai_difficulty, ''), 'multiplayer'),
+                   hand_scores, crib_scores, highest_hand_score, total_points_scored,
+                   substr(created_at, 1, 10)
+            FROM game_results
+            WHERE {scope} AND rated AND created_at >= {_COMPACTED_BEFORE.format(table="game_results")}
+            ORDER BY player_id, created_at, id""",
+        params,
+    )
+    builder = _AggregateBuilder(conn)
+    count = 0
+    while batch := rows.fetchmany(_STREAM_BATCH):
+        for row in batch:
+            builder.add(*row)
+        count += len(batch)
+    builder.finish()
+    # Players with no games left since compaction only have their compacted totals.
+    conn.execute(
+        f"""INSERT INTO player_stats ({_TOTALS_COLUMNS})
+            SELECT {_TOTALS_COLUMNS} FROM compacted_player_stats c
+            WHERE {scope} AND NOT EXISTS
+                (SELECT 1 FROM player_stats s WHERE s.player_id = c.player_id)""",
+        params,
+    )
+    conn.execute(
+        f"""INSERT INTO player_difficulty_stats ({_DIFFICULTY_TOTALS_COLUMNS})
+            SELECT {_DIFFICULTY_TOTALS_COLUMNS} FROM compacted_difficulty_stats c
+            WHERE {scope} AND NOT EXISTS
+                (SELECT 1 FROM player_difficulty_stats s
+                 WHERE s.player_id = c.player_id AND s.difficulty = c.difficulty)""",
+        params,
+    )
+    return count
+
+
+class _AggregateBuilder:
+    """Folds one player's games at a time into rows for the aggregate tables.
+
+    Mirrors the _UPSERT_* statements game by game, but writes each player,
+    day and difficulty row once with a plain INSERT.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.compacted = conn.execute("SELECT EXISTS (SELECT 1 FROM compacted_player_stats)").fetchone()[0]
+        self.player: int | None = None
+        self.day: str | None = None
+        self.rows: dict[str, list[tuple[Any, ...]]] = {table: [] for table in _AGGREGATE_TABLES}
+
+    def add(
+        self, player_id: int, won: int, difficulty: str, hand_scores: bytes,
+        crib_scores: bytes, highest_hand: int, total_points: int, day: str,
+    ) -> None:
+        if player_id != self.player:
+            self._end_player()
+            self.player = player_id
+            # totals: games, wins, hand_total, hand_count, crib_total, crib_count,
+            # best_hand, total_points, current_streak, best_win_streak
+            # by_difficulty: games, wins, total_points, best_hand
+            if self.compacted:
+                self.totals, self.by_difficulty = _compacted_totals(self.conn, player_id)
+            else:
+                self.totals, self.by_difficulty = [0] * 10, {}
+        if day != self.day:
+            self._end_day()
+            self.day = day
+            self.day_totals = [0] * 11  # as self.totals, with lead_wins before the streaks
+            self.day_by_difficulty: dict[str, list[int]] = {}  # games, wins
+
+        game = (won, sum(hand_scores), len(hand_scores), sum(crib_scores), len(crib_scores),
+                highest_hand, total_points)
+        if won and self.day_totals[8] == self.day_totals[0]:
+            self.day_totals[8] += 1  # lead_wins: unbeaten so far today
+        _fold_game(self.totals, 8, *game)
+        _fold_game(self.day_totals, 9, *game)
+        _fold_difficulty(self.by_difficulty.setdefault(difficulty, [0, 0, 0, 0]), won, highest_hand, total_points)
+        dd = self.day_by_difficulty.setdefault(difficulty, [0, 0])
+        dd[0] += 1
+        dd[1] += won
+
+    def _end_day(self) -> None:
+        if self.day is None:
+            return
+        self.rows["player_daily_stats"].append((self.player, self.day, *self.day_totals))
+        self.rows["player_daily_difficulty_stats"].extend(
+            (self.player, self.day, difficulty, *d) for difficulty, d in self.day_by_difficulty.items()
+        )
+        self.day = None
+
+    def _end_player(self) -> None:
+        if self.player is None:
+            return
+        self._end_day()
+        self.rows["player_stats"].append((self.player, *self.totals))
+        self.rows["player_difficulty_stats"].extend(
+            (self.player, difficulty, *d) for difficulty, d in self.by_difficulty.items()
+        )
+        if len(self.rows["player_daily_stats"]) >= _STREAM_BATCH:
+            self._flush()
+
+    def finish(self) -> None:
+        self._end_player()
+        self.player = None
+        self._flush()
+
+    def _flush(self) -> None:
+        for table, rows in self.rows.items():
+            if rows:
+                self.conn.executemany(_INSERT_AGGREGATE_SQL[table], rows)
+                rows.clear()
+
+
+def _fold_game(
+    t: list[int], streak: int, won: int, hand_total: int, hand_count: int,
+    crib_total: int, crib_count: int, highest_hand: int, total_points: int,
+) -> None:
+    """Add one game to a totals row whose current/best win streaks sit at t[streak], t[streak + 1]."""
+    t[0] += 1
+    t[1] += won
+    t[2] += hand_total
+    t[3] += hand_count
+    t[4] += crib_total
+    t[5] += crib_count
+    t[6] = max(t[6], highest_hand)
+    t[7] += total_points
+    if won:
+        t[streak] = max(t[streak], 0) + 1
+        t[streak + 1] = max(t[streak + 1], t[streak])
+    else:
+        t[streak] = min(t[streak], 0) - 1
+
+
+def _fold_difficulty(d: list[int], won: int, highest_hand: int, total_points: int) -> None:
+    d[0] += 1
+    d[1] += won
+    d[2] += total_points
+    d[3] = max(d[3], highest_hand)
+
+
+def _compacted_totals(conn: sqlite3.Connection, player_id: int) -> tuple[list[int], dict[str, list[int]]]:
+    """A player's compacted (totals, by_difficulty), in _AggregateBuilder's layout."""
+    row = conn.execute(
+        f"SELECT {_TOTALS_COLUMNS} FROM compacted_player_stats WHERE player_id = ?", (player_id,)
+    ).fetchone()
+    by_difficulty = {
+        difficulty: list(values)
+        for _, difficulty, *values in conn.execute(
+            f"SELECT {_DIFFICULTY_TOTALS_COLUMNS} FROM compacted_difficulty_stats WHERE player_id = ?",
+            (player_id,),
+        )
+    }
+    return (list(row[1:]) if row else [0] * 10), by_difficulty
+
+
+# Next batch of games to compact, in (player, play order) after a keyset position.
+# `counted` is false for unrated games and for games imported after their day
+# was compacted; the rebuild skipped them, so they are deleted without being folded in.
+_COMPACT_BATCH_SQL = f"""
+    SELECT id, player_id, created_at, won, COALESCE(NULLIF(ai_difficulty, ''), 'multiplayer'),
+           hand_scores, crib_scores, highest_hand_score, total_points_scored,
+           rated AND created_at >= {_COMPACTED_BEFORE.format(table="game_results")} AS counted
+    FROM game_results
+    WHERE (player_id, created_at, id) > (?, ?, ?) AND created_at < ?
+    ORDER BY player_id, created_at, id
+    LIMIT ?"""
+
+
+# compacted_before never moves back, e.g. when retention is lengthened.
+_REPLACE_COMPACTED_STATS = f"""
+    INSERT OR REPLACE INTO compacted_player_stats ({_TOTALS_COLUMNS}, compacted_before)
+    SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, MAX(?, COALESCE(MAX(compacted_before), ''))
+    FROM compacted_player_stats WHERE player_id = ?"""
+
+
+def _player_day(row: tuple[Any, ...]) -> tuple[int, str]:
+    return row[1], row[2][:10]
+
+
+def _fold_compacted(conn: sqlite3.Connection, rows: list[tuple[Any, ...]]) -> None:
+    """Add a _COMPACT_BATCH_SQL batch, made of whole player-days, to its players' compacted totals."""
+    for player_id, group in itertools.groupby(rows, key=lambda row: row[1]):
+        games = list(group)
+        next_day = (date.fromisoformat(games[-1][2][:10]) + timedelta(days=1)).isoformat()
+        totals, by_difficulty = _compacted_totals(conn, player_id)
+        for _, _, _, won, difficulty, hand_scores, crib_scores, highest_hand, total_points, counted in games:
+            if not counted:
+                continue
+            _fold_game(totals, 8, won, sum(hand_scores), len(hand_scores), sum(crib_scores),
+                       len(crib_scores), highest_hand, total_points)
+            _fold_difficulty(by_difficulty.setdefault(difficulty, [0, 0, 0, 0]), won, highest_hand, total_points)
+        conn.execute(_REPLACE_COMPACTED_STATS, (player_id, *totals, next_day, player_id))
+        conn.executemany(
+            f"""INSERT OR REPLACE INTO compacted_difficulty_stats ({_DIFFICULTY_TOTALS_COLUMNS})
+                VALUES (?, ?, ?, ?, ?, ?)""",
+            [(player_id, difficulty, *d) for difficulty, d in by_difficulty.items()],
+        )
+
+
+_VACUUM_STEP_PAGES = 2048  # pages released per incremental_vacuum transaction
+
+
+_INSERT_AGGREGATE_SQL = {
+    "player_stats": """INSERT INTO player_stats
+        (player_id, games, wins, hand_total, hand_count, crib_total, crib_count,
+         best_hand, total_points, current_streak, best_win_streak)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+    "player_difficulty_stats": """INSERT INTO player_difficulty_stats
+        (player_id, difficulty, games, wins, total_points, best_hand)
+        VALUES (?, ?, ?, ?, ?, ?)""",
+    "player_daily_stats": """INSERT INTO player_daily_stats
+        (player_id, day, games, wins, hand_total, hand_count, crib_total, crib_count,
+         best_hand, total_points, lead_wins, current_streak, best_win_streak)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+    "player_daily_difficulty_stats": """INSERT INTO player_daily_difficulty_stats
+        (player_id, day, difficulty, games, wins)
+        VALUES (?, ?, ?, ?, ?)""",
+}
+
+
+_AGGREGATE_TABLES = (
+    "player_stats",
+    "player_difficulty_stats",
+    "player_daily_stats",
+    "player_daily_difficulty_stats",
+)
+
+
+def _apply_aggregates(conn: sqlite3.Connection, params: list[dict[str, Any]]) -> None:
+    """Fold games (in play order) into the per-player aggregate rows."""
+    conn.executemany(_UPSERT_PLAYER_STATS, params)
+    conn.executemany(_UPSERT_DIFFICULTY_STATS, params)
+    conn.executemany(_UPSERT_DAILY_STATS, params)
+    conn.executemany(_UPSERT_DAILY_DIFFICULTY_STATS, params)
+
+
+def _aggregate_params(
+    player_id: int,
+    won: bool,
+    ai_difficulty: str | None,
+    hand_scores: Sequence[int],
+    crib_scores: Sequence[int],
+    highest_hand_score: int,
+    total_points_scored: int,
+    created_at: str,
+) -> dict[str, Any]:
+    # Scores arrive as lists or as packed bytes; len() and sum() work on both
+    # without unpacking (iterating bytes yields cached small ints).
+    return {
+        "player_id": player_id,
+        "won": 1 if won else 0,
+        "difficulty": ai_difficulty or "multiplayer",
+        "hand_total": sum(hand_scores),
+        "hand_count": len(hand_scores),
+        "crib_total": sum(crib_scores),
+        "crib_count": len(crib_scores),
+        "best_hand": highest_hand_score,
+        "total_points": total_points_scored,
+        "day": created_at[:10],  # created_at is ISO 8601 in UTC
+    }
+
+
+# In DO UPDATE, bare column names are the row's values before this game.
+_UPSERT_PLAYER_STATS = """
+    INSERT INTO player_stats
+        (player_id, games, wins, hand_total, hand_count, crib_total, crib_count,
+         best_hand, total_points, current_streak, best_win_streak)
+    VALUES
+        (:player_id, 1, :won, :hand_total, :hand_count, :crib_total, :crib_count,
+         :best_hand, :total_points, CASE WHEN :won THEN 1 ELSE -1 END, :won)
+    ON CONFLICT (player_id) DO UPDATE SET
+        games = games + 1,
+        wins = wins + excluded.wins,
+        hand_total = hand_total + excluded.hand_total,
+        hand_count = hand_count + excluded.hand_count,
+        crib_total = crib_total + excluded.crib_total,
+        crib_count = crib_count + excluded.crib_count,
+        best_hand = MAX(best_hand, excluded.best_hand),
+        total_points = total_points + excluded.total_points,
+        current_streak = CASE
+            WHEN excluded.wins THEN MAX(current_streak, 0) + 1
+            ELSE MIN(current_streak, 0) - 1
+        END,
+        best_win_streak = CASE
+            WHEN excluded.wins THEN MAX(best_win_streak, MAX(current_streak, 0) + 1)
+            ELSE best_win_streak
+        END
+"""
+
+_UPSERT_DIFFICULTY_STATS = """
+    INSERT INTO player_difficulty_stats
+        (player_id, difficulty, games, wins, total_points, best_hand)
+    VALUES (:player_id, :difficulty, 1, :won, :total_points, :best_hand)
+    ON CONFLICT (player_id, difficulty) DO UPDATE SET
+        games = games + 1,
+        wins = wins + excluded.wins,
+        total_points = total_points + excluded.total_points,
+        best_hand = MAX(best_hand, excluded.best_hand)
+"""
+
+_UPSERT_DAILY_STATS = """
+    INSERT INTO player_daily_stats
+        (player_id, day, games, wins, hand_total, hand_count, crib_total, crib_count,
+         best_hand, total_points, lead_wins, current_streak, best_win_streak)
+    VALUES
+        (:player_id, :day, 1, :won, :hand_total, :hand_count, :crib_total, :crib_count,
+         :best_hand, :total_points, :won, CASE WHEN :won THEN 1 ELSE -1 END, :won)
+    ON CONFLICT (player_id, day) DO UPDATE SET
+        games = games + 1,
+        wins = wins + excluded.wins,
+        hand_total = hand_total + excluded.hand_total,
+        hand_count = hand_count + excluded.hand_count,
+        crib_total = crib_total + excluded.crib_total,
+        crib_count = crib_count + excluded.crib_count,
+        best_hand = MAX(best_hand, excluded.best_hand),
+        total_points = total_points + excluded.total_points,
+        lead_wins = CASE WHEN lead_wins = games AND excluded.wins THEN lead_wins + 1 ELSE lead_wins END,
+        current_streak = CASE
+            WHEN excluded.wins THEN MAX(current_streak, 0) + 1
+            ELSE MIN(current_streak, 0) - 1
+        END,
+        best_win_streak = CASE
+            WHEN excluded.wins THEN MAX(best_win_streak, MAX(current_streak, 0) + 1)
+            ELSE best_win_streak
+        END
+"""
+
+_UPSERT_DAILY_DIFFICULTY_STATS = """
+    INSERT INTO player_daily_difficulty_stats (player_id, day, difficulty, games, wins)
+    VALUES (:player_id, :day, :difficulty, 1, :won)
+    ON CONFLICT (player_id, day, difficulty) DO UPDATE SET
+        games = games + 1,
+        wins = wins + excluded.wins
+"""
 
 
 stats_db = StatsDB()
@@ -0,0 +1,77 @@
+"""NDJSON and CSV encodings of exported game results.
+
+Writers take the dicts from `StatsDB.iter_results` and yield text chunks,
+so they can feed a StreamingResponse or a file. Readers turn lines back
+into the dicts `StatsDB.import_results` expects. Both sides stream; no
+format holds more than one batch of rows.
+
+In CSV, score lists are space-separated ("4 8 12") and a missing AI
+difficulty is an empty cell.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import itertools
+import json
+from typing import Any, Iterable, Iterator
+
+from backend.services.stats_db import EXPORT_COLUMNS
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+_BATCH = 1000  # rows per yielded chunk
+
+
+def write_ndjson(rows: Iterable[dict[str, Any]]) -> Iterator[str]:
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, _BATCH)):
+        yield "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in batch)
+
+
+def write_csv(rows: Iterable[dict[str, Any]]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(EXPORT_COLUMNS)
+    rows = iter(rows)
+    while batch := list(itertools.islice(rows, _BATCH)):
+        writer.writerows(
+            [
+                row["player_name"], row["opponent_name"], row["player_score"],
+                row["opponent_score"], int(row["won"]), row["ai_difficulty"] or "",
+                row["game_mode"], " ".join(map(str, row["hand_scores"])),
+                " ".join(map(str, row["crib_scores"])), row["highest_hand_score"],
+                row["total_points_scored"], row["created_at"], int(row["rated"]),
+            ]
+            for row in batch
+        )
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()  # header only: nothing to export
+
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Line {number}: {e}") from None
+
+
+def read_csv(lines: Iterable[str]) -> Iterator[dict[str, Any]]:
+    for row in csv.DictReader(lines):
+        row["won"] = row["won"].strip().lower() in ("1", "true")
+        if row.get("rated") is not None:  # files exported before the column are all rated
+            row["rated"] = row["rated"].strip().lower() in ("1", "true")
+        row["hand_scores"] = [int(v) for v in row["hand_scores"].split()]
+        row["crib_scores"] = [int(v) for v in row["crib_scores"].split()]
+        yield row
+
+
+WRITERS = {"ndjson": write_ndjson, "csv": write_csv}
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
@@ -0,0 +1,87 @@
+"""Background retention and compaction job for the stats database.
+
+Every `stats_maintenance_interval_seconds` the job runs `StatsDB.maintain`
+on a worker thread: games older than `stats_retention_days` are compacted
+away in small batches, free pages go back to the OS with
+`incremental_vacuum`, and `PRAGMA optimize` refreshes planner statistics.
+The report of the last run is exposed through `metrics`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Optional
+
+from backend.config import settings
+from backend.services.stats_db import StatsDB, stats_db
+
+logger = logging.getLogger(__name__)
+
+
+class StatsMaintenance:
+    def __init__(
+        self,
+        db: StatsDB | None = None,
+        interval_seconds: float | None = None,
+        retention_days: int | None = None,
+        batch_size: int | None = None,
+    ):
+        self.db = db or stats_db
+        self.interval = settings.stats_maintenance_interval_seconds if interval_seconds is None else interval_seconds
+        self.retention_days = settings.stats_retention_days if retention_days is None else retention_days
+        self.batch_size = batch_size or settings.stats_retention_batch_size
+        self._task: Optional[asyncio.Task[None]] = None
+        # Metrics
+        self._runs = 0
+        self._errors = 0
+        self._last_report: Optional[dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(), name="stats-maintenance")
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def run_once(self) -> dict[str, Any]:
+        report = self.db.maintain(self.retention_days, self.batch_size)
+        self._runs += 1
+        self._last_report = report
+        logger.info(
+            "Stats maintenance: deleted %d games, reclaimed %d bytes in %.2fs",
+            report["deleted_rows"], report["reclaimed_bytes"], report["seconds"],
+        )
+        return report
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception:
+                self._errors += 1
+                logger.exception("Stats maintenance failed")
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "running": self.running,
+            "retention_days": self.retention_days,
+            "runs": self._runs,
+            "errors": self._errors,
+            "last_run": self._last_report,
+        }
+
+
+stats_maintenance = StatsMaintenance()
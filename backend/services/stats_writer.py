@@ -0,0 +1,231 @@
+"""Group-commit writer for game results.
+
+`submit` puts a result on an asyncio queue. A single background task
+collects whatever arrives within `stats_write_max_delay_ms` (or until
+`stats_write_batch_size` results are waiting) and commits them in one
+transaction on a worker thread. This replaces a commit per request.
+
+In durable mode (the default) `submit` returns only after the batch that
+holds its result has committed. With `stats_write_durable = False` it
+returns as soon as the result is queued, and write errors are only logged.
+Before `start` is called, such as in tests or scripts, `submit` writes
+straight through. `submit(req, rated=False)` stores a game a client
+reported without counting it (see `StatsDB.record_games`); a batch holding
+both kinds commits them as two transactions.
+
+Engines report finished games through `record_results`, which queues
+without waiting and can be called from any thread. The rows of one
+game (both players in multiplayer) always commit together.
+
+A failed batch is retried with exponential backoff. If it still fails
+after `stats_write_retry_attempts` tries, its games are committed one at
+a time, so a single bad game cannot take the others down with it. A game
+that fails only because the database is busy or locked is retried until
+it commits. Any other error on a single game is logged along with the
+game, and a waiting caller gets the exception.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import time
+from collections import deque
+from typing import Any, Optional
+
+from backend.config import settings
+from backend.game.models import RecordGameRequest
+from backend.services.stats_db import StatsDB, stats_db
+
+logger = logging.getLogger(__name__)
+
+_LATENCY_SAMPLES = 1024
+_MAX_BACKOFF = 5.0  # seconds between retries once the delay stops doubling
+
+# (rows committed together, rated, future the caller awaits or None, enqueue time)
+_Entry = tuple[list[RecordGameRequest], bool, Optional[asyncio.Future[None]], float]
+
+
+class StatsWriter:
+    def __init__(
+        self,
+        db: StatsDB | None = None,
+        batch_size: int | None = None,
+        max_delay_ms: float | None = None,
+        durable: bool | None = None,
+    ):
+        self.db = db or stats_db
+        self.batch_size = batch_size or settings.stats_write_batch_size
+        self.max_delay = (settings.stats_write_max_delay_ms if max_delay_ms is None else max_delay_ms) / 1000
+        self.durable = settings.stats_write_durable if durable is None else durable
+        self.retry_attempts = max(1, settings.stats_write_retry_attempts)
+        self.retry_backoff = settings.stats_write_retry_backoff_ms / 1000
+        self._queue: Optional[asyncio.Queue[_Entry]] = None
+        self._task: Optional[asyncio.Task[None]] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Metrics
+        self._batches = 0
+        self._rows = 0
+        self._errors = 0
+        self._retries = 0
+        self._max_batch = 0
+        self._latencies: deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(), name="stats-writer")
+
+    async def close(self) -> None:
+        """Commit everything still queued, then stop the writer task."""
+        if self._task is None:
+            return
+        await asyncio.sleep(0)  # let puts already scheduled by submit_nowait land
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._queue = None
+        self._loop = None
+
+    async def submit(self, req: RecordGameRequest, rated: bool = True) -> None:
+        if self._task is None:
+            start = time.perf_counter()
+            await asyncio.to_thread(self.db.record_games, [req], rated)
+            self._record_batch(1, [time.perf_counter() - start])
+            return
+        future = asyncio.get_running_loop().create_future() if self.durable else None
+        self._queue.put_nowait(([req], rated, future, time.perf_counter()))
+        if future is not None:
+            await future
+
+    def submit_nowait(self, reqs: list[RecordGameRequest]) -> None:
+        """Queue rows to commit in one transaction without waiting; thread-safe."""
+        if self._task is None:
+            start = time.perf_counter()
+            self.db.record_games(reqs)
+            self._record_batch(len(reqs), [time.perf_counter() - start])
+            return
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (reqs, True, None, time.perf_counter()))
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            rows = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_delay
+            while rows < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 and queue.empty():
+                    break
+                try:
+                    batch.append(queue.get_nowait() if remaining <= 0 else
+                                 await asyncio.wait_for(queue.get(), remaining))
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                rows += len(batch[-1][0])
+            try:
+                # Rated and unrated games commit separately; record_games takes one kind.
+                for rated in (True, False):
+                    if entries := [entry for entry in batch if entry[1] is rated]:
+                        await self._commit(entries, rated)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _commit(self, batch: list[_Entry], rated: bool) -> None:
+        try:
+            await self._write([req for reqs, _, _, _ in batch for req in reqs], rated, self.retry_attempts)
+        except Exception:
+            logger.warning("Batch of %d games keeps failing; recording them one at a time", len(batch), exc_info=True)
+        else:
+            self._committed(batch)
+            return
+        for entry in batch:
+            reqs, _, future, _ = entry
+            try:
+                await self._write(reqs, rated, None)
+            except Exception as e:
+                self._errors += 1
+                logger.exception("Could not record game %s", [req.model_dump_json() for req in reqs])
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            else:
+                self._committed([entry])
+
+    async def _write(self, reqs: list[RecordGameRequest], rated: bool, attempts: Optional[int]) -> None:
+        """`record_games` with backoff; `attempts=None` retries database errors until they clear."""
+        delay = self.retry_backoff
+        attempt = 1
+        while True:
+            try:
+                await asyncio.to_thread(self.db.record_games, reqs, rated)
+                return
+            except Exception as e:
+                if attempts is not None:
+                    retry = attempt < attempts
+                else:
+                    # OperationalError is the database (locked, busy, disk), not the rows.
+                    retry = isinstance(e, sqlite3.OperationalError)
+                if not retry:
+                    raise
+                self._retries += 1
+                logger.warning("Recording %d results failed (attempt %d), retrying in %.2fs: %s",
+                               len(reqs), attempt, delay, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _MAX_BACKOFF)
+            attempt += 1
+
+    def _committed(self, batch: list[_Entry]) -> None:
+        done = time.perf_counter()
+        self._record_batch(sum(len(reqs) for reqs, _, _, _ in batch),
+                           [done - queued for reqs, _, _, queued in batch for _ in reqs])
+        for _, _, future, _ in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    def _record_batch(self, size: int, latencies: list[float]) -> None:
+        self._batches += 1
+        self._rows += size
+        self._max_batch = max(self._max_batch, size)
+        self._latencies.extend(latencies)
+
+    def metrics(self) -> dict[str, Any]:
+        """Batch sizes and enqueue-to-commit latency over recent writes."""
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 3)
+
+        return {
+            "running": self.running,
+            "durable": self.durable,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self._batches,
+            "rows": self._rows,
+            "errors": self._errors,
+            "retries": self._retries,
+            "mean_batch_size": round(self._rows / self._batches, 2) if self._batches else 0.0,
+            "max_batch_size": self._max_batch,
+            "latency_ms_p50": percentile(0.50),
+            "latency_ms_p99": percentile(0.99),
+        }
+
+
+stats_writer = StatsWriter()
+
+
+def record_results(results: list[RecordGameRequest]) -> None:
+    """`on_game_over` hook for engines; a plain function so engines still pickle."""
+    stats_writer.submit_nowait(results)
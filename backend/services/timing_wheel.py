@@ -0,0 +1,139 @@
+"""Shared hashed timing wheel for multiplayer timeouts.
+
+One asyncio task advances the wheel every `timing_wheel_tick_ms`, instead
+of one sleeping task per game or connection. A timer lands in slot
+`deadline % timing_wheel_slots`, under its deadline tick, so scheduling
+and cancelling are O(1). Each tick pops only the timers that are due now;
+timers for later turns of the wheel stay keyed by their own deadline and
+are never scanned. The cost of a tick is therefore constant plus the
+timers that fire, however many are pending.
+
+Callbacks are plain functions run on the event loop. Anything slow or
+async should be handed to a task.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Callable, Optional
+
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    __slots__ = ("deadline", "callback", "args", "done")
+
+    def __init__(self, deadline: int, callback: Callable[..., Any], args: tuple[Any, ...]):
+        self.deadline = deadline  # tick number
+        self.callback = callback
+        self.args = args
+        self.done = False  # fired or cancelled
+
+
+class TimingWheel:
+    def __init__(self, tick_ms: float | None = None, slots: int | None = None):
+        self.tick = (settings.timing_wheel_tick_ms if tick_ms is None else tick_ms) / 1000
+        self.slots = slots or settings.timing_wheel_slots
+        # slot -> {deadline tick: timers due then}
+        self._wheel: list[dict[int, dict[Timer, None]]] = [{} for _ in range(self.slots)]
+        self._now = 0  # ticks processed so far
+        self._pending = 0
+        self._task: Optional[asyncio.Task[None]] = None
+        # Metrics
+        self._fired = 0
+        self._errors = 0
+        self._max_tick_seconds = 0.0
+
+    def __len__(self) -> int:
+        return self._pending
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="timing-wheel")
+
+    async def close(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def schedule(self, delay: float, callback: Callable[..., Any], *args: Any) -> Timer:
+        """Call `callback(*args)` after at least `delay` seconds (rounded up to ticks)."""
+        deadline = self._now + max(1, math.ceil(delay / self.tick))
+        timer = Timer(deadline, callback, args)
+        self._wheel[deadline % self.slots].setdefault(deadline, {})[timer] = None
+        self._pending += 1
+        return timer
+
+    def cancel(self, timer: Timer) -> bool:
+        """Drop a pending timer; False if it already fired or was cancelled."""
+        if timer.done:
+            return False
+        timer.done = True
+        slot = self._wheel[timer.deadline % self.slots]
+        due = slot.get(timer.deadline)
+        if due is not None:
+            del due[timer]
+            if not due:
+                del slot[timer.deadline]
+        # Otherwise its tick is running and the done flag skips it.
+        self._pending -= 1
+        return True
+
+    def advance(self, ticks: int = 1) -> int:
+        """Move the wheel on by `ticks` and run what became due; returns timers fired."""
+        fired = 0
+        for _ in range(ticks):
+            self._now += 1
+            due = self._wheel[self._now % self.slots].pop(self._now, None)
+            if not due:
+                continue
+            for timer in due:
+                if timer.done:
+                    continue  # cancelled by an earlier callback of this tick
+                timer.done = True
+                self._pending -= 1
+                fired += 1
+                try:
+                    timer.callback(*timer.args)
+                except Exception:
+                    self._errors += 1
+                    logger.exception("Timer callback failed")
+        self._fired += fired
+        return fired
+
+    async def _run(self) -> None:
+        next_tick = time.monotonic() + self.tick
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            # Catch up on ticks missed while the loop was busy.
+            ticks = 1 + max(0, int((time.monotonic() - next_tick) / self.tick))
+            next_tick += ticks * self.tick
+            start = time.perf_counter()
+            self.advance(ticks)
+            self._max_tick_seconds = max(self._max_tick_seconds, time.perf_counter() - start)
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "running": self.running,
+            "pending": self._pending,
+            "fired": self._fired,
+            "errors": self._errors,
+            "max_tick_ms": round(self._max_tick_seconds * 1000, 3),
+        }
+
+
+timing_wheel = TimingWheel()
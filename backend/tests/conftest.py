@@ -0,0 +1,23 @@
+"""Keep the databases and logs the suite writes out of the working tree.
+
+The stats DB, session store and action log are module singletons opened
+at import, so their paths are pointed at a scratch directory before any
+test module imports the backend.
+"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_DATA_DIR = tempfile.mkdtemp(prefix="cribbage-tests-")
+os.environ["STATS_DB_PATH"] = os.path.join(_DATA_DIR, "cribbage_stats.db")
+os.environ["SESSION_DB_PATH"] = os.path.join(_DATA_DIR, "cribbage_sessions.db")
+os.environ["ACTION_LOG_PATH"] = os.path.join(_DATA_DIR, "game_actions.log")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _scratch_data_dir():
+    yield _DATA_DIR
+    shutil.rmtree(_DATA_DIR, ignore_errors=True)
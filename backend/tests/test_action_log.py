@@ -0,0 +1,136 @@
+"""Tests for the append-only action log and crash recovery."""
+
+import threading
+
+import pytest
+
+from backend.game.game_engine import GameEngine
+from backend.game.models import AIDifficulty, GamePhase
+from backend.services.action_log import ActionLog
+from backend.services.session_manager import SessionManager
+
+
+@pytest.fixture
+def log(tmp_path):
+    action_log = ActionLog(path=str(tmp_path / "actions.log"))
+    yield action_log
+    action_log.close()
+
+
+def _play_logged(log: ActionLog, engine: GameEngine, op: str, **args) -> None:
+    getattr(engine, op)(**args)
+    log.log_action(engine.game_id, op, args)
+
+
+def _play_round(log: ActionLog, engine: GameEngine) -> None:
+    _play_logged(log, engine, "discard", card_indices=[0, 1])
+    for _ in range(20):
+        if engine.phase != GamePhase.PLAY or engine.current_turn != "human":
+            break
+        playable = [
+            i for i, c in enumerate(engine.human_play_hand)
+            if c.value + engine.running_total <= 31
+        ]
+        if playable:
+            _play_logged(log, engine, "play_card", card_index=playable[0])
+        else:
+            _play_logged(log, engine, "say_go")
+
+
+def test_same_seed_same_deal():
+    a = GameEngine("Alice", AIDifficulty.MEDIUM, seed=42)
+    b = GameEngine("Alice", AIDifficulty.MEDIUM, seed=42)
+    assert a.human.hand == b.human.hand
+    assert a.crib == b.crib
+
+
+def test_recover_replays_live_game(log):
+    engine = GameEngine("Alice", AIDifficulty.HARD, seed=7)
+    log.log_new_game(engine)
+    _play_round(log, engine)
+
+    store = SessionManager()
+    assert log.recover(store) == 1
+    restored = store.get(engine.game_id)
+    assert restored is not None
+    assert restored.get_state().model_dump(exclude={"action_log", "last_action"}) == \
+        engine.get_state().model_dump(exclude={"action_log", "last_action"})
+
+
+def test_recover_keeps_seeded_games_unranked(log):
+    from backend.services.stats_writer import record_results
+
+    ranked = GameEngine("Alice", AIDifficulty.EASY, seed=8)
+    ranked.on_game_over = record_results
+    unranked = GameEngine("Bob", AIDifficulty.EASY, seed=9)
+    log.log_new_game(ranked)
+    log.log_new_game(unranked)
+
+    store = SessionManager()
+    assert log.recover(store) == 2
+    assert store.get(ranked.game_id).on_game_over is record_results
+    assert store.get(unranked.game_id).on_game_over is None
+
+
+def test_finished_games_are_not_recovered(log):
+    live = GameEngine("Alice", AIDifficulty.EASY, seed=1)
+    done = GameEngine("Bob", AIDifficulty.EASY, seed=2)
+    log.log_new_game(live)
+    log.log_new_game(done)
+    log.log_end(done.game_id)
+
+    store = SessionManager()
+    assert log.recover(store) == 1
+    assert store.get(done.game_id) is None
+    # Recovery compacts the log down to live games only.
+    assert {r["game_id"] for r in log.read()} == {live.game_id}
+
+
+def test_torn_last_line_is_ignored(log):
+    engine = GameEngine("Alice", AIDifficulty.EASY, seed=3)
+    log.log_new_game(engine)
+    with open(log.path, "a") as f:
+        f.write('{"game_id": "x", "op": "disc')
+    assert len(list(log.read())) == 1
+
+
+def test_concurrent_appends_are_all_durable(log):
+    def worker(n: int) -> None:
+        for i in range(25):
+            log.log_action(f"game-{n}", "say_go", {})
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(list(log.read())) == 200
+
+
+def test_disabled_log_is_noop(tmp_path):
+    log = ActionLog(path="")
+    log.log_action("game", "say_go", {})
+    assert list(log.read()) == []
+    assert log.recover(SessionManager()) == 0
+
+
+def test_log_is_off_with_sqlite_sessions(monkeypatch):
+    from backend.config import settings
+
+    monkeypatch.setattr(settings, "session_backend", "sqlite")
+    assert not ActionLog().enabled
+    monkeypatch.setattr(settings, "session_backend", "memory")
+    assert ActionLog().enabled == bool(settings.action_log_path)
+
+
+def test_finished_games_compacted_at_runtime(log, monkeypatch):
+    from backend.config import settings
+
+    monkeypatch.setattr(settings, "action_log_compact_after", 1)
+    live = GameEngine("Alice", AIDifficulty.EASY, seed=4)
+    done = GameEngine("Bob", AIDifficulty.EASY, seed=5)
+    log.log_new_game(live)
+    log.log_new_game(done)
+    log.log_end(done.game_id)
+    log.log_action(live.game_id, "say_go", {})  # next batch triggers compaction
+    assert {r["game_id"] for r in log.read()} == {live.game_id}
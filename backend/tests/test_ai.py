@@ -25,6 +25,18 @@ class TestCreateAI:
         assert isinstance(ai, HardAI)
 
 
+class TestSeededAI:
+    def test_same_rng_seed_same_choices(self):
+        import random
+
+        hand = [card("A"), card("4"), card("7"), card("9"), card("J"), card("K", "Spades")]
+        picks = [
+            EasyAI(random.Random(5)).choose_discards(hand, is_dealer=False)
+            for _ in range(2)
+        ]
+        assert picks[0] == picks[1]
+
+
 class TestEasyAI:
     def test_discards_two_cards(self):
         ai = EasyAI()
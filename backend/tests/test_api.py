@@ -1,9 +1,14 @@
 """Integration tests for game REST API."""
 
+import uuid
+
 import pytest
 from fastapi.testclient import TestClient
 
+from backend.game.models import RecordGameRequest
 from backend.main import app
+from backend.services.session_manager import session_manager
+from backend.services.stats_db import LEADERBOARD_MIN_GAMES, stats_db
 
 client = TestClient(app)
 
@@ -14,6 +19,78 @@ def test_health():
     assert resp.json() == {"status": "ok"}
 
 
+def test_metrics():
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert {"batches", "rows", "latency_ms_p99"} <= resp.json()["stats_writer"].keys()
+    assert {"runs", "last_run"} <= resp.json()["stats_maintenance"].keys()
+
+
+def test_leaderboard_route():
+    resp = client.get("/api/v1/stats/leaderboard", params={"metric": "best_hand", "limit": 5})
+    assert resp.status_code == 200
+    assert resp.json()["metric"] == "best_hand"
+    assert client.get("/api/v1/stats/leaderboard", params={"cursor": "bogus"}).status_code == 400
+    assert client.get("/api/v1/stats/leaderboard", params={"metric": "losses"}).status_code == 422
+
+
+def test_stats_routes_answer_503_when_readers_are_busy(monkeypatch):
+    from backend.services.stats_db import StatsBusyError
+
+    def busy(*args, **kwargs):
+        raise StatsBusyError("Stats database is busy, try again shortly")
+
+    monkeypatch.setattr(stats_db, "get_stats", busy)
+    monkeypatch.setattr(stats_db, "leaderboard", busy)
+    assert client.get("/api/v1/stats/Alice").status_code == 503
+    assert client.get("/api/v1/stats/leaderboard").status_code == 503
+
+
+def test_windowed_stats_route():
+    name = f"Windowed-{uuid.uuid4().hex[:8]}"
+    assert client.get(f"/api/v1/stats/{name}", params={"window": "7d"}).json()["games"] == 0
+    assert client.get(f"/api/v1/stats/{name}", params={"since": "2026-01-01"}).status_code == 200
+    resp = client.get(f"/api/v1/stats/{name}", params={"window": "30d", "since": "2026-01-01"})
+    assert resp.status_code == 400
+
+
+def test_stats_route_returns_rating_and_rank():
+    name = f"Rated-{uuid.uuid4().hex[:8]}"
+    assert client.get(f"/api/v1/stats/{name}").json()["rating"] is None
+    stats_db.record_game(RecordGameRequest(
+        player_name=name, opponent_name="Computer", player_score=121,
+        opponent_score=90, won=True, ai_difficulty="hard",
+    ))
+    body = client.get(f"/api/v1/stats/{name}").json()
+    assert body["rating"] > 1500
+    assert body["rank"] >= 1
+
+
+def test_client_reported_games_are_unrated():
+    name = f"Reported-{uuid.uuid4().hex[:8]}"
+    payload = {
+        "player_name": name, "opponent_name": "Computer", "player_score": 121,
+        "opponent_score": 90, "won": True, "ai_difficulty": "hard",
+    }
+    for _ in range(LEADERBOARD_MIN_GAMES):
+        assert client.post("/api/v1/stats/record", json=payload).status_code == 200
+    body = client.get(f"/api/v1/stats/{name}").json()
+    assert body["games"] == 0
+    assert body["rating"] is None
+    board = client.get("/api/v1/stats/leaderboard", params={"metric": "total_points", "limit": 100}).json()
+    assert name not in [entry["player_name"] for entry in board["entries"]]
+    rows = list(stats_db.iter_results(name))
+    assert len(rows) == LEADERBOARD_MIN_GAMES
+    assert not any(row["rated"] for row in rows)
+
+
+def test_export_route_streams_csv():
+    resp = client.get("/api/v1/stats/export", params={"format": "csv", "player": "Nobody-Exported"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    assert resp.text.splitlines()[0].startswith("player_name,opponent_name")
+
+
 def test_new_game():
     resp = client.post("/api/v1/game/new", json={"player_name": "Alice"})
     assert resp.status_code == 200
@@ -38,6 +115,14 @@ def test_get_game_not_found():
     assert resp.status_code == 404
 
 
+def test_unknown_game_actions_leave_no_locks():
+    before = len(session_manager._locks)
+    for i in range(20):
+        assert client.post(f"/api/v1/game/nope-{i}/go").status_code == 404
+        assert client.post(f"/api/v1/game/nope-{i}/actions", json={"actions": [{"type": "go"}]}).status_code == 404
+    assert len(session_manager._locks) == before
+
+
 def test_discard_cards():
     resp = client.post("/api/v1/game/new", json={})
     data = resp.json()
@@ -158,6 +243,34 @@ def _play_one_round(game_id: str) -> dict:
     return client.get(f"/api/v1/game/{game_id}").json()
 
 
+def test_finished_game_is_recorded_by_server():
+    name = f"Recorded-{uuid.uuid4().hex[:8]}"
+    game_id = client.post("/api/v1/game/new", json={"player_name": name}).json()["game_id"]
+    for _ in range(40):
+        data = _play_one_round(game_id)
+        if data["phase"] == "game_over":
+            break
+    assert data["phase"] == "game_over"
+    assert data["stats_recorded"] is True
+    stats = stats_db.get_stats(name)
+    assert stats.games == 1
+    assert stats.wins == (data["winner"] == name)
+    assert stats.total_points == data["player"]["score"]
+
+
+def test_seeded_game_is_not_recorded():
+    name = f"Seeded-{uuid.uuid4().hex[:8]}"
+    game_id = client.post("/api/v1/game/new", json={"player_name": name, "seed": 3}).json()["game_id"]
+    for _ in range(40):
+        data = _play_one_round(game_id)
+        if data["phase"] == "game_over":
+            break
+    assert data["phase"] == "game_over"
+    assert data["stats_recorded"] is False
+    assert stats_db.get_stats(name).games == 0
+    assert stats_db.get_rating(name) == stats_db.get_rating(f"Nobody-{uuid.uuid4().hex[:8]}")
+
+
 def test_multi_round_game_flow():
     """Play through multiple rounds to verify dealer rotation and round number."""
     resp = client.post("/api/v1/game/new", json={"player_name": "Tester"})
@@ -192,3 +305,143 @@ def test_his_heels_via_api():
     # After discard, should be in play or game_over (if His Heels won)
     assert data["phase"] in ["play", "game_over"]
     assert data["starter"] is not None
+
+
+def test_seeded_games_replay_identically():
+    resp1 = client.post("/api/v1/game/new", json={"player_name": "Tester", "seed": 1234})
+    resp2 = client.post("/api/v1/game/new", json={"player_name": "Tester", "seed": 1234})
+    data1, data2 = resp1.json(), resp2.json()
+    assert data1["seed"] is None
+    assert data1["player"]["hand"] == data2["player"]["hand"]
+
+    play1 = client.post(f"/api/v1/game/{data1['game_id']}/discard", json={"card_indices": [0, 1]}).json()
+    play2 = client.post(f"/api/v1/game/{data2['game_id']}/discard", json={"card_indices": [0, 1]}).json()
+    assert play1["starter"] == play2["starter"]
+    assert play1["play_pile"] == play2["play_pile"]
+
+
+def test_seed_hidden_until_game_over():
+    from backend.game.game_engine import GameEngine
+    from backend.game.models import AIDifficulty, GamePhase
+
+    assert client.post("/api/v1/game/new", json={}).json()["seed"] is None
+    engine = GameEngine("Tester", AIDifficulty.EASY)
+    assert engine.get_state().seed is None
+    engine.phase = GamePhase.GAME_OVER
+    assert engine.get_state().seed == engine.seed
+
+
+def _scripted_round(seed: int):
+    """Play one round locally on a seeded engine, recording the batched actions."""
+    from backend.game.game_engine import GameEngine
+    from backend.game.models import AIDifficulty, GamePhase
+
+    engine = GameEngine("Tester", AIDifficulty.EASY, seed=seed)
+    actions = [{"type": "discard", "card_indices": [0, 1]}]
+    engine.discard([0, 1])
+    while engine.phase == GamePhase.PLAY:
+        playable = [
+            i for i, c in enumerate(engine.human_play_hand)
+            if c.value + engine.running_total <= 31
+        ]
+        if playable:
+            actions.append({"type": "play", "card_index": playable[0]})
+            engine.play_card(playable[0])
+        else:
+            actions.append({"type": "go"})
+            engine.say_go()
+    while engine.phase in (GamePhase.COUNT_NON_DEALER, GamePhase.COUNT_DEALER, GamePhase.COUNT_CRIB):
+        actions.append({"type": "acknowledge"})
+        engine.acknowledge()
+    return actions, engine
+
+
+def test_batched_round():
+    actions, expected = _scripted_round(seed=77)
+    game_id = client.post("/api/v1/game/new", json={"seed": 77, "player_name": "Tester"}).json()["game_id"]
+
+    resp = client.post(f"/api/v1/game/{game_id}/actions", json={"actions": actions})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["state"]["phase"] == expected.phase.value
+    assert data["state"]["player"]["score"] == expected.human.score
+    assert data["state"]["opponent"]["score"] == expected.computer.score
+    assert any(e["action"] == "play" for e in data["events"])
+    assert client.get(f"/api/v1/game/{game_id}").json()["round_number"] == expected.round_number
+
+
+def test_batched_actions_are_atomic():
+    game_id = client.post("/api/v1/game/new", json={}).json()["game_id"]
+    resp = client.post(
+        f"/api/v1/game/{game_id}/actions",
+        json={"actions": [{"type": "discard", "card_indices": [0, 1]}, {"type": "acknowledge"}]},
+    )
+    assert resp.status_code == 400
+    assert resp.json()["detail"].startswith("Action 1 (acknowledge)")
+    data = client.get(f"/api/v1/game/{game_id}").json()
+    assert data["phase"] == "discard"
+    assert len(data["player"]["hand"]) == 6
+
+
+def test_game_result_is_sent_only_after_the_save(monkeypatch):
+    from backend.game.deck import create_card
+    from backend.game.models import GamePhase
+    from backend.services.session_manager import SessionConflictError
+
+    recorded = []
+    monkeypatch.setattr("backend.api.routes_game.record_results", recorded.extend)
+    game_id = client.post("/api/v1/game/new", json={"player_name": "Saver"}).json()["game_id"]
+    # One Go away from the end: the computer is out of cards and Saver played last.
+    engine = session_manager.get(game_id)
+    engine.phase = GamePhase.PLAY
+    engine.current_turn = "human"
+    engine.human_play_hand = [create_card("Hearts", "K")]
+    engine.computer_play_hand = []
+    engine.play_pile = [create_card("Clubs", "10"), create_card("Spades", "5"), create_card("Hearts", "Q")]
+    engine.running_total = 25
+    engine.last_played_by = "human"
+    engine.human.score = 120
+
+    def conflict(engine):
+        raise SessionConflictError("Game was modified concurrently")
+
+    batch = {"actions": [{"type": "go"}]}
+    with monkeypatch.context() as m:
+        m.setattr(session_manager, "save", conflict)
+        assert client.post(f"/api/v1/game/{game_id}/actions", json=batch).status_code == 409
+    assert recorded == []
+    resp = client.post(f"/api/v1/game/{game_id}/actions", json=batch)
+    assert resp.status_code == 200
+    assert resp.json()["state"]["phase"] == "game_over" and resp.json()["state"]["stats_recorded"]
+    assert [row.player_name for row in recorded] == ["Saver"]
+
+
+def test_batch_size_is_capped():
+    from backend.game.models import MAX_BATCH_ACTIONS
+
+    game_id = client.post("/api/v1/game/new", json={}).json()["game_id"]
+    resp = client.post(
+        f"/api/v1/game/{game_id}/actions", json={"actions": [{"type": "go"}] * (MAX_BATCH_ACTIONS + 1)}
+    )
+    assert resp.status_code == 422
+    assert client.get(f"/api/v1/game/{game_id}").json()["phase"] == "discard"
+
+
+def test_batched_action_missing_argument():
+    game_id = client.post("/api/v1/game/new", json={}).json()["game_id"]
+    resp = client.post(f"/api/v1/game/{game_id}/actions", json={"actions": [{"type": "discard"}]})
+    assert resp.status_code == 400
+
+
+def test_auto_count_scores_all_phases_in_one_call():
+    actions, _ = _scripted_round(seed=77)
+    plays = [a for a in actions if a["type"] != "acknowledge"]
+    resp = client.post("/api/v1/game/new", json={"seed": 77, "player_name": "Tester", "auto_count": True})
+    game_id = resp.json()["game_id"]
+    data = client.post(f"/api/v1/game/{game_id}/actions", json={"actions": plays}).json()["state"]
+    assert data["phase"] == "count_non_dealer"
+
+    data = client.post(f"/api/v1/game/{game_id}/acknowledge").json()
+    assert data["phase"] == "discard"
+    assert data["round_number"] == 2
+    assert len(data["score_breakdowns"]) == 3
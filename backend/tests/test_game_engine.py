@@ -0,0 +1,40 @@
+"""Tests for the single-player engine's pegging rules."""
+
+from backend.game.deck import create_card
+from backend.game.game_engine import GameEngine
+from backend.game.models import AIDifficulty, GamePhase
+
+
+def card(rank: str, suit: str = "Hearts"):
+    return create_card(suit, rank)
+
+
+def _pegging(human_hand, computer_hand, running_total, last_played_by):
+    eng = GameEngine("Alice", AIDifficulty.EASY, seed=1)
+    eng.phase = GamePhase.PLAY
+    eng.current_turn = "human"
+    eng.human_play_hand = human_hand
+    eng.computer_play_hand = computer_hand
+    eng.play_pile = [card("10"), card("5", "Clubs"), card("Q", "Spades")][: 1 + running_total // 10]
+    eng.running_total = running_total
+    eng.last_played_by = last_played_by
+    eng.human.score = eng.computer.score = 0
+    return eng
+
+
+class TestGo:
+    def test_go_point_goes_to_last_card_player(self):
+        # Alice says Go, the computer can't play either: it played last, so it pegs the point.
+        eng = _pegging([card("K")], [card("Q", "Clubs")], 25, last_played_by="computer")
+        eng.say_go()
+        assert (eng.human.score, eng.computer.score) == (0, 1)
+        # The count restarted and the computer led its last card.
+        assert eng.play_pile == [card("Q", "Clubs")] and eng.running_total == 10
+
+    def test_go_against_empty_hand_ends_the_count(self):
+        # The computer is out of cards, so nobody can answer Alice's Go.
+        eng = _pegging([card("K")], [], 25, last_played_by="computer")
+        eng.say_go()
+        assert eng.computer.score == 1
+        assert eng.running_total == 0 and eng.last_go_by is None
+        assert eng.current_turn == "human" and eng.phase == GamePhase.PLAY
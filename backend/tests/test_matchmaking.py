@@ -0,0 +1,362 @@
+"""Tests for the quick-match queue and private game codes."""
+
+import asyncio
+
+import pytest
+
+from backend.api.websocket_handler import ConnectionManager, ai_difficulty_for
+from backend.config import settings
+from backend.game.models import AIDifficulty, GamePhase
+from backend.services.matchmaking import MatchmakingQueue
+from backend.services.stats_db import StatsDB
+from backend.services.timing_wheel import TimingWheel
+
+
+@pytest.fixture
+def queue():
+    return MatchmakingQueue(window=100.0, growth_per_second=10.0, max_window=600.0, code_ttl=60.0)
+
+
+def test_pairs_closest_rating_in_window(queue):
+    assert queue.add_to_queue("a", 1200.0, now=0.0) is None
+    assert queue.add_to_queue("b", 1560.0, now=0.0) is None
+    assert queue.add_to_queue("c", 1450.0, now=0.0) is None
+    assert queue.add_to_queue("d", 1540.0, now=1.0) == "b"
+    assert queue.add_to_queue("e", 1480.0, now=1.0) == "c"
+    assert len(queue) == 1
+
+
+def test_window_widens_with_wait(queue):
+    assert queue.add_to_queue("a", 1500.0, now=0.0) is None
+    # 300 points is outside the starting window ...
+    assert queue.add_to_queue("b", 1800.0, now=5.0) is None
+    queue.remove_from_queue("b")
+    # ... but inside it after "a" has waited 20 seconds (100 + 20 * 10).
+    assert queue.add_to_queue("c", 1800.0, now=20.0) == "a"
+    # The window stops growing at the maximum.
+    assert queue.add_to_queue("d", 2500.0, now=1000.0) is None
+
+
+def test_older_player_wins_a_tie(queue):
+    queue.add_to_queue("a", 1560.0, now=0.0)
+    queue.add_to_queue("b", 1440.0, now=1.0)
+    assert queue.add_to_queue("c", 1500.0, now=2.0) == "a"
+
+
+def test_queueing_twice_keeps_other_players(queue):
+    queue.add_to_queue("a", 1500.0, now=0.0)
+    assert queue.add_to_queue("a", 1500.0, now=1.0) is None
+    assert len(queue) == 1
+    assert queue.add_to_queue("b", 1500.0, now=2.0) == "a"
+
+
+def test_remove_from_queue(queue):
+    queue.add_to_queue("a", 1500.0, now=0.0)
+    queue.remove_from_queue("a")
+    queue.remove_from_queue("a")
+    assert "a" not in queue
+    assert queue.add_to_queue("b", 1500.0, now=1.0) is None
+    assert queue.metrics()["queued"] == 1
+
+
+def test_metrics_track_match_quality(queue):
+    queue.add_to_queue("a", 1500.0, now=0.0)
+    queue.add_to_queue("b", 1540.0, now=4.0)
+    metrics = queue.metrics()
+    assert (metrics["queued"], metrics["matches"]) == (0, 1)
+    assert (metrics["mean_rating_gap"], metrics["mean_wait_seconds"]) == (40.0, 4.0)
+
+
+def test_pair_waiting_matches_whole_pool(queue):
+    for conn_id, rating in (("a", 1000.0), ("b", 1090.0), ("c", 1110.0), ("d", 1200.0), ("e", 2000.0)):
+        queue.enqueue(conn_id, rating, now=0.0)
+    # Pairing the closest two (b, c) would strand a and d.
+    assert sorted(queue.pair_waiting(now=0.0)) == [("a", "b"), ("c", "d")]
+    assert list(queue._band_of) == ["e"]
+    assert queue.metrics()["mean_rating_gap"] == 90.0
+
+
+def test_pair_waiting_favours_long_waiters(queue):
+    queue.enqueue("old", 1300.0, now=0.0)
+    queue.enqueue("mid", 1450.0, now=30.0)
+    queue.enqueue("new", 1480.0, now=30.0)
+    # "old" has waited long enough to take "mid" despite the bigger gap.
+    assert queue.pair_waiting(now=30.0) == [("old", "mid")]
+    assert queue.pair_waiting(now=31.0) == []
+
+
+def test_matchmaker_ticks_and_starts_games_concurrently():
+    queue = MatchmakingQueue(window=100.0, growth_per_second=0.0, max_window=100.0, tick_ms=10)
+    started, release = [], asyncio.Event()
+
+    async def on_match(a, b):
+        started.append((a, b))
+        await release.wait()
+
+    async def run():
+        await queue.start(on_match)
+        for i in range(6):
+            queue.enqueue(f"p{i}", 1500.0 + i)
+        while len(started) < 3:
+            await asyncio.sleep(0.005)
+        release.set()
+        await asyncio.sleep(0.05)
+        await queue.close()
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+    assert len(queue) == 0 and not queue.running
+    assert queue.metrics()["ticks"] >= 1 and queue.metrics()["tick_errors"] == 0
+
+
+def test_start_match_requeues_partner_of_a_dropped_player(monkeypatch):
+    queue = MatchmakingQueue()
+    monkeypatch.setattr("backend.api.websocket_handler.matchmaking", queue)
+    manager = ConnectionManager()
+
+    async def run():
+        a, b = [await manager.connect(_FakeWebSocket()) for _ in range(2)]
+        manager._ratings[a] = 1620.0
+        await manager.disconnect(b)
+        await manager.start_match(a, b)
+        return a
+
+    a = asyncio.run(run())
+    assert a in queue and not manager._games
+
+
+def test_private_games(queue):
+    code = queue.create_private_game("host")
+    assert queue.join_private_game(code.lower()) == "host"
+    assert queue.join_private_game(code) is None
+
+
+def test_creator_cannot_join_own_code(queue):
+    code = queue.create_private_game("host")
+    with pytest.raises(ValueError, match="own game"):
+        queue.join_private_game(code, joiner="host")
+    assert queue.join_private_game(code, joiner="guest") == "host"
+
+
+def test_private_game_reverse_index(queue):
+    first = queue.create_private_game("host")
+    second = queue.create_private_game("host")
+    # Only the newest code of a connection stays open.
+    assert queue.join_private_game(first) is None
+    other = queue.create_private_game("other")
+    queue.cancel_private_game("host")
+    assert queue.join_private_game(second) is None
+    assert queue.join_private_game(other) == "other"
+    queue.cancel_private_game("other")  # already joined: nothing to cancel
+    assert queue._private_games == {} and queue._private_codes == {}
+
+
+def test_private_codes_expire(queue, monkeypatch):
+    code = queue.create_private_game("host", now=0.0)
+    assert queue.join_private_game(code, now=60.0) is None
+    assert "host" not in queue._private_codes
+    # A cancelled code's heap entry must not expire the code's next holder.
+    monkeypatch.setattr("backend.services.matchmaking.generate_join_code", lambda: "AAAAAA")
+    queue.create_private_game("a", now=100.0)
+    queue.cancel_private_game("a")
+    queue.create_private_game("b", now=130.0)
+    assert queue.expire_private_games(now=165.0) == []
+    assert queue.expire_private_games(now=190.0) == ["b"]
+    metrics = queue.metrics()
+    assert (metrics["private_games"], metrics["codes_issued"], metrics["codes_expired"]) == (0, 3, 2)
+
+
+def test_codes_skip_open_games(queue, monkeypatch):
+    draws = iter(["AAAAAA", "AAAAAA", "BBBBBB"])
+    monkeypatch.setattr("backend.services.matchmaking.generate_join_code", lambda: next(draws))
+    assert queue.create_private_game("a", now=0.0) == "AAAAAA"
+    assert queue.create_private_game("b", now=0.0) == "BBBBBB"
+    assert queue.metrics()["code_collisions"] == 1
+
+
+class _FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+
+def test_self_join_is_rejected_and_code_stays_open():
+    manager = ConnectionManager()
+    host, guest = _FakeWebSocket(), _FakeWebSocket()
+
+    async def run():
+        a, b = await manager.connect(host), await manager.connect(guest)
+        await manager.handle_message(a, {"type": "create_private", "name": "Ann"})
+        code = host.sent[-1]["code"]
+        await manager.handle_message(a, {"type": "join_private", "code": code, "name": "Ann"})
+        assert host.sent[-1]["type"] == "error" and not manager._games
+        await manager.handle_message(b, {"type": "join_private", "code": code, "name": "Ben"})
+        assert guest.sent[-1]["type"] == "game_start"
+        await manager.close()
+
+    asyncio.run(run())
+
+
+def test_disconnect_notifies_opponent_and_drops_finished_games():
+    manager = ConnectionManager()
+    sockets = [_FakeWebSocket() for _ in range(4)]
+
+    async def run():
+        a, b, c, d = [await manager.connect(ws) for ws in sockets]
+        for host, guest in ((a, b), (c, d)):
+            await manager.handle_message(host, {"type": "create_private", "name": host})
+            code = manager._connections[host].sent[-1]["code"]
+            await manager.handle_message(guest, {"type": "join_private", "code": code, "name": guest})
+        assert len(manager._games) == 2
+        await manager.disconnect(a)
+        assert sockets[1].sent[-1]["type"] == "opponent_disconnected"
+        assert sockets[3].sent[-1]["type"] == "game_start"
+        assert len(manager._games) == 2
+        await manager.disconnect(b)
+        assert len(manager._games) == 1 and len(manager._game_players) == 1
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def wheel(monkeypatch):
+    wheel = TimingWheel(tick_ms=2, slots=64)
+    monkeypatch.setattr("backend.api.websocket_handler.timing_wheel", wheel)
+    return wheel
+
+
+@pytest.fixture
+def ai_manager(monkeypatch, tmp_path, wheel):
+    monkeypatch.setattr("backend.api.websocket_handler.matchmaking", MatchmakingQueue())
+    monkeypatch.setattr("backend.api.websocket_handler.stats_db", StatsDB(db_path=str(tmp_path / "stats.db")))
+    monkeypatch.setattr(settings, "matchmaking_ai_fallback_seconds", 0.01)
+    monkeypatch.setattr(settings, "multiplayer_ai_takeover_seconds", 0.01)
+    monkeypatch.setattr(settings, "multiplayer_finished_game_ttl_seconds", 0.01)
+    return ConnectionManager()
+
+
+def test_ai_difficulty_for_rating():
+    assert ai_difficulty_for(1000.0) == AIDifficulty.EASY
+    assert ai_difficulty_for(1520.0) == AIDifficulty.MEDIUM
+    assert ai_difficulty_for(2400.0) == AIDifficulty.HARD
+
+
+def test_quick_match_falls_back_to_computer(ai_manager, wheel):
+    ws = _FakeWebSocket()
+
+    async def run():
+        await wheel.start()
+        conn_id = await ai_manager.connect(ws)
+        await ai_manager.handle_message(conn_id, {"type": "quick_match", "name": "Solo"})
+        await asyncio.sleep(0.1)
+        await ai_manager.close()
+        await wheel.close()
+
+    asyncio.run(run())
+    assert [m["type"] for m in ws.sent[:2]] == ["waiting", "game_start"]
+    [engine] = ai_manager._games.values()
+    assert engine.player2.name == "Computer" and engine.player2_discarded
+    assert ws.sent[-1]["type"] == "game_state"
+
+
+def test_computer_takes_over_and_finished_game_is_freed(ai_manager, wheel):
+    stay, leave = _FakeWebSocket(), _FakeWebSocket()
+
+    async def run():
+        await wheel.start()
+        a, b = await ai_manager.connect(stay), await ai_manager.connect(leave)
+        await ai_manager.handle_message(a, {"type": "create_private", "name": "Ann"})
+        await ai_manager.handle_message(b, {"type": "join_private", "code": stay.sent[-1]["code"], "name": "Ben"})
+        [game_id] = ai_manager._games
+        engine = ai_manager._games[game_id]
+        await ai_manager.disconnect(b)
+        await asyncio.sleep(0.1)
+        assert "player2" in engine.ai_seats and engine.player2_discarded
+        assert "opponent_replaced" in [m["type"] for m in stay.sent]
+        # Once the game is over it is freed after the TTL.
+        engine.phase = GamePhase.GAME_OVER
+        await ai_manager.handle_message(a, {"type": "acknowledge"})
+        await asyncio.sleep(0.1)
+        await ai_manager.close()
+        await wheel.close()
+        return a
+
+    a = asyncio.run(run())
+    assert not ai_manager._games and not ai_manager._game_locks and a not in ai_manager._player_game
+
+
+def test_expired_code_tells_its_creator(ai_manager, wheel, monkeypatch):
+    queue = MatchmakingQueue(code_ttl=0.02)
+    monkeypatch.setattr("backend.api.websocket_handler.matchmaking", queue)
+    first, second = _FakeWebSocket(), _FakeWebSocket()
+
+    async def run():
+        await wheel.start()
+        a, b = await ai_manager.connect(first), await ai_manager.connect(second)
+        await ai_manager.handle_message(a, {"type": "create_private", "name": "Ann"})
+        await asyncio.sleep(0.03)
+        # Creating b's code sweeps a's away before a's timer fires; a still hears about it.
+        await ai_manager.handle_message(b, {"type": "create_private", "name": "Ben"})
+        await asyncio.sleep(0.1)
+        await ai_manager.close()
+        await wheel.close()
+
+    asyncio.run(run())
+    for ws in (first, second):
+        assert [m["type"] for m in ws.sent] == ["private_created", "private_game_expired"]
+    assert not queue._private_games and not ai_manager._code_timers and not len(wheel)
+    assert queue.metrics()["codes_expired"] == 2
+
+
+def test_departed_player_loses_after_takeover(ai_manager, wheel, monkeypatch):
+    recorded = []
+    monkeypatch.setattr("backend.api.websocket_handler.record_results", recorded.extend)
+    stay, leave = _FakeWebSocket(), _FakeWebSocket()
+
+    async def run():
+        await wheel.start()
+        a, b = await ai_manager.connect(stay), await ai_manager.connect(leave)
+        await ai_manager.handle_message(a, {"type": "create_private", "name": "Ann"})
+        await ai_manager.handle_message(b, {"type": "join_private", "code": stay.sent[-1]["code"], "name": "Ben"})
+        [engine] = ai_manager._games.values()
+        await ai_manager.disconnect(b)
+        await asyncio.sleep(0.1)
+        assert "player2" in engine.ai_seats
+        # The computer wins on the board in Ben's seat; it still counts as his loss.
+        engine.player2.score = 121
+        assert engine._check_winner()
+        await ai_manager.close()
+        await wheel.close()
+
+    asyncio.run(run())
+    assert {(row.player_name, row.opponent_name, row.won) for row in recorded} == {
+        ("Ann", "Ben", True), ("Ben", "Ann", False),
+    }
+
+
+def test_idle_players_time_out_and_forfeit(ai_manager, wheel, monkeypatch):
+    monkeypatch.setattr(settings, "multiplayer_turn_seconds", 0.01)
+    monkeypatch.setattr(settings, "multiplayer_forfeit_after_timeouts", 1)
+    monkeypatch.setattr(settings, "multiplayer_finished_game_ttl_seconds", 10.0)
+    host, guest = _FakeWebSocket(), _FakeWebSocket()
+
+    async def run():
+        await wheel.start()
+        a, b = await ai_manager.connect(host), await ai_manager.connect(guest)
+        await ai_manager.handle_message(a, {"type": "create_private", "name": "Ann"})
+        await ai_manager.handle_message(b, {"type": "join_private", "code": host.sent[-1]["code"], "name": "Ben"})
+        [engine] = ai_manager._games.values()
+        await ai_manager.handle_message(a, {"type": "discard", "card_indices": [0, 1]})
+        await asyncio.sleep(0.1)
+        assert engine.winner == "Ann" and engine.last_action.action == "forfeit"
+        # The clock timer is gone; only the finished game's expiry is pending.
+        assert len(wheel) == 1
+        await ai_manager.close()
+        await wheel.close()
+
+    asyncio.run(run())
+    assert host.sent[-1]["state"]["winner"] == "Ann"
@@ -3,7 +3,7 @@
 import pytest
 
 from backend.game.deck import create_card
-from backend.game.models import GamePhase
+from backend.game.models import AIDifficulty, GamePhase
 from backend.game.multiplayer_engine import MultiplayerGameEngine
 
 
@@ -20,6 +20,18 @@ class TestMultiplayerInit:
         assert len(eng.player2.hand) == 6
         assert eng.winner is None
 
+    def test_seed_reproduces_deal(self):
+        a = MultiplayerGameEngine("Alice", "Bob", seed=99)
+        b = MultiplayerGameEngine("Alice", "Bob", seed=99)
+        assert a.player1.hand == b.player1.hand
+        assert a.player2.hand == b.player2.hand
+
+    def test_seed_hidden_until_game_over(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", seed=99)
+        assert eng.get_state("player1").seed is None
+        eng.phase = GamePhase.GAME_OVER
+        assert eng.get_state("player1").seed == 99
+
     def test_dealer_assignment(self):
         eng = MultiplayerGameEngine("Alice", "Bob")
         assert not eng.player1.is_dealer
@@ -169,6 +181,33 @@ class TestMultiplayerGo:
         # After both can't play, pile should reset
         assert eng.running_total == 0
 
+    def test_go_point_goes_to_last_card_player(self):
+        eng = self._setup_play()
+        eng.current_turn = "player2"
+        eng.running_total = 25
+        eng.play_pile = [card("10"), card("5", "Clubs"), card("Q", "Spades")]
+        eng.last_played_by = "player1"
+        eng.player1_play_hand = [card("K")]
+        eng.player2_play_hand = [card("Q")]
+        eng.player1.score = eng.player2.score = 0
+        # Bob's Go is the last action, but Alice played the last card.
+        eng.say_go("player2")
+        assert (eng.player1.score, eng.player2.score) == (1, 0)
+
+    def test_other_player_leads_when_last_card_empties_a_hand(self):
+        eng = self._setup_play()
+        eng.current_turn = "player1"
+        eng.running_total = 20
+        eng.play_pile = [card("10"), card("10", "Diamonds")]
+        eng.player1_play_hand = [card("5")]
+        eng.player2_play_hand = [card("K")]
+        eng.player1.score = eng.player2.score = 0
+        eng.play_card("player1", 0)
+        # Alice is out of cards and Bob can't play: Alice pegs the Go and Bob leads the next count.
+        assert eng.player1.score == 1
+        assert eng.running_total == 0
+        assert eng.current_turn == "player2"
+
 
 class TestMultiplayerCounting:
     def _play_through(self, eng):
@@ -230,6 +269,47 @@ class TestMultiplayerCounting:
         assert eng.player1.is_dealer is True
         assert eng.player2.is_dealer is False
 
+    def test_auto_count_single_acknowledge(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", seed=11, auto_count=True)
+        eng.discard("player1", [0, 1])
+        eng.discard("player2", [0, 1])
+        self._play_through(eng)
+
+        if eng.phase == GamePhase.GAME_OVER:
+            return
+
+        state = eng.acknowledge("player1")
+        if eng.phase == GamePhase.GAME_OVER:
+            return
+        assert eng.phase == GamePhase.DISCARD
+        assert eng.round_number == 2
+        assert len(state.score_breakdowns) == 3
+        assert state.score_breakdowns[2].hand == eng.score_breakdowns[2].hand
+
+    def test_game_over_emits_both_results_once(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", seed=5, auto_count=True)
+        emitted = []
+        eng.on_game_over = emitted.append
+        for _ in range(60):
+            if eng.phase == GamePhase.GAME_OVER:
+                break
+            if eng.phase == GamePhase.DISCARD:
+                eng.discard("player1", [0, 1])
+                eng.discard("player2", [0, 1])
+            elif eng.phase == GamePhase.PLAY:
+                self._play_through(eng)
+            else:
+                eng.acknowledge("player1")
+        assert eng.phase == GamePhase.GAME_OVER
+        eng.emit_game_over()  # a second call is a no-op
+        assert len(emitted) == 1
+        alice, bob = emitted[0]
+        assert (alice.player_name, bob.player_name) == ("Alice", "Bob")
+        assert alice.won != bob.won
+        assert alice.game_mode == bob.game_mode == "multiplayer"
+        assert alice.player_score == bob.opponent_score
+        assert eng.get_state("player1").stats_recorded
+
     def test_score_breakdown_populated(self):
         eng = MultiplayerGameEngine("Alice", "Bob")
         eng.discard("player1", [0, 1])
@@ -278,3 +358,145 @@ class TestMultiplayerGetState:
         assert s1.opponent.name == "Bob"
         assert s2.player.name == "Bob"
         assert s2.opponent.name == "Alice"
+
+
+class TestMultiplayerAISeat:
+    @staticmethod
+    def _finish(eng):
+        # The computer plays its seats; the "human" only acknowledges counts.
+        for _ in range(10_000):
+            if eng.phase == GamePhase.GAME_OVER:
+                return
+            if not eng.ai_move():
+                eng.acknowledge("player1")
+        raise AssertionError("game did not finish")
+
+    def test_computer_seats_finish_the_game(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", seed=7)
+        eng.seat_ai("player1", AIDifficulty.EASY)
+        eng.seat_ai("player2", AIDifficulty.HARD)
+        self._finish(eng)
+        assert eng.winner in ("Alice", "Bob")
+        assert eng.game_results() == []
+
+    def test_human_row_names_computer_difficulty(self):
+        eng = MultiplayerGameEngine("Alice", "Computer", seed=3)
+        eng.seat_ai("player2", AIDifficulty.MEDIUM)
+        assert eng.ai_move() and eng.player2_discarded
+        assert not eng.ai_move()  # waiting on Alice's discard
+        [row] = eng.game_results()
+        assert (row.player_name, row.opponent_name, row.ai_difficulty) == ("Alice", "Computer", "medium")
+
+    def test_taken_over_seat_forfeits(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", seed=5)
+        eng.take_over("player2", AIDifficulty.HARD)
+        eng.player2.score = 121
+        assert eng._check_winner() and eng.winner == "Bob"
+        rows = {row.player_name: row for row in eng.game_results()}
+        # Bob left, so he loses and Alice wins whatever the computer scored for him.
+        assert (rows["Bob"].won, rows["Alice"].won) == (False, True)
+        assert rows["Bob"].opponent_name == "Alice" and rows["Alice"].opponent_name == "Bob"
+        assert rows["Alice"].ai_difficulty is None and rows["Bob"].ai_difficulty is None
+
+    def test_seeded_ai_seat_replays(self):
+        games = []
+        for _ in range(2):
+            eng = MultiplayerGameEngine("Alice", "Bob", seed=11)
+            eng.seat_ai("player1", AIDifficulty.HARD)
+            eng.seat_ai("player2", AIDifficulty.HARD)
+            self._finish(eng)
+            games.append((eng.player1.score, eng.player2.score, eng.round_number))
+        assert games[0] == games[1]
+
+
+class TestMultiplayerClocks:
+    def test_turn_timeout_discards_for_the_idle_player(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", turn_seconds=30, forfeit_after=3)
+        eng.start_clocks(0.0)
+        kept = eng.player2.hand[:4]
+        eng.discard("player1", [0, 1])
+        eng.moved("player1", 10.0)
+        assert eng.next_deadline() == 40.0
+        assert not eng.check_clocks(39.0)
+        assert eng.check_clocks(40.0)
+        assert eng.player2_discarded and eng.player2.hand == kept
+        assert eng.phase in (GamePhase.PLAY, GamePhase.GAME_OVER)
+        assert eng.timeouts == {"player1": 0, "player2": 1}
+
+    def test_turn_timeout_plays_or_says_go(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", turn_seconds=30)
+        eng.phase = GamePhase.PLAY
+        eng.current_turn = "player1"
+        eng.player1_play_hand = [card("K"), card("5")]
+        eng.player2_play_hand = [card("9")]
+        eng.running_total = 25
+        eng.start_clocks(0.0)
+        assert eng.check_clocks(30.0)
+        assert eng.last_action.card == card("5")
+        eng.current_turn = "player2"
+        eng.running_total = 25
+        assert eng.check_clocks(60.0)
+        assert eng.last_action.action == "go"
+
+    def test_repeated_timeouts_forfeit(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", turn_seconds=30, forfeit_after=2)
+        eng.start_clocks(0.0)
+        eng.discard("player1", [0, 1])
+        eng.moved("player1", 0.0)
+        assert eng.check_clocks(30.0)  # Bob's first timeout: his discard is made for him
+        eng.current_turn = "player2"
+        assert eng.check_clocks(60.0)
+        assert eng.phase == GamePhase.GAME_OVER and eng.winner == "Alice"
+        assert eng.next_deadline() is None
+        results = {r.player_name: r.won for r in eng.game_results()}
+        assert results == {"Alice": True, "Bob": False}
+
+    def test_count_timeout_acknowledges_once(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", turn_seconds=30)
+        eng.phase = GamePhase.COUNT_NON_DEALER
+        eng.starter = card("2", "Spades")
+        eng.start_clocks(0.0)
+        assert eng.due_players() == ["player1", "player2"]
+        assert eng.check_clocks(30.0)
+        assert eng.phase in (GamePhase.COUNT_DEALER, GamePhase.GAME_OVER)
+        # Neither player acknowledged, so both are charged.
+        assert eng.timeouts == {"player1": 1, "player2": 1}
+
+    def test_count_timeout_forfeits_player2(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", turn_seconds=30, forfeit_after=2)
+        eng.phase = GamePhase.COUNT_NON_DEALER
+        eng.starter = card("2", "Spades")
+        eng.start_clocks(0.0)
+        eng.timeouts["player2"] = 1  # Bob already let a turn run out; Alice did not
+        assert eng.check_clocks(30.0)
+        assert eng.phase == GamePhase.GAME_OVER and eng.winner == "Alice"
+        assert eng.last_action.action == "forfeit" and eng.last_action.actor == "Bob"
+
+    def test_count_timeout_charges_only_the_human_against_the_computer(self):
+        eng = MultiplayerGameEngine("Computer", "Bob", turn_seconds=30)
+        eng.seat_ai("player1", AIDifficulty.EASY)
+        eng.phase = GamePhase.COUNT_NON_DEALER
+        eng.starter = card("2", "Spades")
+        eng.start_clocks(0.0)
+        assert eng.check_clocks(30.0)
+        assert eng.timeouts == {"player1": 0, "player2": 1}
+
+    def test_game_clock_forfeits_trailing_player(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", game_seconds=600)
+        eng.start_clocks(0.0)
+        assert eng.next_deadline() == 600.0 and eng.turn_deadline is None
+        eng.player1.score, eng.player2.score = 80, 95
+        assert eng.check_clocks(600.0)
+        assert eng.winner == "Bob" and eng.last_action.action == "forfeit"
+
+    def test_game_clock_tie_goes_against_the_dealer(self):
+        eng = MultiplayerGameEngine("Alice", "Bob", game_seconds=600)
+        eng.start_clocks(0.0)
+        eng.check_clocks(601.0)
+        assert eng.winner == "Alice"  # Bob deals first
+
+    def test_no_clocks_by_default(self):
+        eng = MultiplayerGameEngine("Alice", "Bob")
+        eng.start_clocks(0.0)
+        assert eng.next_deadline() is None
+        assert not eng.check_clocks(10**9)
@@ -1,9 +1,28 @@
 """Tests for game statistics recording and retrieval."""
 
+import io
+import json
+import random
+import sqlite3
+from datetime import date, timedelta
+
 import pytest
 
+from backend.config import settings
 from backend.game.models import RecordGameRequest
-from backend.services.stats_db import StatsDB
+from backend.services.stats_db import (
+    _MIGRATIONS,
+    AI_RATINGS,
+    LEADERBOARD_MIN_GAMES,
+    PLAYER_HISTORY_SQL,
+    RATING_INITIAL,
+    StatsBusyError,
+    StatsDB,
+    _encode_cursor,
+    _leaderboard_query,
+    unpack_scores,
+)
+from backend.services.stats_export import READERS, WRITERS
 
 
 @pytest.fixture
@@ -101,3 +120,600 @@ def test_multiple_games_averages(db):
     assert stats.avg_crib_score == 4.0
     assert stats.best_hand == 20
     assert stats.total_points == 211  # 121 + 90
+
+
+def test_aggregates_match_rebuild(db):
+    db.record_game(_make_result(won=True, hand_scores=[10, 2]))
+    db.record_game(_make_result(won=False, ai_difficulty="hard", player_score=80, opponent_score=121))
+    db.record_game(_make_result(won=True, highest_hand_score=24))
+    before = db.get_stats("Alice")
+    assert db.rebuild_aggregates() == 3
+    assert db.get_stats("Alice") == before
+
+
+def test_backfill_existing_database(tmp_path):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE game_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            player_name TEXT NOT NULL, opponent_name TEXT NOT NULL,
+            player_score INTEGER NOT NULL, opponent_score INTEGER NOT NULL,
+            won INTEGER NOT NULL, ai_difficulty TEXT,
+            game_mode TEXT NOT NULL DEFAULT 'single',
+            hand_scores TEXT NOT NULL DEFAULT '[]', crib_scores TEXT NOT NULL DEFAULT '[]',
+            highest_hand_score INTEGER NOT NULL DEFAULT 0,
+            total_points_scored INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT NOT NULL
+        )
+    """)
+    for i, won in enumerate([1, 1, 0]):
+        conn.execute(
+            """INSERT INTO game_results (player_name, opponent_name, player_score, opponent_score,
+               won, ai_difficulty, hand_scores, crib_scores, highest_hand_score,
+               total_points_scored, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            ("Alice", "Computer", 121, 90, won, "easy", json.dumps([8]), json.dumps([4]),
+             8, 100, f"2026-01-0{i + 1}T00:00:00+00:00"),
+        )
+    conn.commit()
+    conn.close()
+
+    stats = StatsDB(db_path=path).get_stats("Alice")
+    assert stats.games == 3
+    assert stats.wins == 2
+    assert stats.best_win_streak == 2
+    assert stats.current_streak == -1
+    assert stats.avg_hand_score == 8.0
+    conn = sqlite3.connect(path)
+    hand, crib = conn.execute("SELECT hand_scores, crib_scores FROM game_results LIMIT 1").fetchone()
+    assert (unpack_scores(hand), unpack_scores(crib)) == ([8], [4])
+
+
+def test_migrations_are_idempotent(tmp_path):
+    path = str(tmp_path / "stats.db")
+    StatsDB(db_path=path).record_game(_make_result())
+    StatsDB(db_path=path)  # reopening must not re-run or fail
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(_MIGRATIONS)
+    assert StatsDB(db_path=path).get_stats("Alice").games == 1
+
+
+def test_player_history_uses_index(db):
+    conn = sqlite3.connect(db.db_path)
+    plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {PLAYER_HISTORY_SQL}", ("Alice",)))
+    assert "idx_game_results_player_created" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_rebuild_single_player(db):
+    db.record_game(_make_result(player_name="Alice"))
+    db.record_game(_make_result(player_name="Bob", won=False, player_score=80, opponent_score=121))
+    assert db.rebuild_aggregates("Bob") == 1
+    assert db.get_stats("Bob").losses == 1
+    assert db.get_stats("Alice").wins == 1
+
+
+def test_database_runs_in_wal_mode(db):
+    with db._read() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_reads_do_not_block_on_open_write(db):
+    db.record_game(_make_result())
+    with db._write() as conn:
+        conn.execute("DELETE FROM player_stats")
+        # A reader sees the last committed snapshot while the write is in flight.
+        assert db.get_stats("Alice").games == 1
+    assert db.get_stats("Alice").games == 0
+
+
+def test_reader_pool_reuses_connections(db):
+    for _ in range(10):
+        db.get_stats("Alice")
+    assert db._reader_count == 1
+
+
+def test_scores_are_stored_packed(db):
+    db.record_game(_make_result(hand_scores=[0, 29, 12], crib_scores=[]))
+    conn = sqlite3.connect(db.db_path)
+    hand, crib = conn.execute("SELECT hand_scores, crib_scores FROM game_results").fetchone()
+    assert hand == bytes([0, 29, 12])
+    assert crib == b""
+
+
+def test_out_of_range_hand_score_rejected():
+    with pytest.raises(ValueError):
+        _make_result(hand_scores=[30])
+
+
+def _seed_leaderboard(db, players: int = 7) -> None:
+    games = []
+    for p in range(players):
+        for g in range(LEADERBOARD_MIN_GAMES):
+            won = g < p + 2
+            games.append(_make_result(
+                player_name=f"P{p}", won=won, player_score=121 if won else 90,
+                opponent_score=90 if won else 121, ai_difficulty="hard" if p % 2 else "easy",
+                highest_hand_score=p * 3, total_points_scored=100 + p,
+            ))
+    db.record_games(games)
+
+
+def test_leaderboard_orders_by_metric(db):
+    _seed_leaderboard(db)
+    board = db.leaderboard("win_rate")
+    assert [e.player_name for e in board.entries] == [f"P{p}" for p in range(6, -1, -1)]
+    assert board.entries[0].value == 80.0
+    assert [e.rank for e in board.entries] == list(range(1, 8))
+    assert db.leaderboard("best_hand").entries[0].value == 18
+    assert db.leaderboard("total_points").entries[0].player_name == "P6"
+
+
+def test_leaderboard_win_rate_needs_min_games(db):
+    _seed_leaderboard(db)
+    db.record_game(_make_result(player_name="Newcomer"))
+    assert "Newcomer" not in [e.player_name for e in db.leaderboard("win_rate").entries]
+    assert "Newcomer" in [e.player_name for e in db.leaderboard("total_points").entries]
+
+
+def test_leaderboard_cursor_pages_through_ties(db):
+    _seed_leaderboard(db)
+    for name in ("Tie-A", "Tie-B", "Tie-C"):
+        db.record_game(_make_result(player_name=name, highest_hand_score=12))
+    seen, cursor = [], None
+    while True:
+        page = db.leaderboard("best_hand", limit=2, cursor=cursor)
+        seen.extend(page.entries)
+        if page.next_cursor is None:
+            break
+        cursor = page.next_cursor
+    assert [e.player_name for e in seen] == [e.player_name for e in db.leaderboard("best_hand", limit=100).entries]
+    assert [e.rank for e in seen] == list(range(1, 11))
+
+
+def test_leaderboard_by_difficulty(db):
+    _seed_leaderboard(db)
+    board = db.leaderboard("total_points", difficulty="hard")
+    assert [e.player_name for e in board.entries] == ["P5", "P3", "P1"]
+    assert board.entries[0].value == (100 + 5) * LEADERBOARD_MIN_GAMES
+
+
+def test_leaderboard_bad_input(db):
+    with pytest.raises(ValueError):
+        db.leaderboard("losses")
+    with pytest.raises(ValueError):
+        db.leaderboard(cursor="not-a-cursor")
+
+
+@pytest.mark.parametrize("metric", ["win_rate", "total_points", "best_hand"])
+@pytest.mark.parametrize("difficulty", [None, "hard"])
+@pytest.mark.parametrize("cursor", [None, _encode_cursor(0.5, 3, 20)])
+def test_leaderboard_is_an_index_scan(db, metric, difficulty, cursor):
+    sql, params, _ = _leaderboard_query(metric, difficulty, 20, cursor)
+    conn = sqlite3.connect(db.db_path)
+    plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+    table = "difficulty_stats" if difficulty else "player_stats"
+    assert f"idx_{table}_{metric}" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_stats_cache_hits_and_invalidates_on_record(db):
+    db.record_game(_make_result())
+    assert db.get_stats("Alice").games == 1
+    assert db.get_stats("Alice").games == 1
+    assert db.cache_metrics()["hits"] == 1
+    db.record_game(_make_result())
+    assert db.get_stats("Alice").games == 2
+
+
+def test_stats_cache_sees_writes_from_other_workers(tmp_path):
+    path = str(tmp_path / "shared.db")
+    worker_a, worker_b = StatsDB(db_path=path), StatsDB(db_path=path)
+    worker_a.record_game(_make_result())
+    assert worker_b.get_stats("Alice").games == 1
+    worker_a.record_game(_make_result())
+    # worker_b never saw this write, but data_version tells it the file changed.
+    assert worker_b.get_stats("Alice").games == 2
+
+
+def test_stats_cache_is_bounded(db):
+    db._cache.max_size = 2
+    for name in ("A", "B", "C"):
+        db.get_stats(name)
+    assert db.cache_metrics()["size"] == 2
+    db.get_stats("A")  # evicted as least recently used
+    assert db.cache_metrics()["hits"] == 0
+
+
+def test_stats_cache_drops_result_of_a_read_that_raced_a_write(db):
+    epoch = db._cache.epoch
+    stale = db._query_stats("Alice")
+    db.record_game(_make_result())
+    db._cache.put("Alice", stale, epoch)
+    assert db.get_stats("Alice").games == 1
+
+
+def _insert_history(db, games: list[tuple[str, bool, str]]) -> None:
+    """Write raw (day, won, difficulty) games for Alice, then rebuild the rollups."""
+    conn = sqlite3.connect(db.db_path)
+    with conn:
+        conn.execute("INSERT INTO players (id, name) VALUES (1, 'Alice'), (2, 'Computer')")
+        conn.executemany(
+            """INSERT INTO game_results (player_id, opponent_id, player_score, opponent_score,
+               won, ai_difficulty, hand_scores, crib_scores, highest_hand_score,
+               total_points_scored, created_at) VALUES (1, 2, ?, 100, ?, ?, ?, x'', ?, ?, ?)""",
+            [
+                (121 if won else 100, int(won), difficulty, bytes([i % 20]), i % 20, 100 + i,
+                 f"{day}T00:00:{i % 60:02d}+00:00")
+                for i, (day, won, difficulty) in enumerate(games)
+            ],
+        )
+    conn.close()
+    db.rebuild_aggregates()
+
+
+def _expected_window_stats(games: list[tuple[str, bool, str]], since: str) -> dict:
+    window = [(i, won, diff) for i, (day, won, diff) in enumerate(games) if day >= since]
+    streak = best = 0
+    for _, won, _ in window:
+        streak = max(streak, 0) + 1 if won else min(streak, 0) - 1
+        best = max(best, streak)
+    return {
+        "games": len(window),
+        "wins": sum(won for _, won, _ in window),
+        "current_streak": streak,
+        "best_win_streak": best,
+        "best_hand": max((i % 20 for i, _, _ in window), default=0),
+        "total_points": sum(100 + i for i, _, _ in window),
+        "per_difficulty": {d: sum(1 for _, _, dd in window if dd == d) for _, _, d in window},
+    }
+
+
+def test_windowed_stats_match_raw_history(db):
+    rng = random.Random(7)
+    start = date(2026, 3, 1)
+    games = []
+    for offset in range(40):
+        for _ in range(rng.choice([0, 1, 3])):
+            games.append(((start + timedelta(days=offset)).isoformat(), rng.random() < 0.6,
+                          rng.choice(["easy", "hard"])))
+    # A long cross-day run of wins, so streaks have to be stitched across days.
+    for offset in range(40, 44):
+        games.append(((start + timedelta(days=offset)).isoformat(), True, "easy"))
+    _insert_history(db, games)
+
+    for since_offset in (0, 13, 30, 41):
+        since = start + timedelta(days=since_offset)
+        expected = _expected_window_stats(games, since.isoformat())
+        stats = db.get_stats("Alice", since=since)
+        assert stats.games == expected["games"]
+        assert stats.wins == expected["wins"]
+        assert stats.current_streak == expected["current_streak"]
+        assert stats.best_win_streak == expected["best_win_streak"]
+        assert stats.best_hand == expected["best_hand"]
+        assert stats.total_points == expected["total_points"]
+        assert {d.difficulty: d.games for d in stats.per_difficulty} == expected["per_difficulty"]
+
+
+def test_windowed_stats_empty_window(db):
+    db.record_game(_make_result())
+    assert db.get_stats("Alice", since=date(2999, 1, 1)).games == 0
+    assert db.get_stats("Alice", since=date(2000, 1, 1)).games == 1
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_export_import_round_trip(db, tmp_path, fmt):
+    db.record_game(_make_result(hand_scores=[4, 29], crib_scores=[]))
+    db.record_game(_make_result(won=False, ai_difficulty=None, game_mode="multiplayer",
+                                player_score=100, opponent_score=121))
+    db.record_game(_make_result(player_name="Bob"))
+    db.record_games([_make_result(player_name="Carol")], rated=False)
+    text = "".join(WRITERS[fmt](db.iter_results()))
+
+    target = StatsDB(db_path=str(tmp_path / f"copy-{fmt}.db"))
+    assert target.import_results(READERS[fmt](io.StringIO(text, newline="")), chunk_size=2) == 4
+    assert list(target.iter_results()) == list(db.iter_results())
+    for name in ("Alice", "Bob", "Carol"):
+        assert target.get_stats(name) == db.get_stats(name)
+        assert target.get_rating(name) == db.get_rating(name)
+
+
+def test_unrated_games_count_nowhere(db):
+    db.record_game(_make_result(won=True))
+    db.record_games([_make_result(won=False, player_score=90, opponent_score=121)] * 3, rated=False)
+    stats = db.get_stats("Alice")
+    rating = db.get_rating("Alice")
+    assert (stats.games, stats.wins) == (1, 1)
+    assert [row["rated"] for row in db.iter_results()] == [True, False, False, False]
+
+    db.rebuild_aggregates()
+    assert db.get_stats("Alice") == stats
+    db.compact(date(2999, 1, 1))
+    db.rebuild_aggregates()
+    assert db.get_stats("Alice") == stats
+    assert db.get_rating("Alice") == rating
+
+
+def test_import_older_rows_rebuilds_aggregates(db):
+    db.record_game(_make_result(won=True))
+    older = {**next(db.iter_results()), "won": False, "created_at": "2020-01-01T00:00:00+00:00"}
+    assert db.import_results([older]) == 1
+    stats = db.get_stats("Alice")
+    assert (stats.games, stats.wins) == (2, 1)
+    # Play order is loss then win, so the streak ends on the win.
+    assert stats.current_streak == 1
+
+
+def test_export_streams_one_player(db):
+    db.record_game(_make_result(player_name="Alice"))
+    db.record_game(_make_result(player_name="Bob"))
+    lines = "".join(WRITERS["ndjson"](db.iter_results("Bob"))).splitlines()
+    assert [json.loads(line)["player_name"] for line in lines] == ["Bob"]
+
+
+def test_export_pages_through_tied_timestamps(db, monkeypatch):
+    monkeypatch.setattr("backend.services.stats_db._STREAM_BATCH", 2)
+    rows = [{**_make_result(player_score=100 + i).model_dump(), "created_at": "2024-01-01T00:00:00+00:00"}
+            for i in range(5)]
+    db.import_results(rows)
+    assert [r["player_score"] for r in db.iter_results("Alice")] == [100, 101, 102, 103, 104]
+    assert [r["player_score"] for r in db.iter_results()] == [100, 101, 102, 103, 104]
+
+
+def test_paused_exports_leave_readers_free(db, monkeypatch):
+    db.record_game(_make_result())
+    exports = [db.iter_results() for _ in range(settings.stats_db_read_pool_size + 1)]
+    for export in exports:
+        next(export)  # started and left hanging, like a slow download
+    assert db.get_stats("Alice").games == 1
+    for export in exports:
+        export.close()
+
+
+def test_reads_give_up_when_the_pool_is_exhausted(db, monkeypatch):
+    monkeypatch.setattr(settings, "stats_db_read_timeout_seconds", 0.05)
+    held = []
+    for _ in range(settings.stats_db_read_pool_size):
+        reader = db._read()
+        reader.__enter__()
+        held.append(reader)
+    with pytest.raises(StatsBusyError):
+        db.get_stats("Alice")
+    for reader in held:
+        reader.__exit__(None, None, None)
+    assert db.get_stats("Alice").games == 0
+
+
+def test_rebuild_matches_incremental_aggregates(db):
+    rng = random.Random(3)
+    for _ in range(200):
+        won = rng.random() < 0.5
+        db.record_game(_make_result(
+            player_name=rng.choice(["Alice", "Bob", "Carol"]), won=won,
+            player_score=121 if won else 90, opponent_score=90 if won else 121,
+            ai_difficulty=rng.choice(["easy", "hard", None]),
+            hand_scores=[rng.randrange(30) for _ in range(rng.randrange(5))],
+            crib_scores=[rng.randrange(30) for _ in range(rng.randrange(3))],
+            highest_hand_score=rng.randrange(30), total_points_scored=rng.randrange(60, 122),
+        ))
+    conn = sqlite3.connect(db.db_path)
+    tables = ("player_stats", "player_difficulty_stats", "player_daily_stats", "player_daily_difficulty_stats")
+    before = {t: sorted(conn.execute(f"SELECT * FROM {t}").fetchall()) for t in tables}
+    assert db.rebuild_aggregates() == 200
+    assert {t: sorted(conn.execute(f"SELECT * FROM {t}").fetchall()) for t in tables} == before
+
+
+def _aggregate_rows(db) -> dict[str, list[tuple]]:
+    conn = sqlite3.connect(db.db_path)
+    tables = ("player_stats", "player_difficulty_stats", "player_daily_stats", "player_daily_difficulty_stats")
+    rows = {t: sorted(conn.execute(f"SELECT * FROM {t}").fetchall()) for t in tables}
+    conn.close()
+    return rows
+
+
+def _import_days(db, start: date, days: int, seed: int = 5) -> int:
+    rng = random.Random(seed)
+    rows = []
+    for offset in range(days):
+        for i in range(rng.randrange(4)):
+            won = rng.random() < 0.5
+            rows.append({
+                "player_name": rng.choice(["Alice", "Bob", "Carol"]),
+                "opponent_name": "Computer",
+                "player_score": 121 if won else 90,
+                "opponent_score": 90 if won else 121,
+                "won": won,
+                "ai_difficulty": rng.choice(["easy", "hard", None]),
+                "game_mode": "single",
+                "hand_scores": [rng.randrange(30) for _ in range(rng.randrange(5))],
+                "crib_scores": [rng.randrange(30) for _ in range(rng.randrange(3))],
+                "highest_hand_score": rng.randrange(30),
+                "total_points_scored": rng.randrange(60, 122),
+                "created_at": f"{start + timedelta(days=offset)}T0{i}:00:00+00:00",
+            })
+    return db.import_results(rows)
+
+
+@pytest.mark.parametrize("batch_size", [1, 7])
+def test_compaction_keeps_stats_and_rebuilds_from_compacted_totals(db, batch_size):
+    start = date(2026, 1, 1)
+    total = _import_days(db, start, 30)
+    # Dave's only games fall before the cutoff, so nothing of his stays raw.
+    db.record_game(_make_result(player_name="Dave"))
+    conn = sqlite3.connect(db.db_path)
+    with conn:
+        conn.execute("""UPDATE game_results SET created_at = '2025-12-01T00:00:00+00:00'
+                        WHERE player_id = (SELECT id FROM players WHERE name = 'Dave')""")
+    conn.close()
+    db.rebuild_aggregates()
+    before = _aggregate_rows(db)
+
+    deleted = db.compact(start + timedelta(days=20), batch_size=batch_size)
+    assert 0 < deleted < total + 1
+    assert all(row["created_at"] >= "2026-01-21" for row in db.iter_results())
+    assert _aggregate_rows(db) == before
+
+    # Rebuilding (everyone, then one player) starts from the compacted totals.
+    assert db.rebuild_aggregates() == total + 1 - deleted
+    assert _aggregate_rows(db) == before
+    db.rebuild_aggregates("Alice")
+    db.rebuild_aggregates("Dave")
+    assert _aggregate_rows(db) == before
+    assert db.get_stats("Dave").games == 1
+
+
+def test_concurrent_compactions_count_each_game_once(db, monkeypatch):
+    import threading
+
+    from backend.services import stats_db as stats_db_module
+
+    start = date(2026, 1, 1)
+    _import_days(db, start, 10)
+    before = _aggregate_rows(db)
+    other = StatsDB(db_path=db.db_path)  # a second worker on the same file
+    fold = stats_db_module._fold_compacted
+    racer: list[threading.Thread] = []
+
+    def fold_while_other_worker_compacts(conn, rows):
+        if not racer:
+            racer.append(threading.Thread(target=other.compact, args=(start + timedelta(days=5),)))
+            racer[0].start()
+            racer[0].join(0.2)  # its batch must wait for ours, not read the rows we are folding
+        fold(conn, rows)
+
+    monkeypatch.setattr(stats_db_module, "_fold_compacted", fold_while_other_worker_compacts)
+    db.compact(start + timedelta(days=5), batch_size=1000)
+    racer[0].join()
+    db.rebuild_aggregates()  # from the compacted totals, which a double fold would inflate
+    assert _aggregate_rows(db) == before
+
+
+def test_compaction_batch_is_an_index_scan(db):
+    from backend.services.stats_db import _COMPACT_BATCH_SQL
+
+    conn = sqlite3.connect(db.db_path)
+    plan = " ".join(row[3] for row in conn.execute(
+        f"EXPLAIN QUERY PLAN {_COMPACT_BATCH_SQL}", ("Alice", "2026-01-01", 0, "2026-02-01", 100)))
+    assert "USING INDEX idx_game_results_player_created" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_maintain_reports_deleted_rows_and_reclaimed_space(db):
+    _import_days(db, date(2020, 1, 1), 200)
+    stats = db.get_stats("Alice")
+    report = db.maintain(retention_days=30, batch_size=50)
+    assert report["deleted_rows"] > 0
+    assert report["incremental_vacuum"] is True
+    assert report["reclaimed_bytes"] > 0
+    assert report["free_bytes"] == 0
+    assert list(db.iter_results()) == []
+    assert db.get_stats("Alice") == stats
+    assert db.maintain(retention_days=0)["deleted_rows"] == 0
+
+
+def test_full_vacuum_enables_incremental_vacuum_on_old_files(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.close()
+    db = StatsDB(db_path=path)
+    assert db.maintain(retention_days=0)["incremental_vacuum"] is False
+    assert db.maintain(retention_days=0, full_vacuum=True)["incremental_vacuum"] is True
+
+
+def test_maintenance_job_records_last_report(db):
+    from backend.services.stats_maintenance import StatsMaintenance
+
+    _import_days(db, date(2020, 1, 1), 10)
+    job = StatsMaintenance(db, interval_seconds=0, retention_days=30)
+    report = job.run_once()
+    assert report["deleted_rows"] > 0
+    assert job.metrics()["runs"] == 1
+    assert job.metrics()["last_run"] == report
+
+
+def test_player_id_migration_keeps_results_and_aggregates(tmp_path):
+    path = str(tmp_path / "names.db")
+    conn = sqlite3.connect(path)
+    for migrate in _MIGRATIONS[:7]:  # the schema before players got integer ids
+        migrate(conn)
+    conn.execute(
+        """INSERT INTO game_results (player_name, opponent_name, player_score, opponent_score, won,
+           hand_scores, crib_scores, created_at) VALUES ('Alice', 'Bob', 121, 90, 1, x'08', x'', '2026-01-02')"""
+    )
+    conn.execute("INSERT INTO player_stats (player_name, games, wins, current_streak) VALUES ('Alice', 1, 1, 1)")
+    # Old's games were all compacted away; only aggregates remain.
+    conn.execute("INSERT INTO player_stats (player_name, games, wins) VALUES ('Old', 5, 0)")
+    conn.execute(
+        "INSERT INTO compacted_player_stats (player_name, games, wins, compacted_before) VALUES ('Old', 5, 0, '2026-01-01')"
+    )
+    conn.execute("PRAGMA user_version = 7")
+    conn.commit()
+    conn.close()
+
+    db = StatsDB(db_path=path)
+    assert [(r["player_name"], r["opponent_name"]) for r in db.iter_results()] == [("Alice", "Bob")]
+    assert db.get_stats("Alice").games == 1
+    assert db.get_stats("Old").games == 5
+    db.rebuild_aggregates()
+    assert db.get_stats("Old").games == 5
+    conn = sqlite3.connect(path)
+    assert [c[1] for c in conn.execute("PRAGMA table_info(game_results)")][1:3] == ["player_id", "opponent_id"]
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+
+def test_ratings_move_by_opponent_strength(db):
+    db.record_game(_make_result(player_name="Easy-Winner", ai_difficulty="easy"))
+    db.record_game(_make_result(player_name="Hard-Winner", ai_difficulty="hard"))
+    db.record_game(_make_result(player_name="Loser", won=False, ai_difficulty="medium"))
+    easy, hard, loser = (db.get_stats(n) for n in ("Easy-Winner", "Hard-Winner", "Loser"))
+    assert RATING_INITIAL < easy.rating < hard.rating
+    assert loser.rating < RATING_INITIAL
+    assert (hard.rank, easy.rank, loser.rank) == (1, 2, 3)
+    assert db.get_rating("Hard-Winner") == pytest.approx(hard.rating, abs=0.05)
+    assert db.get_rating("Nobody") == RATING_INITIAL
+
+
+def test_multiplayer_rows_rate_both_sides_from_pre_game_ratings(db):
+    db.record_games([
+        _make_result(player_name="Ann", opponent_name="Ben", ai_difficulty=None, game_mode="multiplayer"),
+        _make_result(player_name="Ben", opponent_name="Ann", won=False, ai_difficulty=None,
+                     game_mode="multiplayer", player_score=95, opponent_score=121),
+    ])
+    ann, ben = db.get_stats("Ann").rating, db.get_stats("Ben").rating
+    assert ann - RATING_INITIAL == pytest.approx(RATING_INITIAL - ben)
+
+
+def test_rating_rank_matches_brute_force(db):
+    rng = random.Random(11)
+    names = [f"R{i}" for i in range(40)]
+    for _ in range(400):
+        a, b = rng.sample(names, 2)
+        if rng.random() < 0.5:
+            db.record_game(_make_result(player_name=a, won=rng.random() < 0.5,
+                                        ai_difficulty=rng.choice(list(AI_RATINGS))))
+        else:
+            db.record_games([
+                _make_result(player_name=a, opponent_name=b, ai_difficulty=None, game_mode="multiplayer"),
+                _make_result(player_name=b, opponent_name=a, won=False, ai_difficulty=None, game_mode="multiplayer"),
+            ])
+    ratings = {n: db.get_stats(n).rating for n in names}
+    conn = sqlite3.connect(db.db_path)
+    stored = dict(conn.execute(
+        "SELECT p.name, r.rating FROM player_ratings r JOIN players p ON p.id = r.player_id"
+    ))
+    for name in names:
+        assert db.get_stats(name).rank == 1 + sum(r > stored[name] for r in stored.values())
+        assert ratings[name] == round(stored[name], 1)
+    histogram = dict(conn.execute("SELECT band, players FROM rating_histogram WHERE players != 0"))
+    assert sum(histogram.values()) == len(names)
+
+
+def test_import_rejects_bad_row_and_keeps_nothing(db):
+    good = {**_make_result().model_dump(), "created_at": "2024-01-01T00:00:00+00:00"}
+    bad = {**good, "hand_scores": [300]}
+    with pytest.raises(ValueError, match="Row 3"):
+        db.import_results([good, good, bad], chunk_size=2)
+    assert list(db.iter_results("Alice")) == []
+    assert db.get_rating("Alice") == RATING_INITIAL
+    assert db.get_stats("Alice").games == 0
@@ -0,0 +1,184 @@
+"""Tests for the batched game-result writer."""
+
+import asyncio
+import sqlite3
+
+import pytest
+
+from backend.game.models import RecordGameRequest
+from backend.services.stats_db import StatsDB
+from backend.services.stats_writer import StatsWriter
+
+
+@pytest.fixture
+def db(tmp_path):
+    return StatsDB(db_path=str(tmp_path / "test_stats.db"))
+
+
+def _failing(db, monkeypatch, fails):
+    """Make `db.record_games` raise whatever `fails(reqs)` returns, if anything."""
+    record_games = db.record_games
+
+    def flaky(reqs, rated=True):
+        error = fails(reqs)
+        if error is not None:
+            raise error
+        record_games(reqs, rated)
+
+    monkeypatch.setattr(db, "record_games", flaky)
+
+
+def _result(name: str, won: bool = True) -> RecordGameRequest:
+    return RecordGameRequest(
+        player_name=name,
+        opponent_name="Computer",
+        player_score=121 if won else 90,
+        opponent_score=90 if won else 121,
+        won=won,
+        ai_difficulty="easy",
+        game_mode="single",
+        hand_scores=[4, 8],
+        crib_scores=[2],
+        highest_hand_score=8,
+        total_points_scored=121,
+    )
+
+
+def test_concurrent_submits_share_a_transaction(db):
+    writer = StatsWriter(db, batch_size=50, max_delay_ms=20)
+
+    async def run():
+        await writer.start()
+        await asyncio.gather(*(writer.submit(_result("Alice", won=i % 3 != 0)) for i in range(30)))
+        await writer.close()
+
+    asyncio.run(run())
+    metrics = writer.metrics()
+    assert metrics["rows"] == 30
+    assert metrics["batches"] < 30
+    stats = db.get_stats("Alice")
+    assert stats.games == 30
+    assert stats.wins == 20
+
+
+def test_batch_size_caps_each_transaction(db):
+    writer = StatsWriter(db, batch_size=4, max_delay_ms=50)
+
+    async def run():
+        await writer.start()
+        await asyncio.gather(*(writer.submit(_result("Bob")) for _ in range(10)))
+        await writer.close()
+
+    asyncio.run(run())
+    assert writer.metrics()["max_batch_size"] == 4
+    assert db.get_stats("Bob").games == 10
+
+
+def test_fire_and_forget_is_flushed_on_close(db):
+    writer = StatsWriter(db, max_delay_ms=1000, durable=False)
+
+    async def run():
+        await writer.start()
+        for _ in range(5):
+            await writer.submit(_result("Carol"))
+        # Nothing has waited for the commit yet.
+        assert db.get_stats("Carol").games == 0
+        await writer.close()
+
+    asyncio.run(run())
+    assert db.get_stats("Carol").games == 5
+
+
+def test_writes_through_when_not_started(db):
+    writer = StatsWriter(db)
+    asyncio.run(writer.submit(_result("Dave")))
+    assert db.get_stats("Dave").games == 1
+    assert writer.metrics()["batches"] == 1
+
+
+def test_submit_nowait_commits_a_game_together(db):
+    writer = StatsWriter(db, batch_size=1, max_delay_ms=50)
+
+    async def run():
+        await writer.start()
+        await asyncio.to_thread(writer.submit_nowait, [_result("Erin"), _result("Frank", won=False)])
+        await writer.close()
+
+    asyncio.run(run())
+    # batch_size=1 still keeps both rows of one game in the same transaction.
+    assert writer.metrics()["batches"] == 1
+    assert writer.metrics()["max_batch_size"] == 2
+    assert db.get_stats("Erin").wins == 1
+    assert db.get_stats("Frank").losses == 1
+
+
+def test_failed_batch_is_retried(db, monkeypatch):
+    failures = iter([sqlite3.OperationalError("database is locked")] * 2)
+    _failing(db, monkeypatch, lambda reqs: next(failures, None))
+    writer = StatsWriter(db, max_delay_ms=20)
+    writer.retry_backoff = 0.001
+
+    async def run():
+        await writer.start()
+        await asyncio.to_thread(writer.submit_nowait, [_result("Gina")])
+        await writer.close()
+
+    asyncio.run(run())
+    assert db.get_stats("Gina").games == 1
+    assert writer.metrics()["retries"] == 2
+    assert writer.metrics()["errors"] == 0
+
+
+def test_bad_game_does_not_take_the_batch_down(db, monkeypatch):
+    _failing(db, monkeypatch,
+             lambda reqs: ValueError("bad row") if any(r.player_name == "Mallory" for r in reqs) else None)
+    writer = StatsWriter(db, batch_size=50, max_delay_ms=50)
+    writer.retry_backoff = 0.001
+
+    async def run():
+        await writer.start()
+        results = await asyncio.gather(
+            *(writer.submit(_result(name)) for name in ["Hank", "Mallory", "Ivy"]), return_exceptions=True
+        )
+        await writer.close()
+        return results
+
+    results = asyncio.run(run())
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], ValueError)
+    assert db.get_stats("Hank").games == 1
+    assert db.get_stats("Ivy").games == 1
+    assert writer.metrics()["errors"] == 1
+
+
+def test_locked_database_is_waited_out_game_by_game(db, monkeypatch):
+    # More busy failures than a batch gets attempts: the games still commit.
+    failures = iter([sqlite3.OperationalError("database is locked")] * 8)
+    _failing(db, monkeypatch, lambda reqs: next(failures, None))
+    writer = StatsWriter(db, batch_size=50, max_delay_ms=50)
+    writer.retry_backoff = 0.001
+
+    async def run():
+        await writer.start()
+        for name in ["Jack", "Kate"]:
+            await asyncio.to_thread(writer.submit_nowait, [_result(name)])
+        await writer.close()
+
+    asyncio.run(run())
+    assert db.get_stats("Jack").games == 1
+    assert db.get_stats("Kate").games == 1
+    assert writer.metrics()["errors"] == 0
+
+
+def test_unrated_games_commit_apart_from_rated_ones(db):
+    writer = StatsWriter(db, batch_size=50, max_delay_ms=50)
+
+    async def run():
+        await writer.start()
+        await asyncio.gather(writer.submit(_result("Liam")), writer.submit(_result("Liam"), rated=False))
+        await writer.close()
+
+    asyncio.run(run())
+    assert writer.metrics()["batches"] == 2
+    assert db.get_stats("Liam").games == 1
+    assert [row["rated"] for row in db.iter_results("Liam")] == [True, False]
@@ -0,0 +1,79 @@
+"""Tests for the shared timing wheel."""
+
+import asyncio
+
+from backend.services.timing_wheel import TimingWheel
+
+
+def test_timers_fire_on_their_tick():
+    wheel = TimingWheel(tick_ms=100, slots=8)
+    fired = []
+    wheel.schedule(0.25, fired.append, "a")  # rounds up to tick 3
+    wheel.schedule(0.1, fired.append, "b")
+    wheel.schedule(0.0, fired.append, "c")  # never fires before the next tick
+    assert len(wheel) == 3
+    assert wheel.advance(2) == 2 and fired == ["b", "c"]
+    assert wheel.advance() == 1 and fired == ["b", "c", "a"]
+    assert len(wheel) == 0
+
+
+def test_later_turns_of_the_wheel_wait_for_their_own_tick():
+    wheel = TimingWheel(tick_ms=10, slots=4)
+    fired = []
+    wheel.schedule(0.01, fired.append, "soon")
+    wheel.schedule(0.09, fired.append, "late")  # same slot, two turns later
+    wheel.advance(1)
+    assert fired == ["soon"]
+    wheel.advance(4)
+    assert fired == ["soon"]
+    wheel.advance(4)
+    assert fired == ["soon", "late"]
+
+
+def test_cancel():
+    wheel = TimingWheel(tick_ms=10, slots=4)
+    fired = []
+    timer = wheel.schedule(0.02, fired.append, "x")
+    assert wheel.cancel(timer)
+    assert not wheel.cancel(timer)
+    wheel.advance(3)
+    assert fired == [] and len(wheel) == 0
+
+
+def test_callback_can_cancel_a_timer_due_the_same_tick():
+    wheel = TimingWheel(tick_ms=10, slots=4)
+    fired = []
+    second = None
+
+    def first():
+        fired.append("first")
+        wheel.cancel(second)
+
+    wheel.schedule(0.01, first)
+    second = wheel.schedule(0.01, fired.append, "second")
+    wheel.advance()
+    assert fired == ["first"] and len(wheel) == 0
+
+
+def test_failing_callback_does_not_stop_the_tick():
+    wheel = TimingWheel(tick_ms=10, slots=4)
+    fired = []
+    wheel.schedule(0.01, lambda: 1 / 0)
+    wheel.schedule(0.01, fired.append, "ok")
+    wheel.advance()
+    assert fired == ["ok"] and wheel.metrics()["errors"] == 1
+
+
+def test_running_wheel_fires_in_real_time():
+    wheel = TimingWheel(tick_ms=5, slots=16)
+
+    async def run():
+        await wheel.start()
+        done = asyncio.get_running_loop().create_future()
+        wheel.schedule(0.02, done.set_result, "fired")
+        result = await asyncio.wait_for(done, 1)
+        await wheel.close()
+        return result
+
+    assert asyncio.run(run()) == "fired"
+    assert not wheel.running
@@ -70,10 +70,13 @@ export interface GameState {
   last_action?: LastAction;
   action_log: LastAction[];
   score_breakdown?: ScoreBreakdown;
+  score_breakdowns?: ScoreBreakdown[];
   winner?: string;
   round_number: number;
   your_turn: boolean;
   game_stats?: GameStatsData;
+  stats_recorded?: boolean;
+  seed?: number;
 }
 
 export interface RecordGamePayload {
@@ -111,4 +114,6 @@ export interface PlayerStats {
   current_streak: number;
   best_win_streak: number;
   per_difficulty: DifficultyStats[];
+  rating?: number | null;
+  rank?: number | null;
 }
@@ -40,7 +40,7 @@ function recordGameResult(state: GameState, difficulty: AIDifficulty) {
     crib_scores: stats?.crib_scores ?? [],
     highest_hand_score: stats?.highest_hand_score ?? 0,
     total_points_scored: stats?.total_points_scored ?? state.player.score,
-  });
+  }, state.stats_recorded);
 }
 
 const delay = (ms: number) => new Promise<void>((r) => setTimeout(r, ms));
@@ -42,6 +42,7 @@ export const useLobbyStore = create<LobbyStore>((set, get) => {
     });
     ws.on('waiting', () => set({ status: 'waiting' }));
     ws.on('private_created', (data: any) => set({ joinCode: data.code }));
+    ws.on('private_game_expired', (data: any) => set({ joinCode: null, error: data.message }));
     ws.on('game_start', (data: any) => set({ status: 'in_game', gameState: data.state }));
     ws.on('game_state', (data: any) => {
       const state = data.state as GameState;
@@ -61,10 +62,11 @@ export const useLobbyStore = create<LobbyStore>((set, get) => {
           crib_scores: stats?.crib_scores ?? [],
           highest_hand_score: stats?.highest_hand_score ?? 0,
           total_points_scored: stats?.total_points_scored ?? state.player.score,
-        });
+        }, state.stats_recorded);
       }
     });
     ws.on('opponent_disconnected', (data: any) => set({ error: data.message }));
+    ws.on('opponent_replaced', (data: any) => set({ error: data.message }));
     ws.on('chat', (data: any) => {
       const msg: ChatMessage = { from: 'opponent', text: data.message, ts: Date.now() };
       set((s) => ({ chatMessages: [...s.chatMessages, msg] }));
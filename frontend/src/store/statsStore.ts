@@ -9,7 +9,7 @@ interface StatsStore {
   loading: boolean;
 
   loadStats: (playerName: string) => Promise<void>;
-  recordGame: (payload: RecordGamePayload) => void;
+  recordGame: (payload: RecordGamePayload, savedByServer?: boolean) => void;
 }
 
 function emptyStats(playerName: string): PlayerStats {
@@ -117,13 +117,16 @@ export const useStatsStore = create<StatsStore>((set) => ({
     }
   },
 
-  recordGame: (payload: RecordGamePayload) => {
+  recordGame: (payload: RecordGamePayload, savedByServer = false) => {
     // Update localStorage immediately
     const local = loadLocalStats(payload.player_name) || emptyStats(payload.player_name);
     const updated = mergeLocalStats(local, payload);
     saveLocalStats(updated);
     set({ stats: updated });
 
+    // Games the server recorded itself need no POST
+    if (savedByServer) return;
+
     // Fire-and-forget to backend
     api.recordGame(payload).catch(() => {
       // Backend unavailable — stats are still in localStorage